@@ -1,37 +1,448 @@
 """Example items endpoint."""
-from fastapi import APIRouter, Depends
-from typing import List
-from supabase import Client
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from pydantic import ValidationError
+from typing import Annotated, Any, Dict, Iterable, List, Literal, Optional, Union
+from app.core.batching import InsertCoalescer, chunked, insert_rows
+from app.core.cache import ResponseCache, TieredCache, etag_matches, make_cache_key, make_etag
+from app.core.config import settings
 from app.core.database import DatabaseDep
-from app.core.utils import handle_exceptions
+from app.core.export import EXPORT_FORMATS, CSVEncoder, ExportResponse, encode_ndjson, prefetch_pages, stream_export
+from app.core.ingest import LineTooLong, ingest_ndjson
+from app.core.journal import JournalFull, build_items_journal
+from app.core.metrics import registry
+from app.core.query import COMPARISON_OPERATORS, QueryError, QueryField, QueryPlan, QuerySchema
+from app.core.redis_client import RedisClient
+from app.core.serialization import FastJSONResponse, dumps
+from app.core.tracing import span
+from app.core.utils import handle_exceptions, single_flight
+from app.models.item import BulkCreateResult, IngestResult, Item, ItemAccepted, ItemCreate, ItemPage, ItemRow
 
 router = APIRouter()
 
+# Indexed, unique column used for keyset pagination
+ITEMS_SORT_KEY = "id"
 
-@router.get("/")
+# Columns GET /api/items may project, filter and sort on
+ITEMS_QUERY = QuerySchema(
+    [
+        QueryField("id", int, COMPARISON_OPERATORS | {"in"}, sortable=True),
+        QueryField("name", str, {"eq", "neq", "in", "ilike"}, sortable=True),
+        QueryField("description", str, {"eq", "ilike", "is"}, nullable=True),
+        QueryField("price", float, COMPARISON_OPERATORS | {"is"}, sortable=True, nullable=True),
+        QueryField("created_at", datetime, {"gt", "gte", "lt", "lte", "is"}, sortable=True, nullable=True),
+    ],
+    unique_key=ITEMS_SORT_KEY,
+    max_filters=settings.items_max_filters,
+    cache_size=settings.items_query_plan_cache_size,
+)
+
+# Cache namespace invalidated by every item write
+ITEMS_CACHE_NAMESPACE = "items"
+
+# Coalesces concurrent create_item calls into batched inserts
+insert_coalescer = InsertCoalescer(
+    settings.items_table,
+    max_batch_size=settings.items_insert_batch_size,
+    flush_interval=settings.items_insert_flush_interval_ms / 1000,
+)
+
+# Serialized GET /api/items responses, shared across instances through Redis when configured
+items_cache = TieredCache(
+    ResponseCache(
+        ttl=settings.items_cache_ttl,
+        max_bytes=settings.items_cache_max_bytes,
+        stale_ttl=settings.items_cache_stale_ttl,
+    ),
+    shared=RedisClient(settings.cache_redis_url) if settings.cache_redis_url else None,
+    prefix=settings.cache_redis_prefix,
+    early_refresh_beta=settings.items_cache_early_refresh_beta,
+    timeout=settings.cache_redis_timeout_ms / 1000,
+    retry_after=settings.cache_redis_retry_after,
+)
+
+# Streaming exports in flight; they are exempt from the adaptive concurrency limit
+export_slots = asyncio.Semaphore(settings.items_export_max_concurrent)
+
+# NDJSON ingests in flight; also exempt from the adaptive concurrency limit
+ingest_slots = asyncio.Semaphore(settings.items_ingest_max_concurrent)
+
+# Write-behind journal for create_item (opened by the app lifespan when enabled)
+items_journal = build_items_journal(on_flush=lambda: _invalidate_items_cache())
+
+
+def _items_cache_metrics() -> Iterable[str]:
+    """Expose read cache counters on /metrics."""
+    stats = items_cache.stats()
+    for name in (
+        "hits", "misses", "evictions", "invalidations", "shared_hits", "shared_misses",
+        "shared_errors", "stale_hits", "early_refreshes", "remote_invalidations",
+    ):
+        yield f"# TYPE items_cache_{name}_total counter"
+        yield f"items_cache_{name}_total {stats[name]}"
+    for name in ("entries", "bytes"):
+        yield f"# TYPE items_cache_{name} gauge"
+        yield f"items_cache_{name} {stats[name]}"
+
+
+registry.register_collector(_items_cache_metrics)
+
+
+@single_flight()
+async def list_items(
+    db: Any,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
+    plan: Optional[QueryPlan] = None,
+) -> Union[dict, List[dict]]:
+    """
+    Fetch one page of items.
+
+    By default pages are fetched with keyset pagination and returned as
+    ``{"items": [...], "next_cursor": ...}``, so every page costs the same to
+    fetch. Passing ``skip`` selects the legacy offset mode, which returns a
+    plain list. ``limit`` is capped at ``ITEMS_MAX_PAGE_SIZE``.
+
+    ``plan`` (from ``ITEMS_QUERY.plan``) selects the returned columns,
+    filters and sort order; cursors encode every sort key of the last row,
+    so they are only valid with the plan they were issued for.
+
+    Concurrent calls for the same page share one database query.
+
+    Raises:
+        HTTPException: 400 if ``cursor`` is malformed
+    """
+    limit = min(limit, settings.items_max_page_size)
+    if plan is None:
+        plan = ITEMS_QUERY.plan()
+    table = db.table(settings.items_table)
+
+    if skip is not None:
+        response = await plan.apply(table).range(skip, skip + limit - 1).execute()
+        return response.data
+
+    query = plan.apply(table, keyset=True)
+    if cursor:
+        try:
+            after = plan.decode_cursor(cursor)
+        except QueryError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = plan.seek(query, after)
+
+    # Fetch one extra row to learn whether another page exists
+    response = await query.limit(limit + 1).execute()
+    rows = response.data
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = plan.encode_cursor(rows[-1])
+
+    return {"items": plan.project(rows), "next_cursor": next_cursor}
+
+
+def _cache_scope(request: Request) -> Optional[str]:
+    """Identity the cached response is scoped to."""
+    auth = getattr(request.state, "auth", None)
+    return getattr(auth, "user_id", None)
+
+
+def _validation_message(error: ValidationError) -> str:
+    """One-line summary of a row's validation errors."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}"
+        for e in error.errors()
+    )
+
+
+def _query_plan(fields: Optional[str], filters: Optional[List[str]], sort: Optional[str]) -> QueryPlan:
+    """Parse ``fields``/``filter``/``sort`` with ``ITEMS_QUERY``; 400 if invalid."""
+    try:
+        return ITEMS_QUERY.plan(fields=fields, filters=filters or (), sort=sort)
+    except QueryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+# Query parameters shared by GET /api/items and GET /api/items/export
+FieldsQuery = Annotated[Optional[str], Query(description="Columns to return, e.g. id,name")]
+FiltersQuery = Annotated[Optional[List[str]], Query(
+    alias="filter", description="column.operator.value, e.g. price.gte.10 (repeatable)",
+)]
+SortQuery = Annotated[Optional[str], Query(description="Sort columns, - for descending, e.g. -price,name")]
+
+
+def _invalidate_items_cache() -> None:
+    items_cache.invalidate(ITEMS_CACHE_NAMESPACE)
+
+
+@router.get("/", response_model=Union[ItemPage, List[ItemRow]])
 @handle_exceptions(operation_name="fetching items")
 async def get_items(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    limit: Annotated[int, Query(ge=1)] = settings.items_default_page_size,
+    cursor: Optional[str] = None,
+    skip: Annotated[Optional[int], Query(ge=0)] = None,
+    fields: FieldsQuery = None,
+    filters: FiltersQuery = None,
+    sort: SortQuery = None,
+    db: DatabaseDep = None
+) -> Response:
+    """
+    List items (see ``list_items`` for the paging modes).
+
+    ``fields``, ``filter`` and ``sort`` are checked against ``ITEMS_QUERY``
+    and become the Supabase ``select`` list, filters and ``order``, so only
+    the requested columns of matching rows are fetched; with ``fields`` the
+    rows contain just those columns. Invalid parameters get ``400`` before
+    any database call.
+
+    Responses carry a strong ``ETag`` (weak once compressed, in the 304
+    too); a matching ``If-None-Match`` gets ``304 Not Modified``. Serialized pages are cached for
+    ``ITEMS_CACHE_TTL`` seconds (in Redis too, with ``CACHE_REDIS_URL``)
+    and invalidated by item writes on every instance; expired pages are
+    served for up to ``ITEMS_CACHE_STALE_TTL`` more seconds while they are
+    refreshed in the background.
+
+    Rows come straight from the database and are encoded directly to bytes
+    with the configured serializer; the response model only documents the
+    shape.
+    """
+    plan = _query_plan(fields, filters, sort)
+    limit = min(limit, settings.items_max_page_size)
+    key = make_cache_key(
+        "items:list",
+        {"limit": limit, "cursor": cursor, "skip": skip, "query": plan.key or None},
+        _cache_scope(request),
+    )
+
+    async def load() -> bytes:
+        page = await list_items(db, limit=limit, cursor=cursor, skip=skip, plan=plan)
+        with span("serialize"):
+            return dumps(page)
+
+    if settings.items_cache_enabled:
+        entry = await items_cache.get_or_load(ITEMS_CACHE_NAMESPACE, key, load)
+        body, etag = entry.body, entry.etag
+    else:
+        body = await load()
+        etag = make_etag(body)
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get(
+    "/export",
+    response_class=ExportResponse,
+    responses={200: {"content": {media_type: {} for media_type, _ in EXPORT_FORMATS.values()}}},
+)
+@handle_exceptions(operation_name="exporting items")
+async def export_items(
+    export_format: Annotated[Literal["ndjson", "csv"], Query(alias="format")] = "ndjson",
+    fields: FieldsQuery = None,
+    filters: FiltersQuery = None,
+    sort: SortQuery = None,
     db: DatabaseDep = None
-) -> List[dict]:
-    return [
-        {
-            "message": "Items endpoint - implement actual database queries",
-            "skip": skip,
-            "limit": limit
-        }
-    ]
+) -> ExportResponse:
+    """
+    Stream every matching item as NDJSON or CSV.
+
+    Takes the same ``fields``/``filter``/``sort`` parameters as
+    ``GET /api/items``. Rows are fetched server-side in keyset pages of
+    ``ITEMS_EXPORT_CHUNK_SIZE`` (the next page is fetched while the current
+    one is sent) and encoded page by page, so memory stays flat whatever
+    the number of rows. A client disconnect cancels the export.
 
+    The first page is fetched before the response starts, so an unavailable
+    database still gets a 503/504; a failure later aborts the connection.
+    ``503`` when ``ITEMS_EXPORT_MAX_CONCURRENT`` exports are already running.
+    """
+    plan = _query_plan(fields, filters, sort)
+    if export_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many exports in progress",
+            headers={"Retry-After": "5"},
+        )
+    chunk_size = settings.items_export_chunk_size
 
-@router.post("/")
+    async def fetch(previous: Optional[List[dict]]) -> List[dict]:
+        query = plan.apply(db.table(settings.items_table), keyset=True)
+        if previous is not None:
+            last = previous[-1]
+            query = plan.seek(query, {field.name: last[field.name] for field, _ in plan.sort})
+        response = await query.limit(chunk_size).execute()
+        return response.data
+
+    await export_slots.acquire()
+    try:
+        first = await fetch(None)
+    except BaseException:
+        export_slots.release()
+        raise
+
+    encoder = CSVEncoder(plan.fields or list(ITEMS_QUERY.fields)) if export_format == "csv" else encode_ndjson
+    header = encoder.header() if isinstance(encoder, CSVEncoder) else b""
+
+    def encode(rows: List[dict]) -> bytes:
+        return encoder(plan.project(rows))
+
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return ExportResponse(
+        stream_export(prefetch_pages(fetch, chunk_size, first), encode, export_format, header),
+        on_close=export_slots.release,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="items.{extension}"'},
+    )
+
+
+@router.post(
+    "/",
+    response_model=Item,
+    responses={status.HTTP_202_ACCEPTED: {"model": ItemAccepted, "description": "Journaled (write-behind mode)"}},
+)
 @handle_exceptions(operation_name="creating item")
 async def create_item(
-    item: dict,
+    item: ItemCreate,
+    db: DatabaseDep = None
+) -> Any:
+    """
+    Create an item; concurrent calls share batched inserts.
+
+    In write-behind mode (``ITEMS_WRITE_BEHIND_ENABLED``) the item is only
+    journaled and the response is ``202`` with its journal id; it becomes
+    visible once the background flusher has inserted it. ``503`` means the
+    journal is full.
+    """
+    row = item.model_dump(exclude_unset=True)
+    if settings.items_write_behind_enabled:
+        try:
+            journal_id = await items_journal.append(row)
+        except JournalFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many items waiting to be written",
+                headers={"Retry-After": "1"},
+            )
+        return FastJSONResponse(
+            ItemAccepted(id=journal_id).model_dump(), status_code=status.HTTP_202_ACCEPTED
+        )
+    try:
+        return await insert_coalescer.insert(db, row)
+    finally:
+        _invalidate_items_cache()
+
+
+@router.post("/bulk", response_model=BulkCreateResult)
+@handle_exceptions(operation_name="creating items")
+async def create_items_bulk(
+    items: List[Dict[str, Any]],
+    db: DatabaseDep = None
+) -> dict:
+    """
+    Create many items with batched inserts.
+
+    Each row is validated against ``ItemCreate`` on its own, and a result is
+    returned per input row (by index), so one bad row does not fail the
+    whole request.
+    """
+    if len(items) > settings.items_bulk_max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"At most {settings.items_bulk_max_rows} items per request"
+        )
+
+    results: List[Any] = [None] * len(items)
+    valid: List[tuple] = []
+    for index, row in enumerate(items):
+        try:
+            valid.append((index, ItemCreate.model_validate(row).model_dump(exclude_unset=True)))
+        except ValidationError as e:
+            results[index] = ValueError(_validation_message(e))
+
+    try:
+        for batch in chunked(valid, settings.items_insert_batch_size):
+            inserted = await insert_rows(db, settings.items_table, [row for _, row in batch])
+            for (index, _), result in zip(batch, inserted):
+                results[index] = result
+    finally:
+        _invalidate_items_cache()
+
+    rows = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            rows.append({"index": index, "status": "error", "error": str(result)})
+        else:
+            rows.append({"index": index, "status": "created", "item": result})
+
+    created = sum(1 for row in rows if row["status"] == "created")
+    return {"created": created, "failed": len(rows) - created, "results": rows}
+
+
+def _parse_ingest_line(line: bytes) -> dict:
+    """Validate one NDJSON line as an ``ItemCreate`` row."""
+    try:
+        return ItemCreate.model_validate_json(line).model_dump(exclude_unset=True)
+    except ValidationError as e:
+        raise ValueError(_validation_message(e)) from None
+
+
+@router.post(
+    "/ingest",
+    response_model=IngestResult,
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/x-ndjson": {"schema": {"type": "string", "format": "binary"}}},
+    }},
+)
+@handle_exceptions(operation_name="ingesting items")
+async def ingest_items(
+    request: Request,
     db: DatabaseDep = None
 ) -> dict:
-    return {
-        "message": "Create item endpoint - implement actual database insert",
-        "item": item
-    }
+    """
+    Create items from an NDJSON upload of any size.
+
+    The body is read as it arrives and parsed line by line; each line is
+    validated as an ``ItemCreate`` on its own and valid rows are inserted
+    in batches of ``ITEMS_INGEST_BATCH_SIZE``. Reading waits for the
+    previous batch's insert, so memory stays bounded by about two batches
+    and the upload goes no faster than the database accepts rows.
+
+    Returns counts and per-line errors (1-based line numbers, the first
+    ``ITEMS_INGEST_MAX_ERRORS``). Rows are inserted directly, also in
+    write-behind mode. ``413`` for a line longer than
+    ``ITEMS_INGEST_MAX_LINE_BYTES`` or a body over
+    ``ITEMS_INGEST_MAX_BODY_BYTES`` (batches before it are kept); ``503``
+    when ``ITEMS_INGEST_MAX_CONCURRENT`` ingests are already running.
+    """
+    if ingest_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many ingests in progress",
+            headers={"Retry-After": "5"},
+        )
+
+    async def insert(rows: List[dict]) -> list:
+        return await insert_rows(db, settings.items_table, rows)
 
+    async with ingest_slots:
+        try:
+            report = await ingest_ndjson(
+                request.stream(),
+                _parse_ingest_line,
+                insert,
+                batch_size=settings.items_ingest_batch_size,
+                max_line_bytes=settings.items_ingest_max_line_bytes,
+                max_errors=settings.items_ingest_max_errors,
+            )
+        except LineTooLong as e:
+            raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(e))
+        finally:
+            _invalidate_items_cache()
+    return report.to_dict()
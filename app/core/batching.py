@@ -0,0 +1,200 @@
+"""Batched inserts and a micro-batching coalescer for single-row writes."""
+import asyncio
+import logging
+from typing import Any, Dict, List, Tuple, Union
+import httpx
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+InsertResult = Union[dict, Exception]
+
+# SQLSTATE classes PostgREST answers with a 5xx: the server failed, not the request
+_SERVER_ERROR_CLASSES = frozenset({
+    "08", "09", "25", "2D", "38", "39", "3B", "40", "53", "55", "57", "58", "F0", "HV", "P0", "XX",
+})
+# Codes in those classes that are answered with a 4xx
+_CLIENT_ERROR_CODES = frozenset({"25006", "P0001"})
+
+
+def api_error_status(error: APIError) -> int:
+    """
+    HTTP status PostgREST answered with for ``error``.
+
+    ``APIError`` does not carry the status, so it is derived from the error
+    code: a PostgREST ``PGRST...`` code or a Postgres SQLSTATE, mapped as
+    PostgREST does. Responses that were not PostgREST JSON (e.g. a gateway
+    error) carry the status itself as the code.
+    """
+    code = error.code
+    if isinstance(code, int):
+        return code
+    if not code:
+        return 500
+    if code.startswith("PGRST"):
+        group = code[5:6]
+        if group == "0":
+            return 503  # database unreachable, schema cache not ready
+        if group == "3":
+            return 401  # JWT errors
+        return 500 if group == "X" else 400
+    if code[:2] in _SERVER_ERROR_CLASSES and code not in _CLIENT_ERROR_CODES:
+        return 503 if code[:2] in ("08", "53") else 500
+    return 400
+
+
+def is_row_rejection(error: BaseException) -> bool:
+    """Whether ``error`` is the database rejecting the request (a 4xx), not failing to serve it."""
+    return isinstance(error, APIError) and 400 <= api_error_status(error) < 500
+
+
+async def insert_rows(db: Any, table: str, rows: List[dict]) -> List[InsertResult]:
+    """
+    Insert ``rows`` in one round trip and return one result per row.
+
+    A batch insert is all-or-nothing, so if the database rejects it (a 4xx,
+    e.g. a constraint violation) the rows are retried individually to
+    isolate the failing ones. Each result is either the inserted row or the
+    exception raised for that row.
+
+    Other failures are never retried: the batch may have been committed
+    before the failure (a timeout), and the database is likely failing for
+    every row anyway. Transport errors (including timeouts and an open
+    circuit) are raised; anything else (a 5xx) is returned for every row.
+
+    Args:
+        db: Async Supabase client
+        table: Table name
+        rows: Rows to insert
+
+    Returns:
+        Inserted rows or exceptions, in input order
+
+    Raises:
+        httpx.TransportError: If the database could not be reached or the
+            insert timed out
+    """
+    if not rows:
+        return []
+
+    try:
+        response = await db.table(table).insert(rows).execute()
+    except httpx.TransportError:
+        raise
+    except Exception as e:
+        if len(rows) == 1 or not is_row_rejection(e):
+            return [e] * len(rows)
+        logger.warning(
+            "Batch insert of %d rows into %s rejected (%s); retrying per row",
+            len(rows), table, e
+        )
+        results = await asyncio.gather(
+            *(insert_rows(db, table, [row]) for row in rows),
+            return_exceptions=True,
+        )
+        # A row whose insert failed in transit is reported as failed, not raised,
+        # so the rows inserted alongside it are still reported
+        return [result if isinstance(result, BaseException) else result[0] for result in results]
+
+    if len(response.data) != len(rows):
+        error = RuntimeError(
+            f"Insert returned {len(response.data)} rows for {len(rows)} inputs"
+        )
+        return [error] * len(rows)
+    return list(response.data)
+
+
+class InsertCoalescer:
+    """
+    Groups concurrent single-row inserts into batched inserts.
+
+    Rows submitted through ``insert`` are buffered until ``max_batch_size``
+    rows are waiting or ``flush_interval`` seconds have passed since the
+    first one, then written with a single ``insert_rows`` call. Each caller
+    gets back its own inserted row or exception.
+
+    A caller that is cancelled while waiting does not withdraw its row; it
+    is still written with the rest of the batch.
+    """
+
+    def __init__(self, table: str, max_batch_size: int = 100, flush_interval: float = 0.005):
+        self.table = table
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        # Pending rows are bucketed per client so overrides never mix
+        self._pending: Dict[int, Tuple[Any, List[Tuple[dict, asyncio.Future]]]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._tasks: "set[asyncio.Task]" = set()
+
+    async def insert(self, db: Any, row: dict) -> dict:
+        """
+        Insert ``row`` as part of the next batch.
+
+        Returns:
+            The inserted row
+
+        Raises:
+            Exception: Whatever the database raised for this row
+        """
+        if self.max_batch_size <= 1:
+            result = (await insert_rows(db, self.table, [row]))[0]
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = id(db)
+        _, batch = self._pending.setdefault(key, (db, []))
+        batch.append((row, future))
+
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.flush_interval, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: int) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        db, batch = pending
+        task = asyncio.ensure_future(self._write(db, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, db: Any, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        try:
+            results = await insert_rows(db, self.table, [row for row, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def drain(self) -> None:
+        """Flush buffered rows and wait for in-flight batches to finish."""
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    @property
+    def pending(self) -> int:
+        """Number of rows buffered and not yet sent."""
+        return sum(len(batch) for _, batch in self._pending.values())
+
+
+def chunked(rows: List[Any], size: int) -> List[List[Any]]:
+    """Split ``rows`` into lists of at most ``size`` elements."""
+    size = max(size, 1)
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
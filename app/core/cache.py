@@ -0,0 +1,519 @@
+"""Read caches for serialized responses: in-process TTL/LRU, optionally backed by Redis."""
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Set, Tuple
+from urllib.parse import quote
+from app.core.metrics import cache_invalidation_lag_seconds
+from app.core.redis_client import RedisClient, RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    """
+    A cached response body and its strong ETag.
+
+    ``expires_at`` is when the entry stops being fresh (monotonic clock);
+    ``delta`` is how long computing it took, which scales early refreshes.
+    """
+
+    __slots__ = ("body", "etag", "expires_at", "generation", "size", "delta")
+
+    def __init__(
+        self, body: bytes, etag: str, expires_at: float, generation: int, size: int, delta: float = 0.0
+    ):
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+        self.generation = generation
+        self.size = size
+        self.delta = delta
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of response bodies with a per-entry TTL.
+
+    Entries are grouped by namespace (e.g. ``"items"``). Invalidating a
+    namespace bumps its generation in O(1); entries from older generations
+    are treated as misses and dropped when next touched or evicted. Memory
+    is bounded by the total size of cached bodies (``max_bytes``).
+
+    Expired entries are kept for another ``stale_ttl`` seconds, during which
+    ``get(..., allow_stale=True)`` still returns them (stale-while-revalidate).
+
+    Args:
+        ttl: Seconds an entry stays fresh
+        max_bytes: Budget for cached bodies and keys
+        stale_ttl: Seconds an expired entry may still be served
+    """
+
+    def __init__(self, ttl: float = 5.0, max_bytes: int = 32 * 1024 * 1024, stale_ttl: float = 0.0):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def generation(self, namespace: str) -> int:
+        """Current generation of ``namespace``; capture it before reading the source."""
+        return self._generations.get(namespace, 0)
+
+    def get(self, namespace: str, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """
+        Return a fresh entry or None (counting a hit or a miss).
+
+        With ``allow_stale``, an expired entry still within ``stale_ttl``
+        is returned too; check its ``expires_at`` to tell.
+        """
+        entry = self._entries.get((namespace, key))
+        if entry is not None:
+            if entry.generation == self.generation(namespace):
+                now = time.monotonic()
+                if entry.expires_at > now or (allow_stale and entry.expires_at + self.stale_ttl > now):
+                    self._entries.move_to_end((namespace, key))
+                    self.hits += 1
+                    return entry
+                if entry.expires_at + self.stale_ttl <= now:
+                    self._remove((namespace, key))
+            else:
+                self._remove((namespace, key))
+        self.misses += 1
+        return None
+
+    def set(
+        self,
+        namespace: str,
+        key: str,
+        body: bytes,
+        generation: Optional[int] = None,
+        delta: float = 0.0,
+        expires_at: Optional[float] = None,
+    ) -> CacheEntry:
+        """
+        Cache ``body`` under ``key``.
+
+        Args:
+            namespace: Invalidation group
+            key: Normalized cache key (see ``make_cache_key``)
+            body: Serialized response body
+            generation: Generation captured before the data was read; if the
+                namespace was invalidated meanwhile the entry is not stored
+            delta: Seconds it took to compute ``body``
+            expires_at: When the entry stops being fresh (monotonic clock;
+                default ``ttl`` from now)
+
+        Returns:
+            The entry (returned even when it is too large or stale to keep)
+        """
+        current = self.generation(namespace)
+        if generation is None:
+            generation = current
+        if expires_at is None:
+            expires_at = time.monotonic() + self.ttl
+        size = len(body) + len(key) + len(namespace)
+        entry = CacheEntry(body, make_etag(body), expires_at, generation, size, delta)
+
+        if generation != current or size > self.max_bytes:
+            return entry
+
+        self._remove((namespace, key))
+        self._entries[(namespace, key)] = entry
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return entry
+
+    def invalidate(self, namespace: str) -> None:
+        """Invalidate every entry in ``namespace``."""
+        self._generations[namespace] = self.generation(namespace) + 1
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and eviction counters plus current usage."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "bytes": self.size,
+        }
+
+    def _remove(self, cache_key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+
+# Shared entries: fresh-until (wall clock) and compute time, then the body
+_SHARED_HEADER = struct.Struct("!dd")
+
+Loader = Callable[[], Awaitable[bytes]]
+
+
+class TieredCache:
+    """
+    Two-tier read cache: an in-process ``ResponseCache`` (L1) in front of
+    a shared Redis (L2), so a new instance starts warm and instances share
+    the cost of computing an entry.
+
+    ``get_or_load`` checks L1, then L2, then calls the loader, filling the
+    tiers on the way back. Concurrent misses for a key share one load
+    (per instance). Expired L1 entries within the local ``stale_ttl`` are
+    served while one background refresh runs (stale-while-revalidate), and
+    fresh entries are refreshed early with a probability that rises as
+    expiry approaches, scaled by how long the entry took to compute
+    (XFetch). Across instances that spreads refreshes out instead of every
+    instance missing at once when a popular entry expires.
+
+    Invalidation bumps the namespace's generation, shared through Redis and
+    part of every L2 key, so entries written before it are never read
+    again; the new generation is published so other instances drop their
+    L1 entries too. If Redis is unreachable the cache keeps working from L1
+    alone and retries Redis after ``retry_after`` seconds; other instances
+    then only see writes once their entries expire.
+
+    Args:
+        local: L1 cache (its ``ttl``/``stale_ttl`` also apply to L2 entries)
+        shared: Redis client for L2, or None for L1 only
+        prefix: Prefix of L2 keys and the invalidation channel
+        early_refresh_beta: XFetch beta; higher refreshes earlier, 0 disables
+        timeout: Seconds allowed per Redis call before treating it as down
+        retry_after: Seconds Redis is skipped after a failure
+    """
+
+    def __init__(
+        self,
+        local: ResponseCache,
+        shared: Optional[RedisClient] = None,
+        prefix: str = "cache",
+        early_refresh_beta: float = 1.0,
+        timeout: float = 0.05,
+        retry_after: float = 5.0,
+    ) -> None:
+        self.local = local
+        self.shared = shared
+        self.prefix = prefix
+        self.early_refresh_beta = early_refresh_beta
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.instance_id = uuid.uuid4().hex
+        self.channel = f"{prefix}:invalidations"
+        self.subscribed = asyncio.Event()
+        # Shared generation per namespace, as last read from or announced by Redis
+        self._generations: Dict[str, int] = {}
+        # Namespaces whose invalidation is still being announced; L2 is bypassed meanwhile
+        self._announcing: Dict[str, int] = {}
+        self._loading: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._shared_down_until = 0.0
+        self._listener: Optional[asyncio.Task] = None
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+        self.stale_hits = 0
+        self.early_refreshes = 0
+        self.remote_invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    @property
+    def hits(self) -> int:
+        """L1 hits (including stale ones)."""
+        return self.local.hits
+
+    def generation(self, namespace: str) -> int:
+        return self.local.generation(namespace)
+
+    async def get_or_load(self, namespace: str, key: str, load: Loader) -> CacheEntry:
+        """
+        Return the entry for ``key``, loading it with ``load`` on a miss.
+
+        Args:
+            namespace: Invalidation group
+            key: Normalized cache key (see ``make_cache_key``)
+            load: Computes the body; a background refresh may call it after
+                the request that passed it has finished
+
+        Raises:
+            Exception: Whatever ``load`` raised, on a miss
+        """
+        entry = self.local.get(namespace, key, allow_stale=True)
+        if entry is not None:
+            now = time.monotonic()
+            if entry.expires_at <= now:
+                self.stale_hits += 1
+                self._refresh(namespace, key, load)
+            elif self._refresh_early(entry, now):
+                self.early_refreshes += 1
+                self._refresh(namespace, key, load)
+            return entry
+        task = self._loading.get((namespace, key))
+        if task is None or task.done():
+            task = self._start_load(namespace, key, load, use_shared=True, background=False)
+        # A cancelled request does not cancel the load other requests wait for
+        return await asyncio.shield(task)
+
+    def invalidate(self, namespace: str) -> None:
+        """Invalidate ``namespace`` here now, and on other instances via Redis."""
+        self.local.invalidate(namespace)
+        if self.shared is None:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning("Cache invalidation of %s outside the event loop not announced", namespace)
+            return
+        self._announcing[namespace] = self._announcing.get(namespace, 0) + 1
+        self._spawn(self._announce(namespace))
+
+    def clear(self) -> None:
+        """Drop all L1 entries (L2 entries expire on their own)."""
+        self.local.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """L1 counters plus L2 hits/misses/errors, stale hits, early refreshes and remote invalidations."""
+        return {
+            **self.local.stats(),
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+            "shared_errors": self.shared_errors,
+            "stale_hits": self.stale_hits,
+            "early_refreshes": self.early_refreshes,
+            "remote_invalidations": self.remote_invalidations,
+        }
+
+    def start(self) -> None:
+        """Start listening for invalidations from other instances (no-op without L2)."""
+        if self.shared is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen(), name="cache-invalidations")
+
+    async def stop(self, timeout: float = 1.0) -> None:
+        """Stop listening, let pending L2 writes finish (up to ``timeout``) and close Redis."""
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in self._loading.values():
+            task.cancel()
+        self._loading.clear()
+        if self.shared is not None:
+            await self.shared.close()
+
+    def _refresh_early(self, entry: CacheEntry, now: float) -> bool:
+        # XFetch: refresh when now - delta * beta * ln(rand) reaches the expiry
+        if not self.early_refresh_beta or not entry.delta:
+            return False
+        return now - entry.delta * self.early_refresh_beta * math.log(1.0 - random.random()) >= entry.expires_at
+
+    def _refresh(self, namespace: str, key: str, load: Loader, use_shared: bool = True) -> None:
+        task = self._loading.get((namespace, key))
+        if task is None or task.done():
+            self._start_load(namespace, key, load, use_shared, background=True)
+
+    def _start_load(
+        self, namespace: str, key: str, load: Loader, use_shared: bool, background: bool
+    ) -> asyncio.Task:
+        cache_key = (namespace, key)
+        task = asyncio.ensure_future(self._load(namespace, key, load, use_shared))
+        self._loading[cache_key] = task
+
+        def done(task: asyncio.Task) -> None:
+            if self._loading.get(cache_key) is task:
+                del self._loading[cache_key]
+            # Retrieve the exception even if every waiter went away; callers
+            # of foreground loads get (and report) it themselves
+            if not task.cancelled() and task.exception() is not None and background:
+                logger.warning("Background refresh of cached %s failed: %s", key, task.exception())
+
+        task.add_done_callback(done)
+        return task
+
+    async def _load(self, namespace: str, key: str, load: Loader, use_shared: bool) -> CacheEntry:
+        generation = self.local.generation(namespace)
+        shared_key = await self._shared_key(namespace, key)
+        if shared_key is not None and use_shared:
+            data = await self._call_shared(self.shared.get(shared_key))
+            if data is None:
+                self.shared_misses += 1
+            else:
+                self.shared_hits += 1
+                fresh_until, delta = _SHARED_HEADER.unpack_from(data)
+                now = time.monotonic()
+                entry = self.local.set(
+                    namespace, key, data[_SHARED_HEADER.size:], generation,
+                    delta=delta, expires_at=now + fresh_until - time.time(),
+                )
+                if entry.expires_at <= now or self._refresh_early(entry, now):
+                    # Serve it, and have this instance recompute it
+                    asyncio.get_running_loop().call_soon(self._refresh, namespace, key, load, False)
+                return entry
+
+        start = time.perf_counter()
+        body = await load()
+        delta = time.perf_counter() - start
+        entry = self.local.set(namespace, key, body, generation, delta=delta)
+        if shared_key is not None and self.local.generation(namespace) == generation:
+            value = _SHARED_HEADER.pack(time.time() + self.local.ttl, delta) + body
+            ttl_ms = math.ceil((self.local.ttl + self.local.stale_ttl) * 1000)
+            self._spawn(self._call_shared(self.shared.set(shared_key, value, px=ttl_ms)))
+        return entry
+
+    async def _shared_key(self, namespace: str, key: str) -> Optional[str]:
+        """L2 key under the current shared generation; None while L2 must not be used."""
+        if (
+            self.shared is None
+            or namespace in self._announcing
+            or time.monotonic() < self._shared_down_until
+        ):
+            return None
+        generation = self._generations.get(namespace)
+        if generation is None:
+            value = await self._call_shared(self.shared.get(self._generation_key(namespace)))
+            if value is None and time.monotonic() < self._shared_down_until:
+                return None
+            generation = max(int(value or 0), self._generations.get(namespace, 0))
+            self._generations[namespace] = generation
+        return f"{self.prefix}:{namespace}:{generation}:{key}"
+
+    def _generation_key(self, namespace: str) -> str:
+        return f"{self.prefix}:generation:{namespace}"
+
+    async def _call_shared(self, call: Awaitable[Any]) -> Any:
+        """Await a Redis call; None (and Redis skipped for a while) if it fails."""
+        try:
+            return await asyncio.wait_for(call, self.timeout)
+        except (RedisError, ConnectionError, OSError, asyncio.TimeoutError) as e:
+            self.shared_errors += 1
+            if time.monotonic() >= self._shared_down_until:
+                logger.warning(
+                    "Shared cache unavailable (%s); using the local cache only for %.0fs",
+                    e or type(e).__name__, self.retry_after,
+                )
+            self._shared_down_until = time.monotonic() + self.retry_after
+            return None
+
+    async def _announce(self, namespace: str) -> None:
+        try:
+            generation = await self._call_shared(self.shared.incr(self._generation_key(namespace)))
+            if generation is None:
+                # Unknown now; read it again once Redis is back
+                self._generations.pop(namespace, None)
+                return
+            self._generations[namespace] = max(generation, self._generations.get(namespace, 0))
+            message = f"{self.instance_id} {namespace} {generation} {time.time()!r}"
+            await self._call_shared(self.shared.publish(self.channel, message))
+        finally:
+            remaining = self._announcing[namespace] - 1
+            if remaining:
+                self._announcing[namespace] = remaining
+            else:
+                del self._announcing[namespace]
+
+    async def _listen(self) -> None:
+        backoff = 0.1
+        while True:
+            subscription = None
+            try:
+                subscription = await self.shared.subscribe(self.channel)
+                self.subscribed.set()
+                backoff = 0.1
+                async for message in subscription:
+                    self._on_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Cache invalidation subscription to %s lost: %s", self.channel, e)
+            finally:
+                if subscription is not None:
+                    subscription.close()
+                if self.subscribed.is_set():
+                    self.subscribed.clear()
+                    # Invalidations may have been missed; start over
+                    for namespace in set(self._generations) | set(self._announcing):
+                        self.local.invalidate(namespace)
+                    self._generations.clear()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 5.0)
+
+    def _on_message(self, message: bytes) -> None:
+        try:
+            instance_id, namespace, generation, sent_at = message.decode().split(" ")
+            generation = int(generation)
+            sent_at = float(sent_at)
+        except ValueError:
+            logger.warning("Ignoring malformed cache invalidation %r", message[:100])
+            return
+        if instance_id == self.instance_id:
+            return
+        if generation > self._generations.get(namespace, 0):
+            self._generations[namespace] = generation
+        self.local.invalidate(namespace)
+        self.remote_invalidations += 1
+        cache_invalidation_lag_seconds.observe_ns(max(0, int((time.time() - sent_at) * 1e9)))
+
+    def _spawn(self, coro: Awaitable[Any]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+def make_cache_key(route: str, params: Mapping[str, Any], scope: Optional[str] = None) -> str:
+    """
+    Build a normalized cache key.
+
+    Parameters are sorted and ``None`` values dropped, so equivalent queries
+    share an entry regardless of parameter order. Values are percent-encoded,
+    so one cannot spell out another parameter.
+    """
+    query = "&".join(
+        f"{name}={quote(str(value), safe='')}"
+        for name, value in sorted(params.items()) if value is not None
+    )
+    return f"{route}?{query}#{scope or 'anonymous'}"
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the response body."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an ``If-None-Match`` header against ``etag``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
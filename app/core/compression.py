@@ -0,0 +1,122 @@
+"""Content-encoding negotiation and gzip/brotli encoders."""
+import gzip
+import zlib
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Server preference when the client accepts several encodings equally
+PREFERRED_ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+_COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+})
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """``gzip, br;q=0.8`` -> ``{"gzip": 1.0, "br": 0.8}`` (names lowercased)."""
+    weights = {}
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights
+
+
+def negotiate(accept_encoding: str, available: Tuple[str, ...] = PREFERRED_ENCODINGS) -> Optional[str]:
+    """
+    Pick the response encoding for an ``Accept-Encoding`` header.
+
+    Args:
+        accept_encoding: Request header value
+        available: Supported encodings in server preference order
+
+    Returns:
+        The accepted encoding with the highest q-value (ties broken by
+        ``available`` order), or None to send the body unencoded
+    """
+    if not accept_encoding:
+        return None
+    weights = parse_accept_encoding(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    """Whether a ``Content-Type`` is text-like and worth compressing."""
+    media_type = content_type.partition(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in _COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    """Compress a complete body in one call."""
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    if encoding == "gzip":
+        # mtime=0 keeps the output identical for identical bodies
+        return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+class GzipEncoder:
+    """Incremental gzip stream; each chunk is flushed so clients can decode it right away."""
+
+    def __init__(self, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    """Incremental brotli stream; each chunk is flushed so clients can decode it right away."""
+
+    def __init__(self, quality: int = 4):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+Encoder = Union[GzipEncoder, BrotliEncoder]
+
+
+def make_encoder(encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> Encoder:
+    """Streaming encoder for ``encoding``."""
+    if encoding == "br":
+        return BrotliEncoder(brotli_quality)
+    if encoding == "gzip":
+        return GzipEncoder(gzip_level)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
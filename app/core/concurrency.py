@@ -0,0 +1,215 @@
+"""Adaptive concurrency limits driven by observed request latency."""
+import asyncio
+import math
+from collections import deque
+from typing import Deque, Optional, Union
+from app.core.config import settings
+
+
+class AIMDLimit:
+    """
+    Additive-increase / multiplicative-decrease limit.
+
+    The limit grows by one per request while it is being used (at least
+    half of it in flight) and latency stays under ``latency_target``, and is
+    cut by ``backoff_ratio`` whenever a request is slower or fails.
+
+    Args:
+        initial_limit: Starting limit
+        min_limit: Floor for the limit
+        max_limit: Ceiling for the limit
+        latency_target: Seconds above which a request counts as overload
+        backoff_ratio: Multiplier applied on overload
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 50,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        latency_target: float = 0.25,
+        backoff_ratio: float = 0.9,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+
+    def update(self, latency: float, in_flight: int, failed: bool = False) -> float:
+        """Record one completed request and return the new limit."""
+        if failed or latency > self.latency_target:
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+        return self.limit
+
+
+class GradientLimit:
+    """
+    Gradient limit comparing short-term latency to a long-term baseline.
+
+    Two exponentially weighted averages of request latency are kept. While
+    recent latency stays within ``tolerance`` of the baseline the limit
+    grows by a queue allowance of ``sqrt(limit)``; as recent latency rises
+    the limit shrinks in proportion (by at most half per update). The
+    baseline follows sustained changes and is pulled down quickly after a
+    slowdown passes, so the limit tracks backend latency without a fixed
+    target.
+
+    Args:
+        initial_limit: Starting limit
+        min_limit: Floor for the limit
+        max_limit: Ceiling for the limit
+        short_window: Samples averaged for recent latency
+        long_window: Samples averaged for the baseline
+        tolerance: Ratio of recent to baseline latency tolerated before backing off
+        smoothing: Weight of each new estimate in the limit
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 50,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        short_window: int = 10,
+        long_window: int = 500,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._short_alpha = 2 / (short_window + 1)
+        self._long_alpha = 2 / (long_window + 1)
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.short_latency: Optional[float] = None
+        self.long_latency: Optional[float] = None
+
+    def update(self, latency: float, in_flight: int, failed: bool = False) -> float:
+        """Record one completed request and return the new limit."""
+        if self.short_latency is None:
+            self.short_latency = self.long_latency = latency
+        else:
+            self.short_latency += self._short_alpha * (latency - self.short_latency)
+            self.long_latency += self._long_alpha * (latency - self.long_latency)
+
+        # Recover the baseline quickly once latency drops well below it
+        if self.long_latency > 2 * self.short_latency:
+            self.long_latency *= 0.95
+
+        # Only adjust while the limit is actually being used
+        if in_flight * 2 < self.limit:
+            return self.limit
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_latency / max(self.short_latency, 1e-9)))
+        estimate = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - self.smoothing) + estimate * self.smoothing
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+        return self.limit
+
+
+class ConcurrencyLimiter:
+    """
+    Admission control with an adaptive limit and a short FIFO wait queue.
+
+    ``acquire`` admits immediately while fewer than ``limit`` requests are
+    in flight. Otherwise it waits up to ``queue_timeout`` seconds in a queue
+    of at most ``max_queue`` waiters and returns False if no slot frees up,
+    so excess load is rejected quickly instead of piling up on the event
+    loop. ``release`` hands freed slots straight to the oldest waiters.
+
+    Args:
+        algorithm: ``AIMDLimit`` or ``GradientLimit``
+        max_queue: Waiters allowed before rejecting immediately
+        queue_timeout: Seconds a request may wait for a slot
+    """
+
+    def __init__(self, algorithm, max_queue: int = 50, queue_timeout: float = 0.05):
+        self.algorithm = algorithm
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self.algorithm.limit))
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; False means the request should be rejected."""
+        if self.in_flight < self.limit and not self.queue_depth:
+            self.in_flight += 1
+            return True
+        if self.queue_depth >= self.max_queue or self.queue_timeout <= 0:
+            self.rejected += 1
+            return False
+
+        # Waiters that timed out are at the head of the queue
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queue_depth += 1
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            # Cancelled (e.g. client gone) just after being handed a slot
+            if waiter.done() and not waiter.cancelled():
+                self._free_slot()
+            raise
+        finally:
+            self.queue_depth -= 1
+        # _free_slot() counted this request as in flight when it woke us
+        return True
+
+    def release(self, latency: float, failed: bool = False) -> None:
+        """Record a finished request and admit waiters up to the new limit."""
+        self.algorithm.update(latency, self.in_flight, failed)
+        self._free_slot()
+
+    def _free_slot(self) -> None:
+        self.in_flight -= 1
+        limit = self.limit
+        while self._waiters and self.in_flight < limit:
+            waiter = self._waiters.popleft()
+            # Waiters that timed out or disconnected are already cancelled
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+
+
+def build_concurrency_limiter() -> ConcurrencyLimiter:
+    """
+    Create the limiter configured by ``CONCURRENCY_*`` settings.
+
+    Raises:
+        ValueError: If ``CONCURRENCY_LIMIT_ALGORITHM`` is unknown
+    """
+    bounds = dict(
+        initial_limit=settings.concurrency_initial_limit,
+        min_limit=settings.concurrency_min_limit,
+        max_limit=settings.concurrency_max_limit,
+    )
+    algorithm_name = settings.concurrency_limit_algorithm.lower()
+    algorithm: Union[AIMDLimit, GradientLimit]
+    if algorithm_name == "gradient":
+        algorithm = GradientLimit(**bounds)
+    elif algorithm_name == "aimd":
+        algorithm = AIMDLimit(
+            latency_target=settings.concurrency_latency_target_ms / 1000, **bounds
+        )
+    else:
+        raise ValueError(f"Unknown concurrency limit algorithm: {algorithm_name}")
+    return ConcurrencyLimiter(
+        algorithm,
+        max_queue=settings.concurrency_queue_size,
+        queue_timeout=settings.concurrency_queue_timeout_ms / 1000,
+    )
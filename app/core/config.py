@@ -1,6 +1,6 @@
 """Application configuration using Pydantic settings."""
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -18,19 +18,171 @@ class Settings(BaseSettings):
     app_version: str = "1.0.0"
     environment: str = "development"
     log_level: str = "INFO"
+    log_format: str = "text"  # "text" or "json"
+    log_queue_size: int = 10000
+    log_sample_rate: float = 1.0
+    log_route_sample_rates: Dict[str, float] = {}
+    log_slow_request_ms: float = 1000.0
     
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8000
+    workers: int = 0  # 0 = one worker per available CPU (cgroup-aware)
+    event_loop: str = "uvloop"  # "uvloop", "asyncio" or "auto"
+    http_parser: str = "httptools"  # "httptools", "h11" or "auto"
+    max_requests: int = 10000  # recycle a worker after this many requests; 0 = never
+    max_requests_jitter: int = 1000
+    keep_alive_timeout: int = 65  # keep above the load balancer's idle timeout
+    backlog: int = 2048
+    graceful_shutdown_timeout: int = 25  # below the platform's SIGTERM -> SIGKILL grace period
+    
+    # API Docs (/docs, /redoc, /openapi.json); disable to skip building the schema
+    openapi_enabled: bool = True
+    
+    # Response Serialization
+    json_serializer: str = "auto"  # "auto", "orjson", "msgspec" or "stdlib"
+    
+    # Response Compression (gzip, and brotli when installed)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024  # bytes; smaller bodies are sent as-is
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_static_paths: List[str] = ["/openapi.json", "/docs", "/redoc"]
+
+    # Rate Limiting and Load Shedding (per worker)
+    rate_limit_enabled: bool = True
+    rate_limit_tiers: Dict[str, Dict[str, float]] = {
+        "anonymous": {"rate": 10, "burst": 20},
+        "default": {"rate": 50, "burst": 100},
+        "premium": {"rate": 500, "burst": 1000},
+    }
+    rate_limit_tier_claim: str = "tier"
+    rate_limit_max_keys: int = 100000
+    rate_limit_exempt_paths: List[str] = ["/health", "/metrics"]
+    rate_limit_proxy_hops: int = 0  # proxies appending to X-Forwarded-For; 0 uses the peer address
+    load_shed_max_in_flight: int = 500  # 0 disables shedding
+    load_shed_low_priority_paths: List[str] = [
+        "/api/items/bulk", "/api/items/export", "/api/items/ingest", "/docs", "/redoc", "/openapi.json",
+    ]
+    load_shed_low_priority_fraction: float = 0.5
+    
+    # Adaptive Concurrency Limit (per worker)
+    concurrency_limit_enabled: bool = True
+    concurrency_limit_algorithm: str = "gradient"  # "gradient" or "aimd"
+    concurrency_initial_limit: int = 50
+    concurrency_min_limit: int = 5
+    concurrency_max_limit: int = 500
+    concurrency_latency_target_ms: float = 250.0  # aimd: slower requests shrink the limit
+    concurrency_queue_size: int = 50
+    concurrency_queue_timeout_ms: float = 50.0
+    # Exports and ingests are long-lived streams, bounded by ITEMS_EXPORT_MAX_CONCURRENT
+    # and ITEMS_INGEST_MAX_CONCURRENT instead
+    concurrency_exempt_paths: List[str] = ["/health", "/metrics", "/api/items/export", "/api/items/ingest"]
+
+    # Request Body Limits (enforced while the body is read; over the limit gets 413)
+    max_request_body_bytes: int = 10 * 1024 * 1024  # 0 = unlimited
+
+    # Event Loop Monitoring
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: float = 50.0
+    loop_block_threshold_ms: float = 100.0  # log the loop's stack when blocked this long
+    loop_monitor_window: int = 1200  # lag samples kept for percentiles (60s at 50ms)
+    
+    # Request Profiling (admin requests with X-Profile / ?profile=; off by default)
+    profiling_enabled: bool = False
+    profiling_profiler: str = "cprofile"  # "cprofile" (pstats) or "sample" (collapsed stacks)
+    profiling_sample_interval_ms: float = 1.0
+    profiling_sample_every: int = 0  # also profile 1 in N requests (0 disables)
+    profiling_dir: str = "/tmp/profiles"
+    profiling_max_files: int = 100
+
+    # Request Tracing (Server-Timing breakdown; sampled traces as OTLP/JSON lines)
+    tracing_enabled: bool = True
+    tracing_server_timing: bool = False  # Server-Timing on responses; exposes internal timings
+    tracing_export_path: Optional[str] = None  # unset = no export
+    tracing_sample_rate: float = 0.01  # requests without a trusted upstream decision
+    tracing_trust_upstream: bool = False  # follow the caller's traceparent sampled flag
+    tracing_export_queue_size: int = 10000
+    tracing_export_max_bytes: int = 100 * 1024 * 1024  # then rotated to <path>.1 (0 = unbounded)
+
+    # Metrics Configuration
+    metrics_enabled: bool = True
+    
+    # Shared Cache Tier (Redis L2 behind the in-process caches, with pub/sub invalidation)
+    cache_redis_url: Optional[str] = None  # unset = in-process caches only
+    cache_redis_prefix: str = "base0"
+    cache_redis_timeout_ms: float = 50.0  # per call; slower calls count as Redis being down
+    cache_redis_retry_after: float = 5.0  # seconds Redis is skipped after a failure
     
     # Supabase Configuration
     supabase_url: str = "https://test.supabase.co"
     supabase_key: str = "test-key"
     
+    # Database Connection Pool Configuration
+    db_max_connections: int = 100
+    db_max_keepalive_connections: int = 20
+    db_keepalive_expiry: float = 5.0
+    db_connect_timeout: float = 5.0
+    db_read_timeout: float = 30.0
+    db_write_timeout: float = 30.0
+    db_pool_timeout: float = 5.0
+    db_http2: bool = True
+    # Database resilience: whole-call timeouts, read retries, circuit breaker, hedged reads
+    db_read_operation_timeout: float = 10.0
+    db_write_operation_timeout: float = 30.0
+    db_retry_attempts: int = 2  # extra attempts for failed reads; writes are never retried
+    db_retry_backoff_ms: float = 50.0
+    db_retry_max_backoff_ms: float = 1000.0
+    db_breaker_enabled: bool = True
+    db_breaker_failure_threshold: int = 5  # consecutive failures that open the circuit
+    db_breaker_reset_timeout: float = 10.0  # seconds open before a probe is let through
+    db_hedge_enabled: bool = False
+    db_hedge_percentile: float = 0.95  # hedge reads still running after this latency percentile
+    db_hedge_min_delay_ms: float = 10.0
+    
+    # Items API Configuration
+    items_table: str = "items"
+    items_default_page_size: int = 100
+    items_max_page_size: int = 1000
+    items_bulk_max_rows: int = 1000
+    items_insert_batch_size: int = 100
+    items_insert_flush_interval_ms: float = 5.0
+    items_cache_enabled: bool = True
+    items_cache_ttl: float = 5.0
+    items_cache_max_bytes: int = 32 * 1024 * 1024
+    items_cache_stale_ttl: float = 10.0  # expired pages served while one refresh runs
+    items_cache_early_refresh_beta: float = 1.0  # probabilistic early refresh; 0 disables
+    items_max_filters: int = 10
+    items_query_plan_cache_size: int = 1024
+    items_export_chunk_size: int = 1000  # rows fetched per page by GET /api/items/export
+    items_export_max_concurrent: int = 4  # per worker; more get 503
+    items_ingest_max_body_bytes: int = 16 * 1024 ** 3  # POST /api/items/ingest; replaces MAX_REQUEST_BODY_BYTES
+    items_ingest_max_line_bytes: int = 1024 * 1024
+    items_ingest_batch_size: int = 500  # rows per insert
+    items_ingest_max_errors: int = 1000  # per-line errors listed in the summary
+    items_ingest_max_concurrent: int = 2  # per worker; more get 503
+    # Write-behind: POST /api/items journals rows locally, answers 202 and inserts in the background
+    items_write_behind_enabled: bool = False
+    items_journal_dir: str = "journal"
+    items_journal_max_pending: int = 100000  # rows; appends beyond this get 503
+    items_journal_batch_size: int = 500
+    items_journal_flush_interval_ms: float = 100.0
+    items_journal_segment_bytes: int = 16 * 1024 * 1024
+    items_journal_max_attempts: int = 5
+    items_journal_max_backoff: float = 30.0
+    
     # Auth Configuration
     auth_domain: Optional[str] = None
     auth_audience: Optional[str] = None
     auth_algorithm: str = "RS256"
+    auth_issuer: Optional[str] = None
+    auth_jwks_url: Optional[str] = None
+    auth_jwks_ttl: float = 3600.0
+    auth_jwks_min_refresh_interval: float = 30.0
+    auth_jwks_timeout: float = 5.0
+    auth_token_cache_size: int = 10000
+    auth_admin_claim: str = "role"  # dotted path for nested claims, e.g. "app_metadata.role"
+    auth_admin_roles: List[str] = ["admin"]
     
     @property
     def is_development(self) -> bool:
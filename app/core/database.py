@@ -1,48 +1,139 @@
 """Database connection and dependency injection for Supabase."""
-from typing import Annotated, Optional
+import asyncio
+import importlib
+from typing import TYPE_CHECKING, Annotated, Any, Optional
+import httpx
 from fastapi import Depends
-from supabase import create_client, Client
 from app.core.config import settings
+from app.core.metrics import InstrumentedTransport
+from app.core.resilience import build_resilient_transport
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
 
 
 class Database:
-    """Database connection manager for Supabase."""
-    
+    """
+    Async database connection manager for Supabase.
+
+    The client is created once (``connect``) and shares a single pooled
+    ``httpx.AsyncClient`` across all requests, so queries never block the
+    event loop and connections are reused.
+
+    ``supabase`` is only imported by ``connect``, in a worker thread: it is
+    the heaviest dependency of the app, and keeping it off the import path
+    and the event loop lets the server answer ``/health`` while it loads.
+    """
+
     def __init__(self):
-        self._client: Optional[Client] = None
-    
+        self._client: Optional["AsyncClient"] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._connect_lock = asyncio.Lock()
+
     @property
-    def client(self) -> Client:
-        """Get or create Supabase client."""
+    def client(self) -> "AsyncClient":
+        """Get the connected Supabase client."""
         if self._client is None:
-            self._client = create_client(
-                settings.supabase_url,
-                settings.supabase_key
+            raise RuntimeError(
+                "Database is not connected; connect() must run in the app lifespan"
             )
         return self._client
-    
-    def close(self):
-        """Close database connection (if needed)."""
-        # Supabase client doesn't require explicit closing, but we can reset it
+
+    @property
+    def is_connected(self) -> bool:
+        """Check if the client has been created."""
+        return self._client is not None
+
+    def _build_http_client(self) -> httpx.AsyncClient:
+        """Build the pooled, instrumented and resilient HTTP client from settings."""
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.db_max_connections,
+                max_keepalive_connections=settings.db_max_keepalive_connections,
+                keepalive_expiry=settings.db_keepalive_expiry,
+            ),
+            http2=settings.db_http2,
+        )
+        return httpx.AsyncClient(
+            # Each attempt (retries and hedges included) is timed separately
+            transport=build_resilient_transport(InstrumentedTransport(transport)),
+            timeout=httpx.Timeout(
+                connect=settings.db_connect_timeout,
+                read=settings.db_read_timeout,
+                write=settings.db_write_timeout,
+                pool=settings.db_pool_timeout,
+            ),
+            follow_redirects=True,
+        )
+
+    async def connect(self) -> "AsyncClient":
+        """
+        Create the async Supabase client and its connection pool.
+
+        Safe to call concurrently; callers share one connection attempt.
+        """
+        if self._client is not None:
+            return self._client
+        async with self._connect_lock:
+            if self._client is None:
+                supabase = await asyncio.to_thread(importlib.import_module, "supabase")
+                http_client = self._build_http_client()
+                try:
+                    self._client = await supabase.acreate_client(
+                        settings.supabase_url,
+                        settings.supabase_key,
+                        options=supabase.AsyncClientOptions(
+                            httpx_client=http_client,
+                            postgrest_client_timeout=http_client.timeout,
+                        ),
+                    )
+                except BaseException:
+                    await http_client.aclose()
+                    raise
+                self._http_client = http_client
+        return self._client
+
+    async def close(self):
+        """Close the connection pool and drop the client."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
         self._client = None
+        self._connect_lock = asyncio.Lock()
 
 
 # Global database instance
 _db = Database()
 
 
-def get_db() -> Client:
+async def connect_db() -> None:
+    """Connect the global database instance (started by the app lifespan)."""
+    await _db.connect()
+
+
+async def disconnect_db() -> None:
+    """Close the global database instance (called from the app lifespan)."""
+    await _db.close()
+
+
+async def get_db() -> "AsyncClient":
     """
-    Dependency injection for Supabase client.
-    
+    Dependency injection for the async Supabase client.
+
+    Waits for the connection if the lifespan warm-up has not finished yet.
+
     Usage:
         @app.get("/items")
-        def get_items(db: Annotated[Client, Depends(get_db)]):
+        async def get_items(db: DatabaseDep):
+            response = await db.table("items").select("*").execute()
             ...
     """
-    return _db.client
+    return await _db.connect()
 
 
 # Type alias for dependency injection
-DatabaseDep = Annotated[Client, Depends(get_db)]
-
+if TYPE_CHECKING:
+    DatabaseDep = Annotated[AsyncClient, Depends(get_db)]
+else:
+    # Resolved at runtime without importing supabase
+    DatabaseDep = Annotated[Any, Depends(get_db)]
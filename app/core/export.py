@@ -0,0 +1,170 @@
+"""Streaming NDJSON/CSV encoding of paged query results."""
+import asyncio
+import csv
+import io
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from app.core.metrics import export_rows_total, exports_total
+from app.core.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+Rows = List[Dict[str, Any]]
+
+
+def encode_ndjson(rows: Rows) -> bytes:
+    """One JSON document per row, each followed by a newline."""
+    if not rows:
+        return b""
+    return b"\n".join(map(dumps, rows)) + b"\n"
+
+
+class CSVEncoder:
+    """
+    Encode rows as CSV chunks with a fixed column order.
+
+    Missing and NULL values become empty cells; columns not in ``columns``
+    are ignored.
+
+    Args:
+        columns: Header row and column order
+    """
+
+    def __init__(self, columns: Sequence[str]) -> None:
+        self.columns = list(columns)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def header(self) -> bytes:
+        """The header line."""
+        return self._encode([self.columns])
+
+    def __call__(self, rows: Rows) -> bytes:
+        columns = self.columns
+        return self._encode([[row.get(column) for column in columns] for row in rows])
+
+    def _encode(self, lines: List[List[Any]]) -> bytes:
+        self._writer.writerows(lines)
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data.encode("utf-8")
+
+
+async def prefetch_pages(
+    fetch: Callable[[Optional[Rows]], Awaitable[Rows]],
+    page_size: int,
+    first: Optional[Rows] = None,
+) -> AsyncGenerator[Rows, None]:
+    """
+    Yield pages from ``fetch``, fetching the next page while the caller
+    consumes the current one.
+
+    At most two pages are held at a time, so memory stays flat however many
+    rows there are. The first page is always yielded (possibly empty);
+    iteration stops after a short page. Closing the iterator (or cancelling
+    the task iterating it) cancels the fetch in progress.
+
+    Args:
+        fetch: Returns the page after the given one (``None`` for the first)
+        page_size: Rows ``fetch`` returns for a full page
+        first: The first page, if already fetched
+    """
+    rows = first if first is not None else await fetch(None)
+    next_page: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if len(rows) >= page_size:
+                next_page = asyncio.ensure_future(fetch(rows))
+            yield rows
+            if next_page is None:
+                return
+            rows, next_page = await next_page, None
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+
+
+async def stream_export(
+    pages: AsyncGenerator[Rows, None],
+    encode: Callable[[Rows], bytes],
+    export_format: str,
+    header: bytes = b"",
+) -> AsyncIterator[bytes]:
+    """
+    Encode ``pages`` chunk by chunk for a ``StreamingResponse``.
+
+    Exports that fail or are cancelled (the client disconnected) are logged
+    and counted; ``pages`` is closed either way. A failure is re-raised so
+    the connection is aborted instead of ending in a body that looks
+    complete.
+
+    Args:
+        pages: Row pages, e.g. from ``prefetch_pages``
+        encode: Encodes one page (``encode_ndjson`` or a ``CSVEncoder``)
+        export_format: Metric label
+        header: Sent before the first page
+    """
+    rows_sent = 0
+    outcome = "completed"
+    try:
+        if header:
+            yield header
+        async for rows in pages:
+            if rows:
+                yield encode(rows)
+                rows_sent += len(rows)
+                export_rows_total.inc((export_format,), len(rows))
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        logger.info("Export cancelled after %d rows", rows_sent)
+        raise
+    except Exception:
+        outcome = "failed"
+        logger.exception("Export failed after %d rows", rows_sent)
+        raise
+    finally:
+        exports_total.inc((export_format, outcome))
+        await pages.aclose()
+
+
+class ExportResponse(StreamingResponse):
+    """
+    ``StreamingResponse`` that always closes its body iterator and runs
+    ``on_close`` once the response is over, including when the client
+    disconnected before the first chunk was sent.
+
+    Args:
+        content: Async iterator of body chunks (e.g. ``stream_export``)
+        status_code: Response status
+        on_close: Called once the response is finished or abandoned
+        **kwargs: Passed to ``StreamingResponse``
+    """
+
+    def __init__(
+        self,
+        content: AsyncGenerator[bytes, None],
+        status_code: int = 200,
+        on_close: Optional[Callable[[], None]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(content, status_code, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                await self.body_iterator.aclose()
+            finally:
+                if self.on_close is not None:
+                    self.on_close()
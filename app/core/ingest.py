@@ -0,0 +1,168 @@
+"""Incremental NDJSON parsing and batched ingestion of uploaded rows."""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+from app.core.batching import InsertResult
+
+
+class LineTooLong(ValueError):
+    """An NDJSON line exceeded the configured maximum length."""
+
+
+class LineSplitter:
+    """
+    Split a byte stream into lines without holding more than one line.
+
+    Only the unterminated tail of the last chunk is kept between chunks, so
+    memory is bounded by ``max_line_bytes`` plus the chunk size.
+
+    Args:
+        max_line_bytes: Longest accepted line, excluding the newline
+
+    Raises:
+        LineTooLong: From ``feed``/``close`` when a line is longer
+    """
+
+    def __init__(self, max_line_bytes: int) -> None:
+        self.max_line_bytes = max_line_bytes
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Return the lines completed by ``chunk``."""
+        if b"\n" not in chunk:
+            self._tail += chunk
+            self._check(self._tail)
+            return []
+        lines = (self._tail + chunk).split(b"\n")
+        self._tail = lines.pop()
+        self._check(self._tail)
+        for line in lines:
+            self._check(line)
+        return lines
+
+    def close(self) -> List[bytes]:
+        """Return the final line if the stream did not end with a newline."""
+        tail, self._tail = self._tail, b""
+        return [tail] if tail else []
+
+    def _check(self, line: bytes) -> None:
+        if len(line) > self.max_line_bytes:
+            raise LineTooLong(f"Line longer than {self.max_line_bytes} bytes")
+
+
+class IngestReport:
+    """
+    Outcome of an ingest: counts and per-line errors (the first ``max_errors``).
+
+    Line numbers are 1-based and count blank lines, so they match the
+    uploaded file.
+    """
+
+    __slots__ = ("lines", "created", "failed", "errors", "max_errors")
+
+    def __init__(self, max_errors: int) -> None:
+        self.lines = 0
+        self.created = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.max_errors = max_errors
+
+    def error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "lines": self.lines,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def ingest_ndjson(
+    chunks: AsyncIterator[bytes],
+    parse: Callable[[bytes], dict],
+    insert: Callable[[List[dict]], Awaitable[List[InsertResult]]],
+    batch_size: int = 500,
+    max_line_bytes: int = 1024 * 1024,
+    max_errors: int = 1000,
+) -> IngestReport:
+    """
+    Parse an NDJSON stream line by line and insert the valid rows in batches.
+
+    One batch is inserted while the next one is parsed; reading waits for
+    the previous insert before starting another, so at most two batches
+    are held and a slow database slows the upload down (backpressure)
+    instead of buffering it. Blank lines are skipped.
+
+    Args:
+        chunks: Request body chunks
+        parse: Validates one line and returns the row to insert; raises
+            ``ValueError`` with a message for invalid lines
+        insert: Inserts a batch and returns one result per row
+        batch_size: Rows per insert
+        max_line_bytes: Longest accepted line
+        max_errors: Per-line errors kept in the report (all are counted)
+
+    Raises:
+        LineTooLong: If a line exceeds ``max_line_bytes``
+        httpx.TransportError: If the database is unavailable; rows of
+            earlier batches have been written
+    """
+    report = IngestReport(max_errors)
+    splitter = LineSplitter(max_line_bytes)
+    rows: List[dict] = []
+    row_lines: List[int] = []
+    pending: Optional[asyncio.Future] = None
+
+    def parse_lines(lines: List[bytes]) -> None:
+        for line in lines:
+            report.lines += 1
+            if not line.strip():
+                continue
+            try:
+                rows.append(parse(line))
+            except ValueError as e:
+                report.error(report.lines, str(e))
+                continue
+            row_lines.append(report.lines)
+
+    async def insert_batch(batch: List[dict], line_numbers: List[int]) -> Tuple[List[InsertResult], List[int]]:
+        return await insert(batch), line_numbers
+
+    async def wait_pending() -> None:
+        nonlocal pending
+        if pending is None:
+            return
+        previous, pending = pending, None
+        results, line_numbers = await previous
+        for line_number, result in zip(line_numbers, results):
+            if isinstance(result, httpx.TransportError):
+                raise result
+            if isinstance(result, Exception):
+                report.error(line_number, str(result))
+            else:
+                report.created += 1
+
+    async def flush() -> None:
+        nonlocal pending
+        await wait_pending()
+        pending = asyncio.ensure_future(insert_batch(rows[:batch_size], row_lines[:batch_size]))
+        del rows[:batch_size], row_lines[:batch_size]
+
+    try:
+        async for chunk in chunks:
+            parse_lines(splitter.feed(chunk))
+            while len(rows) >= batch_size:
+                await flush()
+        parse_lines(splitter.close())
+        while rows:
+            await flush()
+        await wait_pending()
+    finally:
+        if pending is not None:
+            pending.cancel()
+    return report
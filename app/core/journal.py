@@ -0,0 +1,512 @@
+"""Write-behind ingestion: a local append-only journal drained to the database."""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import httpx
+from postgrest.exceptions import APIError
+from app.core.batching import insert_rows, is_row_rejection
+from app.core.config import settings
+from app.core.metrics import journal_pending_rows, journal_rows_total
+from app.core.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_NAME = re.compile(r"^segment-(\d+)\.jsonl$")
+_WORKER_NAME = re.compile(r"^worker-[0-9a-f]{32}$")
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+# Held by the process that owns a worker directory
+LOCK_FILE = "lock"
+# Serializes claiming and adopting worker directories under the root
+_ROOT_LOCK_FILE = ".lock"
+
+
+class JournalFull(Exception):
+    """The journal already holds ``max_pending`` unflushed rows."""
+
+
+class _Entry:
+    """A journaled row waiting to be inserted."""
+
+    __slots__ = ("id", "row", "segment", "attempts")
+
+    def __init__(self, entry_id: str, row: dict, segment: int = 0):
+        self.id = entry_id
+        self.row = row
+        self.segment = segment
+        self.attempts = 0
+
+
+# Failures that say nothing about the rows themselves (database unreachable, timeouts,
+# open circuit); 5xx APIErrors are transient too, see ``is_transient``
+TRANSIENT_ERRORS = (httpx.TransportError, ConnectionError)
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether ``error`` is the database failing (retried indefinitely) rather than rejecting rows."""
+    if isinstance(error, APIError):
+        return not is_row_rejection(error)
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class WriteBehindJournal:
+    """
+    Durable write-behind buffer for inserts into one table.
+
+    ``append`` writes the row to the current journal segment
+    (``segment-<n>.jsonl``, one JSON object per line) and returns once it
+    has been fsynced. Appends that arrive while a write is
+    in progress are written and fsynced together (group commit), so the
+    fsync cost is shared under load.
+
+    A background flusher inserts journaled rows in batches of up to
+    ``batch_size``, waiting up to ``flush_interval`` seconds for a batch to
+    fill. Transient failures (database unreachable, timeouts, an open
+    circuit, 5xx responses) are retried for as long as they last, with
+    exponential backoff up to ``max_backoff`` seconds, and do not count as
+    attempts; rows the database rejects ``max_attempts`` times are moved to
+    ``dead-letter.jsonl``.
+    Segments are deleted once all their rows are flushed.
+
+    Several processes (uvicorn workers) may share ``directory``: each one
+    writes to its own ``worker-<id>`` subdirectory, which it keeps locked
+    with ``flock`` while open. ``open`` adopts the segments of worker
+    directories whose lock can be taken (their process closed or died) and
+    replays them; directories of live workers are left alone.
+
+    Delivery is at least once: rows flushed shortly before a crash may be
+    inserted again on replay.
+
+    Args:
+        directory: Journal root directory, shared by workers (created if missing)
+        table: Table rows are inserted into
+        max_pending: Unflushed rows accepted before ``append`` raises ``JournalFull``
+        batch_size: Rows per insert
+        flush_interval: Seconds to wait for a batch to fill
+        segment_bytes: Segment size after which a new segment is started
+        max_attempts: Database rejections before a row is dead-lettered
+        max_backoff: Longest pause between retries (seconds)
+        on_flush: Called after rows have been inserted
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        table: str,
+        max_pending: int = 100000,
+        batch_size: int = 500,
+        flush_interval: float = 0.1,
+        segment_bytes: int = 16 * 1024 * 1024,
+        max_attempts: int = 5,
+        max_backoff: float = 30.0,
+        on_flush: Optional[Callable[[], None]] = None,
+    ):
+        self.directory = directory
+        self.table = table
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.on_flush = on_flush
+        self.is_open = False
+        # This process's subdirectory of ``directory`` while open
+        self.worker_directory: Optional[str] = None
+        self._lock_fd: Optional[int] = None
+        self._pending: Deque[_Entry] = deque()
+        self._unflushed: Dict[int, int] = {}
+        self._segment = 0
+        self._segment_size = 0
+        self._buffer: List[Tuple[bytes, _Entry, asyncio.Future]] = []
+        # Rows being written to the journal or inserted right now
+        self._in_flight = 0
+        self._commit_task: Optional[asyncio.Task] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    @property
+    def pending(self) -> int:
+        """Rows accepted and not yet inserted (or dead-lettered)."""
+        return len(self._pending) + len(self._buffer) + self._in_flight
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.worker_directory, name)
+
+    def _segment_path(self, segment: int) -> str:
+        return self._path(f"segment-{segment:012d}.jsonl")
+
+    async def open(self) -> int:
+        """
+        Load unflushed rows left by a previous run and start accepting appends.
+
+        Returns:
+            Number of rows replayed
+
+        Raises:
+            RuntimeError: If the journal is already open
+        """
+        if self._lock_fd is not None:
+            raise RuntimeError("Write-behind journal is already open")
+        entries, segments = await asyncio.to_thread(self._load)
+        self._pending = deque(entries)
+        self._unflushed = {}
+        for entry in entries:
+            self._unflushed[entry.segment] = self._unflushed.get(entry.segment, 0) + 1
+        # Continue after the last segment; replayed ones are never appended to
+        self._segment = max(segments, default=0) + 1
+        self._segment_size = 0
+        self._wake = asyncio.Event()
+        self.is_open = True
+        journal_pending_rows.set(len(self._pending))
+        if entries:
+            logger.info("Replaying %d journaled rows from %d segment(s)", len(entries), len(segments))
+            self._wake.set()
+        return len(entries)
+
+    def _load(self) -> Tuple[List[_Entry], List[int]]:
+        os.makedirs(self.directory, exist_ok=True)
+        root_lock = os.open(os.path.join(self.directory, _ROOT_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(root_lock, fcntl.LOCK_EX)
+            self._claim_worker_directory()
+            segments = self._adopt_orphans()
+        finally:
+            os.close(root_lock)
+        entries: List[_Entry] = []
+        for segment in segments:
+            found = 0
+            with open(self._segment_path(segment), "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A write torn by a crash; it was never acknowledged
+                        logger.warning("Skipping unreadable line in journal segment %d", segment)
+                        continue
+                    entries.append(_Entry(record["id"], record["row"], segment))
+                    found += 1
+            if not found:
+                os.remove(self._segment_path(segment))
+        return entries, segments
+
+    def _claim_worker_directory(self) -> None:
+        worker_directory = os.path.join(self.directory, f"worker-{uuid.uuid4().hex}")
+        os.mkdir(worker_directory)
+        fd = os.open(os.path.join(worker_directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        # Cannot block: nobody else knows the directory yet
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.worker_directory = worker_directory
+        self._lock_fd = fd
+
+    def _adopt_orphans(self) -> List[int]:
+        """Move segments of unlocked worker directories into ours; returns our segments, in order."""
+        segments: List[int] = []
+        # Segments directly in the root predate per-worker directories
+        sources = [self.directory] + sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if _WORKER_NAME.match(name) and os.path.join(self.directory, name) != self.worker_directory
+        )
+        for source in sources:
+            lock_fd = None
+            if source != self.directory:
+                try:
+                    lock_fd = os.open(os.path.join(source, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+                except FileNotFoundError:
+                    continue
+                try:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # A live worker owns it
+                    os.close(lock_fd)
+                    continue
+            try:
+                names = sorted(
+                    (int(match.group(1)), match.group(0))
+                    for match in map(_SEGMENT_NAME.match, os.listdir(source))
+                    if match
+                )
+                for _, name in names:
+                    segment = len(segments) + 1
+                    os.replace(os.path.join(source, name), self._segment_path(segment))
+                    segments.append(segment)
+                if names:
+                    _fsync_directory(self.worker_directory)
+                    _fsync_directory(source)
+                    logger.info("Adopted %d journal segment(s) from %s", len(names), source)
+                if lock_fd is not None:
+                    _remove_worker_directory(source)
+            finally:
+                if lock_fd is not None:
+                    os.close(lock_fd)
+        return segments
+
+    async def append(self, row: dict) -> str:
+        """
+        Journal ``row`` for insertion.
+
+        Returns:
+            Journal id of the row, once it is durably on disk
+
+        Raises:
+            JournalFull: If ``max_pending`` rows are already waiting
+            RuntimeError: If the journal is not open
+            OSError: If the journal could not be written
+        """
+        if not self.is_open:
+            raise RuntimeError("Write-behind journal is not open")
+        if self.pending >= self.max_pending:
+            raise JournalFull(f"{self.pending} rows waiting to be written")
+
+        entry = _Entry(uuid.uuid4().hex, row)
+        line = dumps({"id": entry.id, "row": row}) + b"\n"
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((line, entry, future))
+        if self._commit_task is None:
+            self._commit_task = asyncio.create_task(self._commit())
+        await future
+        return entry.id
+
+    async def _commit(self) -> None:
+        try:
+            while self._buffer:
+                batch, self._buffer = self._buffer, []
+                self._in_flight += len(batch)
+                data = b"".join(line for line, _, _ in batch)
+                if self._segment_size and self._segment_size + len(data) > self.segment_bytes:
+                    self._segment += 1
+                    self._segment_size = 0
+                segment = self._segment
+                try:
+                    await asyncio.to_thread(self._write, segment, data, self._segment_size == 0)
+                except OSError as e:
+                    self._in_flight -= len(batch)
+                    # Never append after a possibly partial write
+                    self._segment += 1
+                    self._segment_size = 0
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self._in_flight -= len(batch)
+                self._segment_size += len(data)
+                self._unflushed[segment] = self._unflushed.get(segment, 0) + len(batch)
+                for _, entry, future in batch:
+                    entry.segment = segment
+                    self._pending.append(entry)
+                    if not future.done():
+                        future.set_result(None)
+                journal_pending_rows.set(self.pending)
+                self._wake.set()
+        finally:
+            self._commit_task = None
+
+    def _write(self, segment: int, data: bytes, new_segment: bool) -> None:
+        with open(self._segment_path(segment), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if new_segment:
+            # Make the new file's directory entry durable too
+            _fsync_directory(self.worker_directory)
+
+    def start(self, get_db: Callable[[], Awaitable[Any]]) -> None:
+        """Start the background flusher; ``get_db`` returns the database client."""
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run(get_db), name="journal-flusher")
+
+    async def _run(self, get_db: Callable[[], Awaitable[Any]]) -> None:
+        failures = 0
+        while True:
+            if not self._pending:
+                self._wake.clear()
+                await self._wake.wait()
+            if len(self._pending) < self.batch_size:
+                # Let the batch fill up
+                await asyncio.sleep(self.flush_interval)
+            try:
+                flushed = await self.flush_once(await get_db())
+            except Exception:
+                logger.exception("Journal flush failed")
+                flushed = False
+            if flushed:
+                failures = 0
+            else:
+                failures += 1
+                # Exponent capped: an outage can last any number of retries
+                await asyncio.sleep(min(self.flush_interval * 2 ** min(failures, 32), self.max_backoff))
+
+    async def flush_once(self, db: Any) -> bool:
+        """
+        Insert the next batch of journaled rows.
+
+        Returns:
+            False if some rows failed and should be retried after a pause
+        """
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        if not batch:
+            return True
+
+        self._in_flight += len(batch)
+        try:
+            results = await self._insert(db, [entry.row for entry in batch])
+        except BaseException:
+            # Cancelled (shutdown): keep the rows for the next attempt or replay
+            self._pending.extendleft(reversed(batch))
+            raise
+        finally:
+            self._in_flight -= len(batch)
+        done: List[_Entry] = []
+        dead: List[Tuple[_Entry, Exception]] = []
+        retry: List[_Entry] = []
+        for entry, result in zip(batch, results):
+            if not isinstance(result, Exception):
+                done.append(entry)
+            elif is_transient(result):
+                retry.append(entry)
+            else:
+                entry.attempts += 1
+                if entry.attempts >= self.max_attempts:
+                    dead.append((entry, result))
+                else:
+                    retry.append(entry)
+
+        if dead:
+            await asyncio.to_thread(self._dead_letter, dead)
+            logger.error("Moved %d journaled rows to %s", len(dead), DEAD_LETTER_FILE)
+        # Failed rows go back to the front, keeping their order
+        self._pending.extendleft(reversed(retry))
+        for entry in done:
+            self._unflushed[entry.segment] -= 1
+        for entry, _ in dead:
+            self._unflushed[entry.segment] -= 1
+        await self._remove_flushed_segments()
+
+        journal_rows_total.inc(("flushed",), len(done))
+        journal_rows_total.inc(("dead_lettered",), len(dead))
+        journal_rows_total.inc(("retried",), len(retry))
+        journal_pending_rows.set(self.pending)
+        if done and self.on_flush is not None:
+            self.on_flush()
+        return not retry
+
+    async def _insert(self, db: Any, rows: List[dict]) -> List[Any]:
+        try:
+            # Rejected batches are split to find the bad rows; nothing else is retried here
+            return await insert_rows(db, self.table, rows)
+        except httpx.TransportError as e:
+            # Database unreachable: retry the whole batch later
+            return [e] * len(rows)
+
+    async def _remove_flushed_segments(self) -> None:
+        removable = [
+            segment for segment, count in self._unflushed.items()
+            if count == 0 and (segment != self._segment or self._commit_task is None)
+        ]
+        if not removable:
+            return
+        for segment in removable:
+            del self._unflushed[segment]
+        if self._segment in removable:
+            # Start a fresh segment for the next append
+            self._segment += 1
+            self._segment_size = 0
+        await asyncio.to_thread(self._remove, removable)
+
+    def _remove(self, segments: List[int]) -> None:
+        for segment in segments:
+            try:
+                os.remove(self._segment_path(segment))
+            except FileNotFoundError:
+                pass
+
+    def _dead_letter(self, dead: List[Tuple[_Entry, Exception]]) -> None:
+        # Shared by all workers: one locked write keeps their lines whole
+        data = b"".join(
+            dumps({"id": entry.id, "row": entry.row, "error": str(error)}) + b"\n"
+            for entry, error in dead
+        )
+        with open(os.path.join(self.directory, DEAD_LETTER_FILE), "ab") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """
+        Stop accepting rows, try to flush what is pending, and stop the flusher.
+
+        Rows still pending after ``timeout`` seconds stay in the journal and
+        are replayed by the next ``open`` (of any worker).
+        """
+        self.is_open = False
+        if self._commit_task is not None:
+            await asyncio.shield(self._commit_task)
+        if self._flusher is not None:
+            if self._pending and not self._flusher.done():
+                self._wake.set()
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + timeout
+                while self._pending and not self._flusher.done() and loop.time() < deadline:
+                    await asyncio.sleep(0.01)
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._lock_fd is not None:
+            await asyncio.to_thread(self._release, not self.pending)
+
+    def _release(self, empty: bool) -> None:
+        try:
+            if empty:
+                self._remove(list(self._unflushed))
+                self._unflushed = {}
+                _remove_worker_directory(self.worker_directory)
+        finally:
+            # Unlocked, a directory with rows left is adopted by the next ``open``
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            self.worker_directory = None
+
+
+def _fsync_directory(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _remove_worker_directory(path: str) -> None:
+    """Remove a worker directory whose segments are gone; the caller holds its lock."""
+    try:
+        os.remove(os.path.join(path, LOCK_FILE))
+        os.rmdir(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        # Something unexpected was left in it; keep it for inspection
+        logger.warning("Could not remove journal directory %s: %s", path, e)
+
+
+def build_items_journal(on_flush: Optional[Callable[[], None]] = None) -> WriteBehindJournal:
+    """Create the items journal configured by ``ITEMS_JOURNAL_*`` settings."""
+    return WriteBehindJournal(
+        settings.items_journal_dir,
+        settings.items_table,
+        max_pending=settings.items_journal_max_pending,
+        batch_size=settings.items_journal_batch_size,
+        flush_interval=settings.items_journal_flush_interval_ms / 1000,
+        segment_bytes=settings.items_journal_segment_bytes,
+        max_attempts=settings.items_journal_max_attempts,
+        max_backoff=settings.items_journal_max_backoff,
+        on_flush=on_flush,
+    )
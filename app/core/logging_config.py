@@ -0,0 +1,141 @@
+"""Non-blocking logging setup: queue-backed handlers, JSON lines and sampling."""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from app.core.config import settings
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "taskName",
+}
+
+_listener: Optional[QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as single-line JSON objects, including ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRS:
+                payload[name] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    ``QueueHandler`` for an in-process listener thread.
+
+    Records are enqueued as-is rather than copied and pre-formatted (the
+    stdlib default, needed only for cross-process queues); the message is
+    merged with its args up front so later mutation of the args cannot
+    change it, and formatting, including tracebacks, happens on the
+    listener thread. Records are dropped instead of blocking when the queue
+    is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLogSampler:
+    """
+    Decide whether to log a request/response line for a route.
+
+    Args:
+        default_rate: Fraction of requests logged (0.0 - 1.0)
+        route_rates: Per-route overrides keyed by route path (e.g. ``/health``)
+    """
+
+    def __init__(self, default_rate: float = 1.0, route_rates: Optional[Dict[str, float]] = None):
+        self.default_rate = default_rate
+        self.route_rates = route_rates or {}
+
+    def rate(self, route: str) -> float:
+        return self.route_rates.get(route, self.default_rate)
+
+    def sample(self, route: str) -> bool:
+        rate = self.rate(route)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        return random.random() < rate
+
+
+def build_formatter() -> logging.Formatter:
+    """Formatter for the configured ``log_format``."""
+    if settings.log_format.lower() == "json":
+        return JSONFormatter()
+    return logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+
+
+def setup_logging() -> None:
+    """
+    Route all logging through a queue drained by a background thread.
+
+    The root logger gets a ``QueueHandler``, so callers on the event loop
+    only enqueue records; formatting and stream I/O happen on the listener
+    thread. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(build_formatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(getattr(logging, settings.log_level.upper(), logging.INFO))
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
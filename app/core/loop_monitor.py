@@ -0,0 +1,145 @@
+"""Event loop lag measurement and blocked-loop detection."""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, Optional
+from app.core.config import settings
+from app.core.metrics import event_loop_blocked_total, event_loop_lag_seconds
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.9, 0.99, 1.0)
+
+
+class LoopMonitor:
+    """
+    Measure event loop lag and capture the stack of whatever blocks it.
+
+    A task on the loop sleeps ``interval`` seconds at a time; how late each
+    wake-up is, is the lag every other callback waiting to run saw. Lag
+    percentiles over the last ``window`` samples are exported as the
+    ``event_loop_lag_seconds`` gauge.
+
+    Each wake-up also stamps a heartbeat. A daemon watchdog thread checks
+    it, and when the loop has not come back for ``block_threshold`` seconds
+    beyond the sleep it logs the loop thread's current stack (once per
+    stall), i.e. the code that is blocking right now rather than whatever
+    runs after it. The task wakes every ``interval`` and the thread only
+    reads a timestamp, so the monitor is cheap enough to leave on.
+
+    Args:
+        interval: Seconds between lag samples
+        block_threshold: Seconds of lag after which the loop counts as blocked
+        window: Recent samples kept for percentiles
+        stack_limit: Innermost frames included in the logged stack
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        block_threshold: float = 0.1,
+        window: int = 1200,
+        stack_limit: int = 30,
+    ):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.stack_limit = stack_limit
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.blocked = 0
+        self._count = 0
+        self._publish_every = max(1, round(1 / interval))
+        self._heartbeat = 0.0
+        self._reported_heartbeat: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start sampling on the running loop and the watchdog thread."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample(), name="loop-monitor")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        """Stop sampling and the watchdog thread."""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            # The watchdog wakes at least every half threshold
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    def percentiles(self) -> Dict[float, float]:
+        """Lag percentiles (quantile -> seconds) over the recent samples."""
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {q: ordered[round(q * last)] for q in QUANTILES}
+
+    def record(self, lag: float) -> None:
+        """Add a lag sample, refreshing the exported percentiles once a second."""
+        self.samples.append(lag)
+        self._count += 1
+        if self._count % self._publish_every == 0:
+            for quantile, value in self.percentiles().items():
+                event_loop_lag_seconds.set(value, (str(quantile),))
+
+    async def _sample(self) -> None:
+        interval = self.interval
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.record(max(0.0, now - expected))
+
+    def _watch(self) -> None:
+        limit = self.interval + self.block_threshold
+        poll = max(0.01, self.block_threshold / 2)
+        while not self._stopped.wait(poll):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat
+            if stalled > limit and heartbeat != self._reported_heartbeat:
+                self._reported_heartbeat = heartbeat
+                self._report(stalled - self.interval)
+
+    def _report(self, blocked_for: float) -> None:
+        self.blocked += 1
+        event_loop_blocked_total.inc()
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=self.stack_limit)) if frame else ""
+        logger.warning(
+            "Event loop blocked for over %.0fms; current stack:\n%s",
+            blocked_for * 1000, stack,
+            extra={"blocked_ms": round(blocked_for * 1000, 1)},
+        )
+
+
+def build_loop_monitor() -> LoopMonitor:
+    """Create the monitor configured by the ``LOOP_*`` settings."""
+    return LoopMonitor(
+        interval=settings.loop_monitor_interval_ms / 1000,
+        block_threshold=settings.loop_block_threshold_ms / 1000,
+        window=settings.loop_monitor_window,
+    )
@@ -0,0 +1,262 @@
+"""Low-overhead in-process metrics with Prometheus text exposition."""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import httpx
+from app.core.tracing import span
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        self._values[labels] = value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram recorded in integer nanoseconds.
+
+    Each label set keeps a flat list of per-bucket counts plus sum and
+    count; ``observe_ns`` is a bisect and three increments, with no locks.
+    Cumulative counts are only computed when rendering.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._bounds_ns = [int(bound * 1e9) for bound in self.buckets]
+        # labels -> [bucket counts..., +Inf count, sum_ns]
+        self._series: Dict[Labels, List[int]] = {}
+
+    def observe_ns(self, duration_ns: int, labels: Labels = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [0] * (len(self._bounds_ns) + 2))
+        series[bisect_left(self._bounds_ns, duration_ns)] += 1
+        series[-1] += duration_ns
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self) -> Iterable[str]:
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            total = cumulative + series[-2]
+            label_str = _format_labels(self.labelnames, labels)
+            inf = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{inf} {total}"
+            yield f"{self.name}_sum{label_str} {series[-1] / 1e9!r}"
+            yield f"{self.name}_count{label_str} {total}"
+
+
+Collector = Callable[[], Iterable[str]]
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in Prometheus text format (0.0.4)."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Collector) -> None:
+        """Add a callable producing extra exposition lines at scrape time."""
+        self._collectors.append(collector)
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and the metrics recorded by the app
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route, method and status.",
+    ("method", "route", "status"),
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and method.",
+    ("method", "route"),
+)
+http_requests_rejected_total = registry.counter(
+    "http_requests_rejected_total", "Requests rejected by rate limiting or load shedding.",
+    ("reason",),
+)
+concurrency_limit = registry.gauge(
+    "concurrency_limit", "Current adaptive concurrency limit."
+)
+concurrency_queue_depth = registry.gauge(
+    "concurrency_queue_depth", "Requests waiting for a concurrency slot."
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."
+)
+journal_pending_rows = registry.gauge(
+    "journal_pending_rows", "Write-behind rows journaled and not yet inserted."
+)
+journal_rows_total = registry.counter(
+    "journal_rows_total", "Write-behind rows by flush outcome.", ("outcome",)
+)
+exports_total = registry.counter(
+    "exports_total", "Streaming exports by format and outcome.", ("format", "outcome")
+)
+export_rows_total = registry.counter(
+    "export_rows_total", "Rows sent by streaming exports.", ("format",)
+)
+event_loop_lag_seconds = registry.gauge(
+    "event_loop_lag_seconds", "Recent event loop scheduling lag percentiles.", ("quantile",)
+)
+event_loop_blocked_total = registry.counter(
+    "event_loop_blocked_total", "Times the event loop was blocked past the threshold."
+)
+db_request_duration_seconds = registry.histogram(
+    "db_request_duration_seconds", "Supabase REST call latency by method and table.",
+    ("method", "table"),
+)
+db_requests_total = registry.counter(
+    "db_requests_total", "Supabase REST calls by method, table and outcome.",
+    ("method", "table", "outcome"),
+)
+db_circuit_state = registry.gauge(
+    "db_circuit_state", "Database circuit breaker state (0 closed, 1 half-open, 2 open)."
+)
+db_circuit_transitions_total = registry.counter(
+    "db_circuit_transitions_total", "Database circuit breaker transitions by new state.", ("state",)
+)
+db_retries_total = registry.counter(
+    "db_retries_total", "Database reads retried, by the failure that caused the retry.", ("reason",)
+)
+db_hedged_requests_total = registry.counter(
+    "db_hedged_requests_total",
+    "Hedged database reads: fired, and whether the hedge won, lost or both failed.",
+    ("outcome",),
+)
+cache_invalidation_lag_seconds = registry.histogram(
+    "cache_invalidation_lag_seconds",
+    "Delay between a write on another instance and this instance dropping its cached entries.",
+)
+
+
+def _table_label(url: httpx.URL) -> str:
+    """``/rest/v1/items`` -> ``items``; anything else is reported by service."""
+    parts = url.path.strip("/").split("/")
+    if len(parts) >= 3 and parts[0] == "rest":
+        return parts[2]
+    return parts[0] or "unknown"
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper that times every database HTTP call (and traces it as a ``db`` span)."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        labels = (request.method, _table_label(request.url))
+        start = time.perf_counter_ns()
+        try:
+            with span("db", {"db.table": labels[1], "http.request.method": labels[0]}):
+                response = await self._transport.handle_async_request(request)
+        except Exception:
+            db_requests_total.inc(labels + ("error",))
+            raise
+        finally:
+            db_request_duration_seconds.observe_ns(time.perf_counter_ns() - start, labels)
+        db_requests_total.inc(labels + ("ok" if response.status_code < 400 else "http_error",))
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,36 @@
+"""Opaque cursor encoding for keyset pagination."""
+import base64
+import binascii
+import json
+from typing import Any, Dict
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """
+    Encode the sort-key values of the last row of a page as an opaque cursor.
+
+    Args:
+        values: Mapping of sort column to the last row's value
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = json.dumps(values, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Decode a cursor produced by ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, dict) or not values:
+        raise ValueError("Invalid cursor")
+    return values
@@ -0,0 +1,187 @@
+"""Per-request profilers and the on-disk store for their reports."""
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Union
+from app.core.config import settings
+
+# Report file names handed out by ``ProfileStore`` (no path separators)
+_REPORT_NAME = re.compile(r"^[\w.-]+\.(pstats|collapsed)$")
+_UNSAFE = re.compile(r"[^\w-]+")
+
+
+def _report_order(name: str):
+    """Sort key from the ``<epoch ms>-<seq>`` prefix of a report name."""
+    created, _, rest = name.partition("-")
+    seq = rest.partition("-")[0]
+    return (int(created), int(seq)) if created.isdigit() and seq.isdigit() else (0, 0)
+
+
+class CProfileProfiler:
+    """
+    Deterministic ``cProfile`` profile of the event loop thread.
+
+    Everything the loop runs while the profile is active is recorded,
+    including other requests interleaved with the profiled one. The
+    report is a pstats dump (``.pstats``).
+    """
+
+    extension = "pstats"
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def write(self, path: str) -> None:
+        self._profile.dump_stats(path)
+
+
+class SamplingProfiler:
+    """
+    Statistical profile of one thread, taken from another thread.
+
+    Every ``interval`` seconds the target thread's stack is read with
+    ``sys._current_frames()`` and counted. Overhead is per sample rather
+    than per call, so timings are not skewed. The report is in collapsed
+    stack format (``frame;frame;frame count`` per line) for flame graph
+    tools such as ``flamegraph.pl`` or speedscope.
+
+    Args:
+        interval: Seconds between samples
+    """
+
+    extension = "collapsed"
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            # Wakes within one interval
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+Profiler = Union[CProfileProfiler, SamplingProfiler]
+
+
+def build_profiler(kind: Optional[str] = None) -> Profiler:
+    """
+    Create a profiler.
+
+    Args:
+        kind: ``cprofile`` or ``sample``; ``PROFILING_PROFILER`` by default
+
+    Raises:
+        ValueError: If ``kind`` is unknown
+    """
+    kind = (kind or settings.profiling_profiler).lower()
+    if kind == "cprofile":
+        return CProfileProfiler()
+    if kind == "sample":
+        return SamplingProfiler(settings.profiling_sample_interval_ms / 1000)
+    raise ValueError(f"Unknown profiler: {kind}")
+
+
+class ProfileStore:
+    """
+    Rolling directory of profile reports.
+
+    Reports are named ``<epoch ms>-<seq>-<method>-<path>.<ext>`` and only
+    the newest ``max_files`` are kept. Methods that touch the disk are
+    blocking; call them from a worker thread.
+
+    Args:
+        directory: Where reports are written (created on first save)
+        max_files: Reports kept before the oldest are deleted
+    """
+
+    def __init__(self, directory: str, max_files: int = 100):
+        self.directory = directory
+        self.max_files = max_files
+        self._seq = itertools.count()
+
+    def new_name(self, method: str, path: str, extension: str) -> str:
+        """Report file name for a request (not yet written)."""
+        slug = _UNSAFE.sub("_", path.strip("/"))[:80] or "root"
+        return f"{int(time.time() * 1000)}-{next(self._seq)}-{method}-{slug}.{extension}"
+
+    def save(self, profiler: Profiler, name: str) -> str:
+        """Write ``profiler``'s report as ``name``, prune old reports and return its path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        profiler.write(path)
+        self._prune()
+        return path
+
+    def list(self) -> List[str]:
+        """Report names, newest first."""
+        try:
+            names = [name for name in os.listdir(self.directory) if _REPORT_NAME.match(name)]
+        except FileNotFoundError:
+            return []
+        return sorted(names, key=_report_order, reverse=True)
+
+    def path(self, name: str) -> Optional[str]:
+        """Path of an existing report, or None (also for names that are not reports)."""
+        if not _REPORT_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def _prune(self) -> None:
+        for name in self.list()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def pstats_summary(path: str, limit: int = 50) -> str:
+    """Text summary of a pstats dump: top ``limit`` functions by cumulative time."""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def build_profile_store() -> ProfileStore:
+    """Create the store configured by ``PROFILING_DIR``/``PROFILING_MAX_FILES``."""
+    return ProfileStore(settings.profiling_dir, settings.profiling_max_files)
@@ -0,0 +1,367 @@
+"""Whitelisted field projection, filters and sort order for list endpoints."""
+import math
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from app.core.pagination import decode_cursor, encode_cursor
+
+COMPARISON_OPERATORS = frozenset({"eq", "neq", "gt", "gte", "lt", "lte"})
+
+# Values accepted by a single ``in`` filter
+MAX_IN_VALUES = 100
+
+
+class QueryError(ValueError):
+    """A projection, filter, sort order or cursor the schema does not allow."""
+
+
+class QueryField:
+    """
+    A column clients may select, and optionally filter or sort on.
+
+    Args:
+        name: Column name
+        type: Value type (``int``, ``float``, ``str`` or ``datetime``);
+            filter and cursor values are validated against it
+        operators: Filter operators allowed on the column (``eq``, ``neq``,
+            ``gt``, ``gte``, ``lt``, ``lte``, ``in``, ``ilike``, ``is``)
+        sortable: Whether the column may appear in ``sort``
+        nullable: Whether the column can be NULL
+    """
+
+    __slots__ = ("name", "type", "operators", "sortable", "nullable")
+
+    def __init__(
+        self,
+        name: str,
+        type: type,
+        operators: Iterable[str] = (),
+        sortable: bool = False,
+        nullable: bool = False,
+    ) -> None:
+        self.name = name
+        self.type = type
+        self.operators: FrozenSet[str] = frozenset(operators)
+        self.sortable = sortable
+        self.nullable = nullable
+
+    def coerce(self, value: Any) -> Any:
+        """
+        Validate a filter value (a string) or a cursor value (decoded JSON).
+
+        Timestamps are checked but kept as ISO 8601 strings.
+
+        Raises:
+            QueryError: If the value does not fit the column
+        """
+        if value is None:
+            if self.nullable:
+                return None
+            raise QueryError(f"{self.name} cannot be null")
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            if self.type is int:
+                if isinstance(value, float):
+                    raise ValueError
+                return int(value)
+            if self.type is float:
+                number = float(value)
+                if not math.isfinite(number):
+                    raise ValueError
+                return number
+            if not isinstance(value, str):
+                raise ValueError
+            if self.type is datetime:
+                datetime.fromisoformat(value)
+            return value
+        except (TypeError, ValueError):
+            raise QueryError(f"Invalid value for {self.name}: {value!r}") from None
+
+
+def _literal(value: Any) -> str:
+    """Render a value for a PostgREST logic tree (``or=(...)``); strings are always quoted."""
+    if isinstance(value, str):
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return repr(value)
+
+
+class QueryPlan:
+    """
+    A validated projection, filter set and sort order.
+
+    Plans are immutable and shared between requests (see
+    ``QuerySchema.plan``); two plans are equal when their normalized query
+    strings (``key``) are.
+
+    Attributes:
+        key: Normalized query string (``""`` for the default plan)
+        fields: Requested columns, or ``None`` for every column
+        select: ``select()`` column list for offset pages
+        keyset_select: ``select()`` column list for keyset pages, which also
+            needs the sort columns of the last row
+        filters: ``(column, operator, value)`` triples, ANDed together
+        sort: ``(field, descending)`` pairs ending with the unique key
+    """
+
+    __slots__ = ("key", "fields", "select", "keyset_select", "filters", "sort")
+
+    def __init__(
+        self,
+        key: str,
+        fields: Optional[Tuple[str, ...]],
+        filters: Tuple[Tuple[str, str, Any], ...],
+        sort: Tuple[Tuple[QueryField, bool], ...],
+    ) -> None:
+        self.key = key
+        self.fields = fields
+        self.filters = filters
+        self.sort = sort
+        if fields is None:
+            self.select = self.keyset_select = "*"
+        else:
+            self.select = ",".join(fields)
+            extra = [field.name for field, _ in sort if field.name not in fields]
+            self.keyset_select = ",".join((*fields, *extra))
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, QueryPlan) and other.key == self.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f"QueryPlan({self.key!r})"
+
+    def apply(self, query: Any, keyset: bool = False) -> Any:
+        """
+        Add the plan's ``select``, filters and ``order`` to a postgrest query.
+
+        Args:
+            query: ``db.table(...)`` request builder
+            keyset: Select the sort columns too (needed to build a cursor)
+        """
+        query = query.select(self.keyset_select if keyset else self.select)
+        for column, operator, value in self.filters:
+            if operator == "in":
+                query = query.in_(column, value)
+            elif operator == "is":
+                query = query.is_(column, value)
+            else:
+                query = getattr(query, operator)(column, value)
+        for field, desc in self.sort:
+            # NULLs last in both directions, as the keyset condition assumes
+            if field.nullable:
+                query = query.order(field.name, desc=desc, nullsfirst=False)
+            else:
+                query = query.order(field.name, desc=desc)
+        return query
+
+    def encode_cursor(self, row: Dict[str, Any]) -> str:
+        """Cursor pointing just past ``row`` in this plan's sort order."""
+        return encode_cursor({field.name: row[field.name] for field, _ in self.sort})
+
+    def decode_cursor(self, cursor: str) -> Dict[str, Any]:
+        """
+        Decode and validate a cursor made by ``encode_cursor`` for this sort order.
+
+        Raises:
+            QueryError: If the cursor is malformed or belongs to another sort order
+        """
+        try:
+            values = decode_cursor(cursor)
+        except ValueError:
+            raise QueryError("Invalid cursor") from None
+        if len(values) != len(self.sort):
+            raise QueryError("Invalid cursor")
+        decoded = {}
+        for field, _ in self.sort:
+            if field.name not in values:
+                raise QueryError("Invalid cursor")
+            decoded[field.name] = field.coerce(values[field.name])
+        return decoded
+
+    def seek(self, query: Any, values: Dict[str, Any]) -> Any:
+        """Filter ``query`` to the rows following the cursor ``values``."""
+        if len(self.sort) == 1:
+            # Sorted by the unique key alone: a plain comparison
+            field, desc = self.sort[0]
+            return getattr(query, "lt" if desc else "gt")(field.name, values[field.name])
+        return query.or_(self.after(values))
+
+    def after(self, values: Dict[str, Any]) -> str:
+        """
+        PostgREST ``or`` filter matching the rows that follow the cursor ``values``.
+
+        For sort keys ``(a, b, id)`` this is ``a > x OR (a = x AND b > y) OR
+        (a = x AND b = y AND id > z)`` with ``<`` for descending keys; NULLs
+        sort last, so they follow every value of a nullable key.
+        """
+        disjuncts: List[str] = []
+        prefix: List[str] = []
+        for field, desc in self.sort:
+            name, value = field.name, values[field.name]
+            if value is None:
+                # Only rows that are NULL here too can follow
+                prefix.append(f"{name}.is.null")
+                continue
+            literal = _literal(value)
+            disjuncts.append(_and(*prefix, f"{name}.{'lt' if desc else 'gt'}.{literal}"))
+            if field.nullable:
+                disjuncts.append(_and(*prefix, f"{name}.is.null"))
+            prefix.append(f"{name}.eq.{literal}")
+        return ",".join(disjuncts)
+
+    def project(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop sort columns fetched for the cursor but not requested."""
+        if self.fields is None or self.keyset_select == self.select:
+            return rows
+        fields = self.fields
+        return [{name: row[name] for name in fields} for row in rows]
+
+
+def _and(*conditions: str) -> str:
+    return conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})"
+
+
+class QuerySchema:
+    """
+    The columns of a table clients may project, filter and sort on.
+
+    Query parameters use a small PostgREST-like grammar:
+
+    - ``fields=id,name``: columns to return (default: all)
+    - ``filter=price.gte.10`` (repeatable, ANDed): ``column.operator.value``,
+      with ``in.(a,b)`` lists and ``is.null``
+    - ``sort=-price,name``: sort columns, ``-`` for descending; the unique
+      key is appended as a tie-breaker so keyset cursors stay stable
+
+    Parsed plans are kept in a bounded LRU keyed by the normalized query
+    string, so repeated queries skip parsing and validation.
+
+    Args:
+        fields: Columns exposed to clients
+        unique_key: Non-null unique column ending every sort order
+        max_filters: Filters accepted per query
+        cache_size: Parsed plans kept
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[QueryField],
+        unique_key: str = "id",
+        max_filters: int = 10,
+        cache_size: int = 1024,
+    ) -> None:
+        self.fields: Dict[str, QueryField] = {field.name: field for field in fields}
+        if unique_key not in self.fields:
+            raise ValueError(f"Unknown unique key: {unique_key}")
+        self.unique_key = unique_key
+        self.max_filters = max_filters
+        self.cache_size = cache_size
+        self._plans: "OrderedDict[str, QueryPlan]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def plan(
+        self,
+        fields: Optional[str] = None,
+        filters: Sequence[str] = (),
+        sort: Optional[str] = None,
+    ) -> QueryPlan:
+        """
+        Parse and validate query parameters into a (cached) plan.
+
+        Args:
+            fields: Comma-separated columns to return
+            filters: ``column.operator.value`` expressions
+            sort: Comma-separated sort columns, ``-`` prefixed for descending
+
+        Raises:
+            QueryError: On an unknown column, disallowed operator, bad value,
+                or too many filters
+        """
+        if len(filters) > self.max_filters:
+            raise QueryError(f"At most {self.max_filters} filters per query")
+        field_names = _split(fields)
+        filter_terms = sorted({term.strip() for term in filters})
+        sort_terms = _split(sort)
+        key = "&".join(
+            [f"fields={','.join(field_names)}"] * (fields is not None)
+            + [f"filter={term}" for term in filter_terms]
+            + [f"sort={','.join(sort_terms)}"] * bool(sort_terms)
+        )
+
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+            return plan
+        plan = QueryPlan(
+            key,
+            self._parse_fields(field_names) if fields is not None else None,
+            tuple(self._parse_filter(term) for term in filter_terms),
+            self._parse_sort(sort_terms),
+        )
+        self._plans[key] = plan
+        if len(self._plans) > self.cache_size:
+            self._plans.popitem(last=False)
+        return plan
+
+    def _field(self, name: str) -> QueryField:
+        field = self.fields.get(name)
+        if field is None:
+            raise QueryError(f"Unknown field: {name}")
+        return field
+
+    def _parse_fields(self, names: List[str]) -> Tuple[str, ...]:
+        if not names:
+            raise QueryError("fields must name at least one field")
+        return tuple(self._field(name).name for name in names)
+
+    def _parse_filter(self, term: str) -> Tuple[str, str, Any]:
+        name, _, rest = term.partition(".")
+        operator, dot, operand = rest.partition(".")
+        if not dot:
+            raise QueryError(f"Invalid filter {term!r}; expected column.operator.value")
+        field = self._field(name)
+        if operator not in field.operators:
+            raise QueryError(f"Operator {operator!r} is not allowed on {name}")
+        if operator == "is":
+            if operand.lower() != "null":
+                raise QueryError(f"Invalid filter {term!r}; only is.null is supported")
+            return name, operator, None
+        if operator == "in":
+            if not (operand.startswith("(") and operand.endswith(")")):
+                raise QueryError(f"Invalid filter {term!r}; expected in.(a,b,...)")
+            values = [value.strip() for value in operand[1:-1].split(",")]
+            if not 0 < len(values) <= MAX_IN_VALUES:
+                raise QueryError(f"in filters take 1 to {MAX_IN_VALUES} values")
+            return name, operator, tuple(field.coerce(value) for value in values)
+        if operand == "":
+            raise QueryError(f"Invalid filter {term!r}; missing value")
+        return name, operator, field.coerce(operand)
+
+    def _parse_sort(self, terms: List[str]) -> Tuple[Tuple[QueryField, bool], ...]:
+        sort: List[Tuple[QueryField, bool]] = []
+        for term in terms:
+            desc = term.startswith("-")
+            field = self._field(term.lstrip("+-"))
+            if not field.sortable:
+                raise QueryError(f"Cannot sort by {field.name}")
+            if any(existing is field for existing, _ in sort):
+                raise QueryError(f"Duplicate sort field: {field.name}")
+            sort.append((field, desc))
+            if field.name == self.unique_key:
+                # Later keys could never break a tie
+                break
+        else:
+            sort.append((self.fields[self.unique_key], False))
+        return tuple(sort)
+
+
+def _split(value: Optional[str]) -> List[str]:
+    """Comma-separated names, stripped, de-duplicated, in order."""
+    if not value:
+        return []
+    return list(dict.fromkeys(part.strip() for part in value.split(",") if part.strip()))
@@ -0,0 +1,141 @@
+"""Token-bucket rate limiting keyed by client identity."""
+import time
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional, Tuple
+
+
+class Tier:
+    """
+    Rate for one class of client.
+
+    Args:
+        rate: Tokens (requests) added per second
+        burst: Bucket capacity, i.e. the largest burst allowed after idling
+    """
+
+    __slots__ = ("name", "rate", "burst")
+
+    def __init__(self, name: str, rate: float, burst: float):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Rate limit tier {name!r} needs rate > 0 and burst >= 1")
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+    @property
+    def refill_seconds(self) -> float:
+        """Time for an empty bucket to fill up again."""
+        return self.burst / self.rate
+
+
+class TokenBucket:
+    """Tokens left and when they were last refilled."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """
+    Token buckets per key, refilled lazily on access.
+
+    Each ``acquire`` is O(1): a dict lookup, an LRU move and arithmetic.
+    Buckets are kept in least-recently-used order; buckets idle longer than
+    the slowest tier's refill time are full again (indistinguishable from a
+    new bucket), so they are evicted from the LRU head as new keys arrive.
+    ``max_keys`` bounds memory regardless of traffic.
+
+    Args:
+        tiers: Tier name -> ``Tier``
+        max_keys: Most buckets kept at once
+        clock: Monotonic time source (seconds)
+    """
+
+    def __init__(
+        self,
+        tiers: Mapping[str, Tier],
+        max_keys: int = 100000,
+        clock=time.monotonic,
+    ):
+        if not tiers:
+            raise ValueError("At least one rate limit tier is required")
+        self.tiers = dict(tiers)
+        self.max_keys = max_keys
+        self._clock = clock
+        self._idle_ttl = max(tier.refill_seconds for tier in self.tiers.values())
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, tier: str) -> float:
+        """
+        Take one token for ``key``.
+
+        Args:
+            key: Client identity
+            tier: Name of the tier limiting this client
+
+        Returns:
+            0 if the request is allowed, otherwise seconds until a token is
+            available (for ``Retry-After``)
+        """
+        limits = self.tiers[tier]
+        now = self._clock()
+        bucket_key = (tier, key)
+        bucket = self._buckets.get(bucket_key)
+
+        if bucket is None:
+            bucket = TokenBucket(limits.burst, now)
+            self._buckets[bucket_key] = bucket
+            self._evict(now)
+        else:
+            self._buckets.move_to_end(bucket_key)
+            bucket.tokens = min(limits.burst, bucket.tokens + (now - bucket.updated) * limits.rate)
+            bucket.updated = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / limits.rate
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while len(buckets) > self.max_keys:
+            buckets.popitem(last=False)
+            self.evictions += 1
+        idle_before = now - self._idle_ttl
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if oldest.updated > idle_before:
+                break
+            buckets.popitem(last=False)
+            self.evictions += 1
+
+
+def parse_tiers(config: Mapping[str, Mapping[str, float]]) -> Dict[str, Tier]:
+    """
+    Build tiers from settings.
+
+    Args:
+        config: e.g. ``{"default": {"rate": 50, "burst": 100}}``
+
+    Raises:
+        ValueError: If a tier is missing ``rate`` or has invalid values
+    """
+    tiers = {}
+    for name, values in config.items():
+        try:
+            tiers[name] = Tier(name, float(values["rate"]), float(values.get("burst", values["rate"])))
+        except KeyError:
+            raise ValueError(f"Rate limit tier {name!r} has no rate")
+    return tiers
+
+
+def retry_after(seconds: Optional[float]) -> str:
+    """``Retry-After`` header value: whole seconds, at least 1."""
+    return str(max(1, int(-(-(seconds or 0) // 1))))
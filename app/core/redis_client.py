@@ -0,0 +1,253 @@
+"""Minimal asyncio Redis (RESP2) client for the shared cache tier."""
+import asyncio
+import logging
+import ssl
+from collections import deque
+from typing import Any, Deque, Optional, Tuple, Union
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+Arg = Union[str, bytes, int, float]
+
+
+class RedisError(Exception):
+    """Error reply from the server (``-ERR ...``)."""
+
+
+def encode_command(*args: Arg) -> bytes:
+    """Encode a command as a RESP array of bulk strings."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif not isinstance(arg, bytes):
+            arg = repr(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """
+    Read one RESP reply.
+
+    Error replies are returned as ``RedisError`` instances (not raised), so
+    an error inside an array does not desynchronize the stream.
+
+    Raises:
+        ConnectionError: If the connection closed mid-reply
+    """
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Redis connection closed")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"+":
+        return payload
+    if kind == b":":
+        return int(payload)
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    if kind == b"-":
+        return RedisError(payload.decode(errors="replace"))
+    raise ConnectionError(f"Unexpected Redis reply: {line[:50]!r}")
+
+
+class RedisClient:
+    """
+    Pipelined Redis client over a single connection.
+
+    Commands are written as soon as they are issued and replies are matched
+    to callers in order by one reader task, so concurrent requests share the
+    connection without waiting for each other's round trips. Each caller
+    waits for the socket buffer to drain after its write, so a slow server
+    pushes back instead of the buffer growing. The connection is opened on
+    first use and reopened after a failure; commands in flight when it
+    fails get ``ConnectionError``. A caller that is cancelled (e.g. by a
+    timeout) just has its reply discarded.
+
+    ``subscribe`` uses a dedicated connection, as pub/sub requires.
+
+    Args:
+        url: ``redis://[:password@]host[:port][/db]`` (``rediss://`` for TLS)
+        connect_timeout: Seconds to open a connection
+    """
+
+    def __init__(self, url: str, connect_timeout: float = 1.0) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("redis", "rediss"):
+            raise ValueError(f"Unsupported Redis URL scheme: {parts.scheme!r}")
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.username = unquote(parts.username) if parts.username else None
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.ssl = ssl.create_default_context() if parts.scheme == "rediss" else None
+        self.connect_timeout = connect_timeout
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Deque[asyncio.Future] = deque()
+        self._connect_lock = asyncio.Lock()
+
+    async def execute(self, *args: Arg) -> Any:
+        """
+        Run one command and return its reply.
+
+        Raises:
+            RedisError: On an error reply
+            ConnectionError, OSError: If the server is unreachable
+        """
+        writer = self._writer
+        if writer is None or writer.is_closing():
+            writer = await self._connect()
+        future = asyncio.get_running_loop().create_future()
+        writer.write(encode_command(*args))
+        self._pending.append(future)
+        try:
+            # Wait while the socket buffer is over its high-water mark
+            await writer.drain()
+        except ConnectionError:
+            # The reader task sees the connection drop and fails the reply
+            pass
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        reply = await future
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, px: Optional[int] = None) -> None:
+        if px is None:
+            await self.execute("SET", key, value)
+        else:
+            await self.execute("SET", key, value, "PX", px)
+
+    async def incr(self, key: str) -> int:
+        return await self.execute("INCR", key)
+
+    async def publish(self, channel: str, message: Arg) -> int:
+        return await self.execute("PUBLISH", channel, message)
+
+    async def subscribe(self, channel: str) -> "Subscription":
+        """
+        Subscribe to ``channel`` on a new connection.
+
+        Returns once the server has confirmed the subscription, so messages
+        published after this call are delivered.
+
+        Raises:
+            ConnectionError, OSError: If the server is unreachable
+        """
+        reader, writer = await self._open()
+        try:
+            writer.write(encode_command("SUBSCRIBE", channel))
+            await writer.drain()
+            reply = await asyncio.wait_for(read_reply(reader), self.connect_timeout)
+            if isinstance(reply, RedisError):
+                raise reply
+        except BaseException:
+            writer.close()
+            raise
+        return Subscription(reader, writer)
+
+    async def close(self) -> None:
+        """Close the command connection."""
+        writer, self._writer = self._writer, None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if writer is not None:
+            writer.close()
+        self._fail_pending(ConnectionError("Redis client closed"))
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl),
+            self.connect_timeout,
+        )
+        try:
+            setup = []
+            if self.password is not None:
+                auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+                setup.append(auth)
+            if self.db:
+                setup.append(("SELECT", self.db))
+            for command in setup:
+                writer.write(encode_command(*command))
+            await writer.drain()
+            for _ in setup:
+                reply = await asyncio.wait_for(read_reply(reader), self.connect_timeout)
+                if isinstance(reply, RedisError):
+                    raise reply
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return self._writer
+            reader, writer = await self._open()
+            self._writer = writer
+            self._reader_task = asyncio.create_task(self._read_replies(reader, writer), name="redis-reader")
+            return writer
+
+    async def _read_replies(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                reply = await read_reply(reader)
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_result(reply)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Redis connection to %s:%d lost: %s", self.host, self.port, e)
+            if self._writer is writer:
+                self._writer = None
+            writer.close()
+            self._fail_pending(ConnectionError(f"Redis connection lost: {e}"))
+
+    def _fail_pending(self, error: Exception) -> None:
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+
+class Subscription:
+    """
+    Messages published to a subscribed channel, read from a dedicated connection.
+
+    Iterating yields message payloads until the connection drops, which
+    raises ``ConnectionError``.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> bytes:
+        while True:
+            reply = await read_reply(self._reader)
+            if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                return reply[2]
+
+    def close(self) -> None:
+        self._writer.close()
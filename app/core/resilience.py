@@ -0,0 +1,377 @@
+"""Resilient database calls: operation timeouts, retries, circuit breaking and hedged reads."""
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+import httpx
+from app.core.config import settings
+from app.core.metrics import (
+    db_circuit_state,
+    db_circuit_transitions_total,
+    db_hedged_requests_total,
+    db_retries_total,
+)
+
+logger = logging.getLogger(__name__)
+
+# Reads PostgREST can safely repeat
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Upstream statuses worth retrying a read on
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Values exported by the db_circuit_state gauge
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(httpx.TransportError):
+    """
+    Raised instead of calling the database while the circuit is open.
+
+    Args:
+        message: Error message
+        retry_after: Seconds until the circuit lets a probe through
+    """
+
+    def __init__(self, message: str, retry_after: float, *, request: Optional[httpx.Request] = None):
+        super().__init__(message, request=request)
+        self.retry_after = retry_after
+
+
+class OperationTimeout(httpx.TimeoutException):
+    """A database call took longer than its operation timeout."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed, calls go through and ``failure_threshold`` failures in a row
+    open the circuit. Open, calls fail fast with ``CircuitOpenError`` for
+    ``reset_timeout`` seconds; then the circuit is half-open and lets up to
+    ``half_open_max_calls`` probe calls through. A successful probe closes
+    it again, a failed one reopens it.
+
+    Callers ``acquire`` before a call and ``release`` it with the outcome:
+    ``True`` for success, ``False`` for failure and ``None`` for a call
+    that was abandoned (e.g. cancelled) and says nothing about the database.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit
+        reset_timeout: Seconds the circuit stays open before probing
+        half_open_max_calls: Concurrent probe calls while half-open
+        clock: Monotonic clock (injectable for tests)
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        db_circuit_state.set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        """Current state; an open circuit turns half-open once ``reset_timeout`` has passed."""
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through (0 if it is not open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(self.reset_timeout - (self._clock() - self._opened_at), 0.0)
+
+    def acquire(self, request: Optional[httpx.Request] = None) -> bool:
+        """
+        Admit a call.
+
+        Returns:
+            Whether the call is a half-open probe (pass it back to ``release``)
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with all
+                probe slots taken
+        """
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        retry_after = self.retry_after() if state == OPEN else self.reset_timeout
+        raise CircuitOpenError(
+            f"Database circuit is {state}; failing fast", retry_after, request=request
+        )
+
+    def release(self, probe: bool, success: Optional[bool]) -> None:
+        """Record the outcome of a call admitted by ``acquire``."""
+        if probe:
+            self._probes -= 1
+            if success is True:
+                self._transition(CLOSED)
+            elif success is False:
+                self._open()
+            return
+        if self._state != CLOSED or success is None:
+            # Calls started before the circuit opened say nothing about now
+            return
+        if success:
+            self._failures = 0
+        else:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        self._opened_at = self._clock()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state != self._state:
+            log = logger.warning if state == OPEN else logger.info
+            log("Database circuit %s -> %s", self._state, state)
+            db_circuit_transitions_total.inc((state,))
+        self._state = state
+        self._failures = 0
+        db_circuit_state.set(_STATE_VALUES[state])
+
+
+class LatencyTracker:
+    """
+    Recent successful read latencies and the hedging delay derived from them.
+
+    The percentile is recomputed every ``recompute_every`` samples rather
+    than per request.
+
+    Args:
+        percentile: Latency percentile used as the hedging delay (0-1)
+        min_delay: Floor for the delay, in seconds
+        window: Samples kept
+        min_samples: Samples needed before hedging starts
+        recompute_every: Samples between recomputations
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay: float = 0.01,
+        window: int = 1000,
+        min_samples: int = 100,
+        recompute_every: int = 50,
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.recompute_every = recompute_every
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._count = 0
+        self._delay: Optional[float] = None
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+        self._count += 1
+        if self._count % self.recompute_every == 0 and len(self._samples) >= self.min_samples:
+            ordered = sorted(self._samples)
+            index = min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)
+            self._delay = max(ordered[index], self.min_delay)
+
+    @property
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or ``None`` until enough samples are in."""
+        return self._delay
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport wrapper guarding database calls.
+
+    Every call runs under an operation timeout (``read_timeout`` for
+    idempotent reads, ``write_timeout`` otherwise) covering the whole
+    response, which is read before it is returned. Transport errors,
+    timeouts and 5xx responses count as failures for the circuit breaker.
+    Reads that fail with a transport error or a 502/503/504 are retried up
+    to ``retry_attempts`` times with capped, fully jittered exponential
+    backoff; writes are never retried. With a latency tracker, a read still
+    running after the tracked percentile latency is hedged: a second
+    request is sent and whichever succeeds first is used.
+
+    Args:
+        transport: Transport performing the calls
+        breaker: Circuit breaker (``None`` disables it)
+        read_timeout: Seconds allowed per read attempt
+        write_timeout: Seconds allowed per write
+        retry_attempts: Extra attempts for a failed read
+        retry_backoff: Base backoff in seconds (doubled per attempt)
+        retry_max_backoff: Backoff cap in seconds
+        hedging: Latency tracker providing the hedging delay (``None``
+            disables hedging)
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        breaker: Optional[CircuitBreaker] = None,
+        read_timeout: float = 10.0,
+        write_timeout: float = 30.0,
+        retry_attempts: int = 2,
+        retry_backoff: float = 0.05,
+        retry_max_backoff: float = 1.0,
+        hedging: Optional[LatencyTracker] = None,
+    ):
+        self._transport = transport
+        self.breaker = breaker
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.retry_attempts = retry_attempts
+        self.retry_backoff = retry_backoff
+        self.retry_max_backoff = retry_max_backoff
+        self.hedging = hedging
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in IDEMPOTENT_METHODS:
+            return await self._attempt(request, self.write_timeout)
+
+        for attempt in range(self.retry_attempts + 1):
+            last = attempt == self.retry_attempts
+            try:
+                if self.hedging is not None:
+                    response = await self._hedged(request)
+                else:
+                    response = await self._attempt(request, self.read_timeout)
+            except CircuitOpenError:
+                raise
+            except httpx.TransportError as exc:
+                if last:
+                    raise
+                reason = type(exc).__name__
+            else:
+                if last or response.status_code not in RETRYABLE_STATUSES:
+                    return response
+                reason = str(response.status_code)
+                await response.aclose()
+            db_retries_total.inc((reason,))
+            await asyncio.sleep(random.uniform(
+                0, min(self.retry_max_backoff, self.retry_backoff * 2 ** attempt)
+            ))
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    async def _attempt(self, request: httpx.Request, timeout: float) -> httpx.Response:
+        """One call through the breaker, read in full under ``timeout``."""
+        breaker = self.breaker
+        probe = breaker.acquire(request) if breaker is not None else False
+        success: Optional[bool] = None
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self._send(request), timeout)
+        except asyncio.TimeoutError:
+            success = False
+            raise OperationTimeout(
+                f"Database call exceeded {timeout:g}s", request=request
+            ) from None
+        except httpx.TransportError:
+            success = False
+            raise
+        else:
+            success = response.status_code < 500
+            if success and self.hedging is not None and request.method in IDEMPOTENT_METHODS:
+                self.hedging.record(time.perf_counter() - start)
+            return response
+        finally:
+            if breaker is not None:
+                breaker.release(probe, success)
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        if response.is_stream_consumed:
+            # Built from bytes already (e.g. by a mock transport)
+            return response
+        try:
+            # Raw (still encoded) bytes, so the client decodes them as usual
+            content = b"".join([chunk async for chunk in response.aiter_raw()])
+        finally:
+            await response.aclose()
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(content),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    async def _hedged(self, request: httpx.Request) -> httpx.Response:
+        """Read with a second request fired if the first is slower than the hedging delay."""
+        delay = self.hedging.delay
+        if delay is None or (self.breaker is not None and self.breaker.state != CLOSED):
+            return await self._attempt(request, self.read_timeout)
+
+        first = asyncio.ensure_future(self._attempt(request, self.read_timeout))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+
+            db_hedged_requests_total.inc(("fired",))
+            hedge = asyncio.ensure_future(self._attempt(request, self.read_timeout))
+            pending.add(hedge)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer the request that was sent first when both finish together
+                succeeded = [t for t in sorted(done, key=lambda t: t is hedge) if t.exception() is None]
+                if succeeded:
+                    db_hedged_requests_total.inc(("won" if succeeded[0] is hedge else "lost",))
+                    return succeeded[0].result()
+            db_hedged_requests_total.inc(("failed",))
+            raise first.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+# Shared by every connection pool the app creates, so the circuit state
+# survives reconnects
+db_breaker = CircuitBreaker(
+    failure_threshold=settings.db_breaker_failure_threshold,
+    reset_timeout=settings.db_breaker_reset_timeout,
+)
+
+
+def build_resilient_transport(transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+    """Wrap ``transport`` as configured by the ``DB_*`` resilience settings."""
+    return ResilientTransport(
+        transport,
+        breaker=db_breaker if settings.db_breaker_enabled else None,
+        read_timeout=settings.db_read_operation_timeout,
+        write_timeout=settings.db_write_operation_timeout,
+        retry_attempts=settings.db_retry_attempts,
+        retry_backoff=settings.db_retry_backoff_ms / 1000,
+        retry_max_backoff=settings.db_retry_max_backoff_ms / 1000,
+        hedging=LatencyTracker(
+            percentile=settings.db_hedge_percentile,
+            min_delay=settings.db_hedge_min_delay_ms / 1000,
+        ) if settings.db_hedge_enabled else None,
+    )
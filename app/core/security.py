@@ -0,0 +1,242 @@
+"""
+JWT verification with cached JWKS and a verified-token cache.
+
+``jose.jwk`` and ``jose.jwt`` load the cryptography backends, so they are
+imported when keys are first built or a token is first verified rather
+than at application import (auth may not be configured at all).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Tuple
+import httpx
+from jose import JWTError
+from jose.exceptions import JOSEError
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from jose.backends.base import Key
+
+logger = logging.getLogger(__name__)
+
+JWKSFetcher = Callable[[], Awaitable[dict]]
+
+
+class JWKSCache:
+    """
+    Signing keys from a JWKS endpoint, fetched once and refreshed lazily.
+
+    Keys are served from memory. When the TTL expires the current keys keep
+    being served while a refresh runs in the background; an unknown ``kid``
+    triggers a refresh that concurrent callers share. Refreshes caused by
+    unknown ``kid`` values are rate limited so forged tokens cannot turn into
+    a request flood against the identity provider.
+    """
+
+    def __init__(
+        self,
+        fetch: JWKSFetcher,
+        algorithm: str,
+        ttl: float = 3600.0,
+        min_refresh_interval: float = 30.0,
+    ):
+        self._fetch = fetch
+        self._algorithm = algorithm
+        self._ttl = ttl
+        self._min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, "Key"] = {}
+        self._fetched_at: Optional[float] = None
+        self._attempted_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get_key(self, kid: str) -> Optional["Key"]:
+        """Return the verification key for ``kid``, or None if unknown."""
+        key = self._keys.get(kid)
+
+        if key is not None:
+            if self._is_stale() and self._may_refresh():
+                # Serve the cached key; refresh without blocking the request
+                self._start_refresh()
+            return key
+
+        if self._may_refresh():
+            # Shielded: other requests may be waiting on the same refresh
+            await asyncio.shield(self._start_refresh())
+            return self._keys.get(kid)
+
+        return None
+
+    def _is_stale(self) -> bool:
+        return (
+            self._fetched_at is None
+            or time.monotonic() - self._fetched_at > self._ttl
+        )
+
+    def _may_refresh(self) -> bool:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return True
+        return (
+            self._attempted_at is None
+            or time.monotonic() - self._attempted_at >= self._min_refresh_interval
+        )
+
+    def _start_refresh(self) -> asyncio.Task:
+        """Start (or join) the single in-flight refresh."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._attempted_at = time.monotonic()
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+        return self._refresh_task
+
+    async def _refresh(self) -> None:
+        try:
+            jwks = await self._fetch()
+        except Exception as e:
+            logger.warning("JWKS refresh failed: %s", e)
+            return
+
+        from jose import jwk
+
+        keys = {}
+        for key_data in jwks.get("keys", []):
+            kid = key_data.get("kid")
+            if not kid or key_data.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[kid] = jwk.construct(key_data, key_data.get("alg", self._algorithm))
+            except (JOSEError, ValueError) as e:
+                # Unsupported key type or algorithm, or malformed key material
+                logger.warning("Skipping unusable JWKS key %s: %s", kid, e)
+
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified token claims.
+
+    Each entry expires at the token's own ``exp`` so a cached token is never
+    accepted after it would have failed verification.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return cached claims for ``token`` if present and unexpired."""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        """Cache verified claims until the token's ``exp``."""
+        expires_at = claims.get("exp")
+        if expires_at is None or self._maxsize <= 0:
+            return
+        self._entries[token] = (claims, float(expires_at))
+        self._entries.move_to_end(token)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+
+class JWTValidator:
+    """Verify bearer tokens: signature, expiry, audience and issuer."""
+
+    def __init__(
+        self,
+        jwks: JWKSCache,
+        audience: Optional[str],
+        issuer: Optional[str],
+        algorithm: str = "RS256",
+        token_cache: Optional[TokenCache] = None,
+    ):
+        self.jwks = jwks
+        self.audience = audience
+        self.issuer = issuer
+        self.algorithm = algorithm
+        self.token_cache = token_cache if token_cache is not None else TokenCache()
+
+    async def validate(self, token: str) -> Dict[str, Any]:
+        """
+        Verify ``token`` and return its claims.
+
+        Raises:
+            JWTError: If the token is malformed, expired or fails verification
+        """
+        claims = self.token_cache.get(token)
+        if claims is not None:
+            return claims
+
+        from jose import jwt
+
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") != self.algorithm:
+            raise JWTError(f"Unexpected token algorithm: {header.get('alg')}")
+        kid = header.get("kid")
+        if not kid:
+            raise JWTError("Token header has no kid")
+
+        key = await self.jwks.get_key(kid)
+        if key is None:
+            raise JWTError(f"Unknown signing key: {kid}")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[self.algorithm],
+            audience=self.audience,
+            issuer=self.issuer,
+            options={"verify_aud": self.audience is not None},
+        )
+        self.token_cache.put(token, claims)
+        return claims
+
+
+def _default_jwks_fetcher(url: str) -> JWKSFetcher:
+    async def fetch() -> dict:
+        async with httpx.AsyncClient(timeout=settings.auth_jwks_timeout) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            return response.json()
+    return fetch
+
+
+def build_jwt_validator(fetch: Optional[JWKSFetcher] = None) -> Optional[JWTValidator]:
+    """
+    Build a validator from settings.
+
+    Returns:
+        Configured validator, or None if ``auth_domain`` is not set
+    """
+    if not settings.auth_domain:
+        return None
+
+    domain = settings.auth_domain.rstrip("/")
+    if not domain.startswith(("http://", "https://")):
+        domain = f"https://{domain}"
+    jwks_url = settings.auth_jwks_url or f"{domain}/.well-known/jwks.json"
+    issuer = settings.auth_issuer or f"{domain}/"
+
+    return JWTValidator(
+        jwks=JWKSCache(
+            fetch or _default_jwks_fetcher(jwks_url),
+            algorithm=settings.auth_algorithm,
+            ttl=settings.auth_jwks_ttl,
+            min_refresh_interval=settings.auth_jwks_min_refresh_interval,
+        ),
+        audience=settings.auth_audience,
+        issuer=issuer,
+        algorithm=settings.auth_algorithm,
+        token_cache=TokenCache(settings.auth_token_cache_size),
+    )
@@ -0,0 +1,82 @@
+"""Pluggable JSON encoding for responses."""
+import json
+from decimal import Decimal
+from typing import Any, Callable
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.tracing import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+Dumps = Callable[[Any], bytes]
+
+SERIALIZERS = ("auto", "orjson", "msgspec", "stdlib")
+
+
+def _default(obj: Any) -> Any:
+    """Encode types the fast encoders do not handle natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(content: Any) -> bytes:
+    # Same output options as Starlette's JSONResponse
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=_default,
+    ).encode("utf-8")
+
+
+def get_dumps(name: str = "auto") -> Dumps:
+    """
+    Return a function encoding Python objects straight to JSON bytes.
+
+    Args:
+        name: ``orjson``, ``msgspec``, ``stdlib`` or ``auto`` (the fastest
+            installed encoder)
+
+    Raises:
+        ValueError: If the serializer is unknown or not installed
+    """
+    name = name.lower()
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unknown JSON serializer: {name}")
+    if name in ("auto", "orjson") and orjson is not None:
+        def orjson_dumps(content: Any) -> bytes:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return orjson_dumps
+    if name in ("auto", "msgspec") and msgspec is not None:
+        return msgspec.json.Encoder(enc_hook=_default).encode
+    if name in ("auto", "stdlib"):
+        return _stdlib_dumps
+    raise ValueError(f"JSON serializer {name!r} is not installed")
+
+
+# Encoder selected by JSON_SERIALIZER
+dumps: Dumps = get_dumps(settings.json_serializer)
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` rendered with the configured fast encoder."""
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return dumps(content)
@@ -0,0 +1,133 @@
+"""Production server launch: worker sizing and tuned uvicorn settings."""
+import importlib.util
+import logging
+import math
+import os
+import random
+from typing import List, Optional
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+APP = "app.main:app"
+
+# cgroup v2 and v1 CPU quota files
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """
+    CPU quota imposed by the container's cgroup, in CPUs.
+
+    Returns:
+        e.g. ``1.5`` for a 150ms/100ms quota, or None if unlimited/unknown
+    """
+    cpu_max = _read(CGROUP_V2_CPU_MAX)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    quota, period = _read(CGROUP_V1_QUOTA), _read(CGROUP_V1_PERIOD)
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity mask capped by the cgroup quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS/Windows
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(cpus, 1)
+
+
+def worker_count() -> int:
+    """``WORKERS`` if set, otherwise one async worker per available CPU."""
+    return settings.workers if settings.workers > 0 else available_cpus()
+
+
+def _resolve(choice: str, module: str, fallback: str) -> str:
+    """Use ``choice`` unless it needs ``module`` and that is not installed."""
+    if choice == module and importlib.util.find_spec(module) is None:
+        logger.warning("%s is not installed; falling back to %s", module, fallback)
+        return fallback
+    return choice
+
+
+def build_config(app: str = APP) -> uvicorn.Config:
+    """uvicorn config for production from ``Settings``."""
+    return uvicorn.Config(
+        app,
+        host=settings.host,
+        port=settings.port,
+        workers=worker_count(),
+        loop=_resolve(settings.event_loop, "uvloop", "asyncio"),
+        http=_resolve(settings.http_parser, "httptools", "h11"),
+        backlog=settings.backlog,
+        timeout_keep_alive=settings.keep_alive_timeout,
+        timeout_graceful_shutdown=settings.graceful_shutdown_timeout,
+        limit_max_requests=settings.max_requests or None,
+        log_level=settings.log_level.lower(),
+        access_log=False,
+        server_header=False,
+    )
+
+
+class RecyclingServer(uvicorn.Server):
+    """
+    ``uvicorn.Server`` whose request limit is jittered per worker.
+
+    Each worker process runs its own unpickled copy of the server, so the
+    jitter drawn in ``run`` differs between workers and they do not all
+    recycle at once. The supervisor restarts workers that exit.
+    """
+
+    def __init__(self, config: uvicorn.Config, max_requests_jitter: int = 0):
+        super().__init__(config)
+        self.max_requests_jitter = max_requests_jitter
+
+    def run(self, sockets: Optional[List] = None) -> None:
+        if self.config.limit_max_requests and self.max_requests_jitter > 0:
+            self.config.limit_max_requests += random.randint(0, self.max_requests_jitter)
+        super().run(sockets=sockets)
+
+
+def serve(app: str = APP) -> None:
+    """
+    Run the app with the production settings.
+
+    With more than one worker, or when workers are recycled, the parent
+    process binds the socket and supervises the workers (restarting any
+    that exit). On SIGTERM each worker stops accepting connections,
+    finishes in-flight requests (up to ``GRACEFUL_SHUTDOWN_TIMEOUT``) and
+    runs the lifespan shutdown.
+    """
+    config = build_config(app)
+    server = RecyclingServer(config, settings.max_requests_jitter)
+    logger.info(
+        "Starting %d worker(s) (loop=%s, http=%s, max_requests=%s)",
+        config.workers, config.loop, config.http, config.limit_max_requests,
+    )
+    if config.workers > 1 or config.limit_max_requests:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
@@ -0,0 +1,388 @@
+"""Lightweight request tracing: contextvar-scoped spans, Server-Timing and OTLP JSON export."""
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Spans recorded per trace; later spans are dropped so a runaway loop
+# cannot grow a request's trace without bound
+MAX_SPANS = 256
+
+# W3C trace context: version-traceid-parentid-flags
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP enums
+_SPAN_KIND_INTERNAL = 1
+_SPAN_KIND_SERVER = 2
+_STATUS_CODE_ERROR = 2
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+# Index into the current trace's spans of the enclosing span (-1 = the request)
+_current_parent: ContextVar[int] = ContextVar("current_span_parent", default=-1)
+
+
+class Trace:
+    """
+    Spans recorded for one request.
+
+    Spans are kept in the order they were opened, each referring to its
+    parent by index (``-1`` for the request itself), with
+    ``perf_counter_ns`` timestamps; span ids are only generated when a
+    sampled trace is exported.
+
+    Args:
+        name: Name of the root (request) span
+        trace_id: 128-bit trace id (random, generated on export, by default)
+        parent_span_id: Span id of the caller's span, from ``traceparent``
+        sampled: Whether the trace is exported
+    """
+
+    __slots__ = (
+        "name", "trace_id", "parent_span_id", "sampled", "start_ns",
+        "end_ns", "spans", "attributes", "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: Optional[int] = None,
+        parent_span_id: Optional[int] = None,
+        sampled: bool = False,
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.parent_span_id = parent_span_id
+        self.sampled = sampled
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.spans: List["Span"] = []
+        self.attributes: Dict[str, Any] = {}
+        self.error = False
+
+    @classmethod
+    def from_traceparent(cls, name: str, header: Optional[str]) -> "Trace":
+        """
+        Start a trace continuing the caller's W3C ``traceparent``, if valid.
+
+        The caller's sampled flag is kept; without a (valid) header a new
+        unsampled trace is started.
+        """
+        if not header:
+            return cls(name)
+        match = _TRACEPARENT.match(header.strip().lower())
+        if match is None:
+            return cls(name)
+        trace_id, parent_id, flags = (int(group, 16) for group in match.groups())
+        if not trace_id or not parent_id:
+            return cls(name)
+        return cls(name, trace_id, parent_id, sampled=bool(flags & 1))
+
+    def finish(self) -> None:
+        """Mark the end of the request span."""
+        if self.end_ns is None:
+            self.end_ns = time.perf_counter_ns()
+
+    def totals(self) -> Dict[str, Tuple[int, int]]:
+        """Total duration (ns) and count of finished spans, by span name."""
+        return {name: (duration, count) for name, (duration, count) in self._totals()[0].items()}
+
+    def _totals(self) -> Tuple[Dict[str, List[int]], int]:
+        """Per-name ``[duration, count]`` of finished spans, and the time covered by top-level spans."""
+        totals: Dict[str, List[int]] = {}
+        covered = 0
+        for recorded in self.spans:
+            end = recorded.end
+            if end:
+                duration = end - recorded.start
+                if recorded.parent == -1:
+                    covered += duration
+                entry = totals.get(recorded.name)
+                if entry is None:
+                    totals[recorded.name] = [duration, 1]
+                else:
+                    entry[0] += duration
+                    entry[1] += 1
+        return totals, covered
+
+    def server_timing(self) -> str:
+        """
+        ``Server-Timing`` header value: time per span name, the time spent
+        outside any top-level span (``other``: middleware and framework) and
+        the ``total`` so far.
+        """
+        total = time.perf_counter_ns() - self.start_ns
+        totals, covered = self._totals()
+        parts = [
+            "%s;dur=%.3f" % (name, duration / 1e6) if count == 1
+            else '%s;dur=%.3f;desc="%d calls"' % (name, duration / 1e6, count)
+            for name, (duration, count) in totals.items()
+        ]
+        parts.append("other;dur=%.3f" % (max(total - covered, 0) / 1e6))
+        parts.append("total;dur=%.3f" % (total / 1e6))
+        return ", ".join(parts)
+
+    def to_otlp(self, service_name: str) -> Dict[str, Any]:
+        """Render the trace as an OTLP/JSON ``ExportTraceServiceRequest``."""
+        end_ns = self.end_ns or time.perf_counter_ns()
+        if self.trace_id is None:
+            self.trace_id = random.getrandbits(128) or 1
+        root_id = random.getrandbits(64) or 1
+        span_ids = [random.getrandbits(64) or 1 for _ in self.spans]
+        trace_id = f"{self.trace_id:032x}"
+        # Wall clock time of perf_counter_ns() == 0
+        epoch_ns = time.time_ns() - time.perf_counter_ns()
+
+        def unix_ns(perf_ns: int) -> str:
+            return str(epoch_ns + perf_ns)
+
+        root: Dict[str, Any] = {
+            "traceId": trace_id,
+            "spanId": f"{root_id:016x}",
+            "name": self.name,
+            "kind": _SPAN_KIND_SERVER,
+            "startTimeUnixNano": unix_ns(self.start_ns),
+            "endTimeUnixNano": unix_ns(end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+        }
+        if self.parent_span_id:
+            root["parentSpanId"] = f"{self.parent_span_id:016x}"
+        if self.error:
+            root["status"] = {"code": _STATUS_CODE_ERROR}
+        spans = [root]
+        for span_id, recorded in zip(span_ids, self.spans):
+            parent = recorded.parent
+            attributes = recorded.attributes or {}
+            exported: Dict[str, Any] = {
+                "traceId": trace_id,
+                "spanId": f"{span_id:016x}",
+                "parentSpanId": f"{root_id if parent == -1 else span_ids[parent]:016x}",
+                "name": recorded.name,
+                "kind": _SPAN_KIND_INTERNAL,
+                "startTimeUnixNano": unix_ns(recorded.start),
+                "endTimeUnixNano": unix_ns(recorded.end or end_ns),
+                "attributes": _otlp_attributes(attributes),
+            }
+            if attributes.get("error"):
+                exported["status"] = {"code": _STATUS_CODE_ERROR}
+            spans.append(exported)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }]
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class Span:
+    """
+    A span of a trace; use as a (sync) context manager, around awaits too.
+
+    Opening the span appends it to the trace's spans and makes it the
+    parent of spans opened inside it.
+    """
+
+    __slots__ = ("name", "parent", "start", "end", "attributes", "_trace", "_token")
+
+    def __init__(self, trace: Trace, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.parent = -1
+        self.start = 0
+        self.end = 0
+        self.attributes = attributes
+        self._trace = trace
+        self._token: Any = None
+
+    def __enter__(self) -> "Span":
+        self.parent = _current_parent.get()
+        spans = self._trace.spans
+        self._token = _current_parent.set(len(spans))
+        spans.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.end = time.perf_counter_ns()
+        _current_parent.reset(self._token)
+        if exc_type is not None:
+            self.set_attribute("error", exc_type.__name__)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach an attribute to the span (exported with sampled traces)."""
+        if self.attributes is None:
+            self.attributes = {}
+        self.attributes[key] = value
+
+
+class _NoopSpan:
+    """Stand-in returned when no trace is active."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Record a span in the current request's trace.
+
+    Spans nest by context: a span opened inside another (including in tasks
+    created meanwhile, which copy the context) becomes its child. Outside a
+    traced request this returns a shared no-op span.
+
+    Args:
+        name: Span name; also the ``Server-Timing`` metric name, so keep it
+            a short token (e.g. ``db``)
+        attributes: Attributes exported with sampled traces
+
+    Usage:
+        with span("db", {"db.table": "items"}):
+            response = await query.execute()
+    """
+    trace = _current_trace.get()
+    if trace is None or len(trace.spans) >= MAX_SPANS:
+        return _NOOP_SPAN
+    return Span(trace, name, attributes)
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the request being handled, if any."""
+    return _current_trace.get()
+
+
+def start_trace(trace: Trace) -> Any:
+    """Make ``trace`` current; returns a token for ``end_trace``."""
+    return _current_trace.set(trace)
+
+
+def end_trace(token: Any) -> None:
+    """Restore the trace that was current before ``start_trace``."""
+    _current_trace.reset(token)
+
+
+class TraceExporter:
+    """
+    Append sampled traces to a file as OTLP/JSON lines.
+
+    Conversion and file I/O run on a background thread. Traces are dropped
+    (and counted in ``dropped``) instead of blocking when the queue is full.
+    A file that would grow past ``max_bytes`` is renamed to ``<path>.1``
+    (replacing the previous one) and a new file started, so the traces on
+    disk take at most twice ``max_bytes``.
+
+    Args:
+        path: File the traces are appended to, one export request per line
+        sample_rate: Fraction of requests without a trusted upstream
+            sampling decision that are exported (0.0 - 1.0)
+        max_queue: Traces waiting to be written before new ones are dropped
+        service_name: ``service.name`` resource attribute
+        max_bytes: File size at which it is rotated (0 = unbounded)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 0.01,
+        max_queue: int = 10000,
+        service_name: Optional[str] = None,
+        max_bytes: int = 0,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.service_name = service_name or settings.app_name
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    def should_sample(self) -> bool:
+        """Sampling decision for a request without one from upstream."""
+        return random.random() < self.sample_rate
+
+    def export(self, trace: Trace) -> None:
+        """Queue a finished trace for writing."""
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write the queued traces and stop the writer thread."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        f = open(self.path, "ab")
+        try:
+            size = os.fstat(f.fileno()).st_size
+            while True:
+                trace = self._queue.get()
+                if trace is None:
+                    return
+                try:
+                    line = json.dumps(trace.to_otlp(self.service_name), separators=(",", ":")).encode() + b"\n"
+                    if self.max_bytes and size and size + len(line) > self.max_bytes:
+                        f.close()
+                        os.replace(self.path, self.path + ".1")
+                        f = open(self.path, "ab")
+                        size = 0
+                    f.write(line)
+                    size += len(line)
+                    if self._queue.empty():
+                        f.flush()
+                except Exception:
+                    logger.exception("Failed to export trace")
+        finally:
+            f.close()
+
+
+def build_trace_exporter() -> Optional[TraceExporter]:
+    """Trace exporter from settings (``None`` unless ``TRACING_EXPORT_PATH`` is set)."""
+    if not settings.tracing_export_path:
+        return None
+    return TraceExporter(
+        settings.tracing_export_path,
+        sample_rate=settings.tracing_sample_rate,
+        max_queue=settings.tracing_export_queue_size,
+        max_bytes=settings.tracing_export_max_bytes,
+    )
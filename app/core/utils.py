@@ -1,19 +1,65 @@
 """Core utility functions and decorators."""
+import asyncio
+import math
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, Dict, Hashable, Optional
 from inspect import iscoroutinefunction
+import httpx
 from fastapi import HTTPException, status
+from starlette.types import Scope
+from app.core.resilience import CircuitOpenError
+from app.core.tracing import span
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def route_path(scope: Scope) -> str:
+    """
+    Path template of the route that handled a request (e.g. ``/api/items/``).
+
+    Unmatched requests collapse into ``"<unmatched>"`` so per-route labels
+    stay bounded.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "<unmatched>")
+    if scope.get("endpoint") is not None:
+        return scope.get("path", "<unmatched>")
+    return "<unmatched>"
+
+
+def _database_unavailable(operation_name: str, error: httpx.TransportError) -> HTTPException:
+    """
+    Map a database transport failure to a 503/504 without a traceback.
+
+    An open circuit and unreachable database give ``503`` with
+    ``Retry-After``; a timed out call gives ``504``.
+    """
+    logger.warning("Error %s: database unavailable: %s", operation_name, error)
+    if isinstance(error, httpx.TimeoutException):
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Error {operation_name}: database timed out",
+        )
+    retry_after = error.retry_after if isinstance(error, CircuitOpenError) else 1
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Error {operation_name}: database unavailable",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
 def handle_exceptions(
     operation_name: str = "operation",
     status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR
 ):
     """
     Decorator to handle exceptions in API endpoints.
+
+    The call is recorded as a ``handler`` span of the request's trace.
+    Database transport failures (open circuit, timeouts, connection
+    errors) become ``503``/``504`` responses instead of ``500``.
     
     Args:
         operation_name: Name of the operation for error messages
@@ -31,10 +77,13 @@ def handle_exceptions(
             @wraps(func)
             async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
                 try:
-                    return await func(*args, **kwargs)
+                    with span("handler", {"operation": operation_name}):
+                        return await func(*args, **kwargs)
                 except HTTPException:
                     # Re-raise HTTPExceptions as-is
                     raise
+                except httpx.TransportError as e:
+                    raise _database_unavailable(operation_name, e) from e
                 except Exception as e:
                     logger.error(
                         f"Error {operation_name}: {str(e)}",
@@ -49,10 +98,13 @@ def handle_exceptions(
             @wraps(func)
             def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
                 try:
-                    return func(*args, **kwargs)
+                    with span("handler", {"operation": operation_name}):
+                        return func(*args, **kwargs)
                 except HTTPException:
                     # Re-raise HTTPExceptions as-is
                     raise
+                except httpx.TransportError as e:
+                    raise _database_unavailable(operation_name, e) from e
                 except Exception as e:
                     logger.error(
                         f"Error {operation_name}: {str(e)}",
@@ -66,3 +118,56 @@ def handle_exceptions(
     
     return decorator
 
+
+
+def single_flight(key: Optional[Callable[..., Hashable]] = None):
+    """
+    Decorator to coalesce concurrent identical calls of a coroutine function.
+
+    While a call is in flight, further calls with the same key await the
+    same result instead of running the function again. Every waiter gets
+    the result or the exception of the shared call. Cancelling one waiter
+    does not cancel the shared call, which keeps running for the others.
+    The result object is shared, so callers must not mutate it.
+
+    Args:
+        key: Builds the coalescing key from the call arguments (default:
+            the positional and keyword arguments themselves, which must be
+            hashable)
+
+    Usage:
+        @single_flight(key=lambda db, limit, cursor=None: (limit, cursor))
+        async def load_page(db, limit, cursor=None):
+            # Your code here
+            pass
+    """
+    def decorator(func: Callable) -> Callable:
+        if not iscoroutinefunction(func):
+            raise TypeError("single_flight can only wrap coroutine functions")
+
+        in_flight: Dict[Hashable, asyncio.Task] = {}
+
+        def _done(call_key: Hashable, task: asyncio.Task) -> None:
+            if in_flight.get(call_key) is task:
+                del in_flight[call_key]
+            # Mark the exception retrieved even if every waiter went away
+            if not task.cancelled():
+                task.exception()
+
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            call_key = (
+                key(*args, **kwargs) if key is not None
+                else (args, tuple(sorted(kwargs.items())))
+            )
+            task = in_flight.get(call_key)
+            if task is None:
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                in_flight[call_key] = task
+                task.add_done_callback(lambda t: _done(call_key, t))
+            return await asyncio.shield(task)
+
+        wrapper.in_flight = in_flight
+        return wrapper
+
+    return decorator
@@ -1,10 +1,107 @@
 """Main FastAPI application."""
-from fastapi import FastAPI
+import asyncio
+import contextlib
+import inspect
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+from fastapi import FastAPI, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse
 from app.core.config import settings
+from app.core.database import connect_db, disconnect_db, get_db
+from app.core.logging_config import setup_logging
+from app.core.loop_monitor import build_loop_monitor
+from app.core.metrics import registry
+from app.core.profiling import build_profile_store, pstats_summary
+from app.core.tracing import build_trace_exporter
+from app.core.serialization import FastJSONResponse
 from app.middleware.logging_middleware import LoggingMiddleware
 from app.middleware.auth_middleware import AuthMiddleware
+from app.middleware.metrics_middleware import MetricsMiddleware
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+from app.middleware.concurrency_middleware import ConcurrencyLimitMiddleware
+from app.middleware.profiling_middleware import ProfilingMiddleware
+from app.middleware.compression_middleware import CompressionMiddleware
+from app.middleware.tracing_middleware import TracingMiddleware
+from app.middleware.body_limit_middleware import BodyLimitMiddleware
 from app.api.router import api_router
+from app.api.endpoints.items import insert_coalescer, items_cache, items_journal
+
+logger = logging.getLogger(__name__)
+
+# Longest pause between warm-up attempts (seconds)
+WARM_UP_MAX_BACKOFF = 30.0
+
+
+async def warm_up(app: FastAPI) -> None:
+    """
+    Prepare expensive resources after the server starts accepting requests.
+
+    Connects the database (importing ``supabase`` off the event loop) and
+    builds the OpenAPI schema, which FastAPI caches. Requests that need the
+    database before this finishes wait for the same connection attempt.
+    Failures are retried with backoff; the worker reports ready on
+    ``/health`` only once warm-up has succeeded.
+    """
+    attempt = 0
+    while True:
+        try:
+            await connect_db()
+            if app.openapi_url:
+                app.openapi()
+        except Exception:
+            attempt += 1
+            delay = min(2 ** attempt, WARM_UP_MAX_BACKOFF)
+            logger.exception("Startup warm-up failed; retrying in %.0fs", delay)
+            await asyncio.sleep(delay)
+        else:
+            app.state.lifecycle = "ready"
+            return
+
+
+async def _journal_db(app: FastAPI) -> Any:
+    """Database client for the journal flusher, resolved like the request dependency."""
+    db = app.dependency_overrides.get(get_db, get_db)()
+    return await db if inspect.isawaitable(db) else db
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Create shared resources on startup and release them on shutdown."""
+    app.state.lifecycle = "starting"
+    loop_monitor = build_loop_monitor() if settings.loop_monitor_enabled else None
+    if loop_monitor is not None:
+        loop_monitor.start()
+    app.state.loop_monitor = loop_monitor
+    trace_exporter = app.state.trace_exporter
+    if trace_exporter is not None:
+        trace_exporter.start()
+    if settings.items_write_behind_enabled:
+        # Rows journaled before a restart are replayed by the flusher
+        await items_journal.open()
+        items_journal.start(lambda: _journal_db(app))
+    # Listen for cache invalidations from other instances (with CACHE_REDIS_URL)
+    items_cache.start()
+    warm_up_task = asyncio.create_task(warm_up(app), name="startup-warm-up")
+    app.state.warm_up_task = warm_up_task
+    try:
+        yield
+    finally:
+        app.state.lifecycle = "draining"
+        warm_up_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await warm_up_task
+        # Write out any coalesced inserts before the pool goes away
+        await insert_coalescer.drain()
+        if items_journal.is_open:
+            await items_journal.close(timeout=settings.graceful_shutdown_timeout / 2)
+        await items_cache.stop()
+        await disconnect_db()
+        if loop_monitor is not None:
+            await loop_monitor.stop()
+        if trace_exporter is not None:
+            await asyncio.to_thread(trace_exporter.stop)
 
 
 def create_application() -> FastAPI:
@@ -14,15 +111,26 @@ def create_application() -> FastAPI:
     Returns:
         Configured FastAPI application instance
     """
+    # Queue-backed logging; handler I/O runs off the event loop thread
+    setup_logging()
+    
     app = FastAPI(
         title=settings.app_name,
         version=settings.app_version,
         description="Base0 Backend API with FastAPI",
-        docs_url="/docs",
-        redoc_url="/redoc",
-        openapi_url="/openapi.json",
+        docs_url="/docs" if settings.openapi_enabled else None,
+        redoc_url="/redoc" if settings.openapi_enabled else None,
+        openapi_url="/openapi.json" if settings.openapi_enabled else None,
+        lifespan=lifespan,
+        # Encode responses straight to bytes with orjson/msgspec when installed
+        default_response_class=FastJSONResponse,
     )
     
+    # Add compression middleware (innermost, so responses it serves from
+    # memory still get CORS and the rest of the stack)
+    if settings.compression_enabled:
+        app.add_middleware(CompressionMiddleware)
+    
     # Add CORS middleware
     app.add_middleware(
         CORSMiddleware,
@@ -32,12 +140,40 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Add request body limits (413 for oversized bodies and ingest lines)
+    app.add_middleware(BodyLimitMiddleware)
+    
+    # Add profiling middleware (inside auth, which marks admin requests)
+    profile_store = build_profile_store()
+    if settings.profiling_enabled:
+        app.add_middleware(ProfilingMiddleware, store=profile_store)
+    
     # Add logging middleware
     app.add_middleware(LoggingMiddleware)
     
+    # Add adaptive concurrency limiting middleware
+    if settings.concurrency_limit_enabled:
+        app.add_middleware(ConcurrencyLimitMiddleware)
+    
+    # Add rate limiting middleware (inside auth, which identifies the client)
+    if settings.rate_limit_enabled:
+        app.add_middleware(RateLimitMiddleware)
+    
     # Add authentication middleware
     app.add_middleware(AuthMiddleware)
     
+    # Add tracing middleware (outside everything but metrics, so Server-Timing
+    # accounts for the middleware stack); it has nothing to do without an export
+    # file or Server-Timing
+    trace_exporter = build_trace_exporter() if settings.tracing_enabled else None
+    app.state.trace_exporter = trace_exporter
+    if settings.tracing_enabled and (trace_exporter is not None or settings.tracing_server_timing):
+        app.add_middleware(TracingMiddleware, exporter=trace_exporter)
+    
+    # Add metrics middleware (outermost, so it times the whole stack)
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
+    
     # Include API routes
     app.include_router(api_router, prefix="/api")
     
@@ -51,10 +187,56 @@ def create_application() -> FastAPI:
         }
     
     @app.get("/health")
-    async def health_check():
-        """Health check endpoint."""
+    async def health_check(request: Request, response: Response):
+        """
+        Readiness check endpoint.
+
+        Returns 503 until this worker has finished warming up, and again
+        once it starts draining for shutdown.
+        """
+        lifecycle = getattr(request.app.state, "lifecycle", "starting")
+        if lifecycle != "ready":
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            return {"status": lifecycle}
         return {"status": "healthy"}
     
+    if settings.metrics_enabled:
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            """Prometheus metrics endpoint."""
+            return PlainTextResponse(
+                registry.render(),
+                media_type="text/plain; version=0.0.4; charset=utf-8"
+            )
+    
+    if settings.profiling_enabled:
+        def _require_admin(request: Request) -> None:
+            auth = getattr(request.state, "auth", None)
+            if auth is None or not auth.is_admin:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+        @app.get("/debug/profiles", include_in_schema=False)
+        async def list_profiles(request: Request):
+            """List stored profile reports, newest first (admin only)."""
+            _require_admin(request)
+            return {"reports": await asyncio.to_thread(profile_store.list)}
+
+        @app.get("/debug/profiles/{name}", include_in_schema=False)
+        async def get_profile(request: Request, name: str, format: Optional[str] = None):
+            """
+            Download a profile report (admin only).
+
+            ``?format=text`` renders a pstats dump as a summary of the top
+            functions by cumulative time.
+            """
+            _require_admin(request)
+            path = await asyncio.to_thread(profile_store.path, name)
+            if path is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+            if format == "text" and name.endswith(".pstats"):
+                return PlainTextResponse(await asyncio.to_thread(pstats_summary, path))
+            return FileResponse(path, media_type="application/octet-stream", filename=name)
+    
     return app
 
 
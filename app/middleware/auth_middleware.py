@@ -1,14 +1,24 @@
-"""Generic authentication middleware skeleton."""
-from typing import Optional
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
+"""Generic authentication middleware."""
+from typing import Any, Dict, Optional
+from jose.exceptions import JOSEError
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.config import settings
+from app.core.security import JWTValidator, build_jwt_validator
+from app.core.tracing import span
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    
+class AuthMiddleware:
+    """
+    Pure ASGI authentication middleware.
+
+    Auth headers are collected in a single pass over ``scope["headers"]`` and
+    the resulting ``AuthResult`` is stored in ``scope["state"]`` so route
+    handlers can read it as ``request.state.auth``.
+    """
+
     # Common auth header names that might be used
     AUTH_HEADER_NAMES = [
         "authorization",
@@ -17,61 +27,63 @@ class AuthMiddleware(BaseHTTPMiddleware):
         "x-access-token",
         "bearer",
     ]
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp, validator: Optional[JWTValidator] = None) -> None:
+        self.app = app
+        # JWT verification is enabled when AUTH_DOMAIN is configured
+        self.validator = validator if validator is not None else build_jwt_validator()
+        # Raw (lowercase bytes) header name -> canonical name, including the
+        # underscore variants some proxies produce
+        self._header_lookup: Dict[bytes, str] = {}
+        for header_name in self.AUTH_HEADER_NAMES:
+            self._header_lookup[header_name.encode("latin-1")] = header_name
+            self._header_lookup[
+                header_name.replace("-", "_").encode("latin-1")
+            ] = header_name
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Extract auth headers
-        auth_headers = self._extract_auth_headers(request)
-        
-        # Log intercepted headers (for debugging)
-        if auth_headers:
-            logger.info(f"Intercepted auth headers: {auth_headers}")
-            # Print to console as requested
-            print(f"[Auth Middleware] Intercepted auth headers: {auth_headers}")
-        else:
-            logger.debug("No auth headers found in request")
-            print("[Auth Middleware] No auth headers found in request")
-        
-        # Validate authentication (skeleton - implement actual validation)
-        auth_result = await self._validate_auth(request, auth_headers)
-        
-        if not auth_result.is_valid:
-            logger.warning(
-                f"Authentication validation failed for {request.url.path}: "
-                f"{auth_result.reason}"
+        auth_headers = self._extract_auth_headers(scope)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            # Only header names are logged; values are credentials
+            logger.debug("Intercepted auth headers: %s", list(auth_headers))
+
+        # Validate authentication
+        with span("auth"):
+            auth_result = await self._validate_auth(scope, auth_headers)
+
+        if not auth_result.is_valid and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Authentication validation failed for %s: %s",
+                scope["path"], auth_result.reason
             )
-            print(f"[Auth Middleware] Validation failed: {auth_result.reason}")
-        
+
         # Add auth info to request state for use in route handlers
-        request.state.auth = auth_result
-        
+        scope.setdefault("state", {})["auth"] = auth_result
+
         # Continue with request
-        response = await call_next(request)
-        return response
-    
-    def _extract_auth_headers(self, request: Request) -> dict:
-        """Extract authentication-related headers from request."""
+        await self.app(scope, receive, send)
+
+    def _extract_auth_headers(self, scope: Scope) -> dict:
+        """Extract authentication-related headers from the ASGI scope."""
         auth_headers = {}
-        
-        for header_name in self.AUTH_HEADER_NAMES:
-            header_value = request.headers.get(header_name) or request.headers.get(
-                header_name.replace("-", "_")
-            )
-            if header_value:
-                auth_headers[header_name] = header_value
-        
+
+        for raw_name, raw_value in scope.get("headers", ()):
+            header_name = self._header_lookup.get(raw_name.lower())
+            if header_name and raw_value and header_name not in auth_headers:
+                auth_headers[header_name] = raw_value.decode("latin-1")
+
         return auth_headers
-    
+
     async def _validate_auth(
-        self, request: Request, auth_headers: dict
+        self, scope: Scope, auth_headers: dict
     ) -> "AuthResult":
-
-        # TODO: Implement actual authentication validation
-        # Example for Auth0:
-        # - Extract token from Authorization header
-        # - Validate JWT signature
-        # - Check token expiration
-        # - Verify audience and issuer
-        
+        """Verify bearer tokens against the configured JWKS."""
         if not auth_headers:
             return AuthResult(
                 is_valid=False,
@@ -79,12 +91,41 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 user_id=None,
                 token=None
             )
-        
-        # Placeholder: Always return valid for skeleton
-        # In production, implement actual validation
+
+        authorization = auth_headers.get("authorization", "")
+        scheme, _, bearer_token = authorization.partition(" ")
+
+        if self.validator is not None and scheme.lower() == "bearer" and bearer_token:
+            try:
+                claims = await self.validator.validate(bearer_token.strip())
+            except JOSEError as e:
+                return AuthResult(
+                    is_valid=False,
+                    reason=f"Invalid token: {e}",
+                    user_id=None,
+                    token=None
+                )
+            return AuthResult(
+                is_valid=True,
+                reason="Token verified",
+                user_id=claims.get("sub"),
+                token=bearer_token.strip(),
+                claims=claims
+            )
+
+        if self.validator is not None and authorization:
+            return AuthResult(
+                is_valid=False,
+                reason="Unsupported authorization scheme",
+                user_id=None,
+                token=None
+            )
+
+        # No JWT validation configured (or non-bearer credentials such as
+        # x-api-key): accept and pass the credential through unverified
         return AuthResult(
             is_valid=True,
-            reason="Skeleton implementation - validation not yet implemented",
+            reason="Credentials not verified",
             user_id=None,
             token=auth_headers.get("authorization") or auth_headers.get("x-api-key")
         )
@@ -98,9 +139,27 @@ class AuthResult:
         reason: str,
         user_id: Optional[str] = None,
         token: Optional[str] = None,
+        claims: Optional[Dict[str, Any]] = None,
     ):
         self.is_valid = is_valid
         self.reason = reason
         self.user_id = user_id
         self.token = token
+        self.claims = claims or {}
+
+    @property
+    def is_admin(self) -> bool:
+        """
+        Whether a verified token grants an admin role.
 
+        Reads the ``AUTH_ADMIN_CLAIM`` claim (a dotted path into nested
+        claims, a string or a list of roles) and checks it against
+        ``AUTH_ADMIN_ROLES``. Unverified credentials are never admin.
+        """
+        if not self.is_valid or not self.claims:
+            return False
+        value: Any = self.claims
+        for part in settings.auth_admin_claim.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        roles = value if isinstance(value, (list, tuple)) else [value]
+        return any(role in settings.auth_admin_roles for role in roles if isinstance(role, str))
@@ -0,0 +1,130 @@
+"""Request body size and line length limits."""
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.metrics import http_requests_rejected_total
+
+
+class RequestTooLarge(HTTPException):
+    """The request body, or one of its lines, is over the limit."""
+
+    def __init__(self, detail: str) -> None:
+        super().__init__(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=detail)
+
+
+class BodyLimitMiddleware:
+    """
+    Pure ASGI middleware enforcing request body limits while the body is read.
+
+    A ``Content-Length`` over the limit gets ``413`` without calling the
+    app. Otherwise the body is counted chunk by chunk as the app receives
+    it (chunked uploads carry no length), and the ``receive`` call that
+    goes over the limit raises ``RequestTooLarge``, which FastAPI turns
+    into a ``413`` response; nothing beyond the limit is buffered.
+
+    Paths in ``path_limits`` get their own body limit instead of the
+    default, and optionally a line length limit, checked across chunk
+    boundaries, for newline-delimited uploads.
+
+    Args:
+        app: ASGI application
+        max_body_size: Default limit in bytes (0 = unlimited); defaults to
+            ``MAX_REQUEST_BODY_BYTES``
+        path_limits: ``{path: (max body bytes, max line bytes or 0)}``;
+            defaults to the ``POST /api/items/ingest`` limits
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_body_size: Optional[int] = None,
+        path_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+    ) -> None:
+        self.app = app
+        self.max_body_size = settings.max_request_body_bytes if max_body_size is None else max_body_size
+        if path_limits is None:
+            path_limits = {
+                "/api/items/ingest": (settings.items_ingest_max_body_bytes, settings.items_ingest_max_line_bytes),
+            }
+        self.path_limits = path_limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_body, max_line = self.path_limits.get(scope["path"], (self.max_body_size, 0))
+        if not max_body and not max_line:
+            await self.app(scope, receive, send)
+            return
+
+        if max_body:
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > max_body:
+                        http_requests_rejected_total.inc(("body_size",))
+                        response = JSONResponse(
+                            {"detail": f"Request body larger than {max_body} bytes"},
+                            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+
+        received = 0
+        line = 0
+        rejected = False
+
+        def too_large(detail: str) -> RequestTooLarge:
+            nonlocal rejected
+            rejected = True
+            return RequestTooLarge(detail)
+
+        async def limited_receive() -> Message:
+            nonlocal received, line
+            message = await receive()
+            body = message.get("body") if message["type"] == "http.request" else None
+            if not body:
+                return message
+            received += len(body)
+            if max_body and received > max_body:
+                raise too_large(f"Request body larger than {max_body} bytes")
+            if max_line and line + len(body) <= max_line:
+                # No line in this chunk can be over the limit; just track the last one
+                newline = body.rfind(b"\n")
+                line = line + len(body) if newline == -1 else len(body) - newline - 1
+            elif max_line:
+                start = 0
+                end = body.find(b"\n")
+                while end != -1:
+                    if line + end - start > max_line:
+                        raise too_large(f"Line longer than {max_line} bytes")
+                    line = 0
+                    start = end + 1
+                    end = body.find(b"\n", start)
+                line += len(body) - start
+                if line > max_line:
+                    raise too_large(f"Line longer than {max_line} bytes")
+            return message
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, send_wrapper)
+        except RequestTooLarge as e:
+            # Raised outside a FastAPI route (e.g. by middleware reading the body)
+            if response_started:
+                raise
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code)
+            await response(scope, receive, send)
+        finally:
+            if rejected:
+                http_requests_rejected_total.inc(("body_size",))
@@ -0,0 +1,253 @@
+"""Response compression middleware."""
+from typing import Dict, List, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.compression import compress, is_compressible, make_encoder, negotiate
+from app.core.config import settings
+from app.core.tracing import span
+
+# Statuses that never carry a body worth encoding
+_NO_BODY_STATUSES = frozenset({204, 304})
+
+
+def _weak_etag(headers: MutableHeaders) -> None:
+    """An encoded body is a different representation; keep strong ETags from matching it."""
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+def _not_modified_validator(send: Send, if_none_match: str) -> Send:
+    """
+    Wrap ``send`` so a ``304`` echoes the weak form of its ETag when that is
+    what the client sent, i.e. it revalidates an encoded (weak) response.
+    """
+    weak = {candidate.strip() for candidate in if_none_match.split(",") if candidate.strip().startswith("W/")}
+
+    async def send_wrapper(message: Message) -> None:
+        if message["type"] == "http.response.start" and message["status"] == 304:
+            headers = MutableHeaders(raw=list(message.get("headers", [])))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/") and f"W/{etag}" in weak:
+                headers["etag"] = f"W/{etag}"
+                headers.add_vary_header("Accept-Encoding")
+                message["headers"] = headers.raw
+        await send(message)
+
+    return send_wrapper
+
+
+def _add_vary(message: Message) -> None:
+    headers = MutableHeaders(raw=list(message.get("headers", [])))
+    headers.add_vary_header("Accept-Encoding")
+    message["headers"] = headers.raw
+
+
+def _encoded_headers(raw: List[Tuple[bytes, bytes]], encoding: str, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+    headers = MutableHeaders(raw=list(raw))
+    headers["content-encoding"] = encoding
+    if length is None:
+        del headers["content-length"]
+    else:
+        headers["content-length"] = str(length)
+    headers.add_vary_header("Accept-Encoding")
+    _weak_etag(headers)
+    return headers.raw
+
+
+class _StaticEntry:
+    """A captured immutable response and its encoded bodies."""
+
+    __slots__ = ("status", "headers", "body", "encoded")
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.encoded: Dict[str, bytes] = {}
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing responses with gzip or brotli.
+
+    The encoding is negotiated from ``Accept-Encoding`` (brotli preferred
+    when installed). Text-like responses of at least ``minimum_size`` bytes
+    are compressed; others, and responses that already have a
+    ``Content-Encoding`` or ``Cache-Control: no-transform``, pass through.
+    Streaming responses are compressed chunk by chunk and flushed after
+    each one.
+
+    Responses for ``static_paths`` (e.g. the OpenAPI schema and docs pages,
+    which never change while the process runs) are captured on the first
+    successful GET and then served from memory, along with each encoded
+    form compressed once, without calling the app again.
+
+    Every response of a compressible type carries ``Vary: Accept-Encoding``,
+    whether or not this particular one was encoded, so shared caches keep
+    the identity and encoded forms apart.
+
+    Encoded responses get a weak ``ETag`` (the encoded bytes differ from
+    the identity body the app's strong ETag names). A ``304`` revalidating
+    such a weak ETag carries the weak form back too, so both responses
+    agree on the validator.
+
+    Args:
+        app: ASGI application
+        minimum_size: Smallest body, in bytes, that is compressed
+        gzip_level: zlib compression level (1-9)
+        brotli_quality: brotli quality (0-11)
+        static_paths: Paths whose responses are immutable
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None,
+        static_paths: Optional[List[str]] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = settings.compression_minimum_size if minimum_size is None else minimum_size
+        self.gzip_level = settings.compression_gzip_level if gzip_level is None else gzip_level
+        self.brotli_quality = settings.compression_brotli_quality if brotli_quality is None else brotli_quality
+        self.static_paths = frozenset(
+            settings.compression_static_paths if static_paths is None else static_paths
+        )
+        self._static: Dict[str, _StaticEntry] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and "W/" in if_none_match:
+            send = _not_modified_validator(send, if_none_match)
+        encoding = negotiate(request_headers.get("accept-encoding", ""))
+        if scope["method"] == "GET" and scope["path"] in self.static_paths:
+            await self._send_static(scope, receive, send, encoding)
+        elif encoding is None:
+            await self.app(scope, receive, self._identity_send(send))
+        else:
+            await self._send_compressed(scope, receive, send, encoding)
+
+    def _should_compress(self, message: Message) -> bool:
+        headers = Headers(raw=message.get("headers", []))
+        return (
+            message["status"] >= 200
+            and message["status"] not in _NO_BODY_STATUSES
+            and "content-encoding" not in headers
+            and "no-transform" not in headers.get("cache-control", "")
+            and is_compressible(headers.get("content-type", ""))
+        )
+
+    def _identity_send(self, send: Send) -> Send:
+        """Wrap ``send`` for a response that is not encoded, marking it as negotiable."""
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and self._should_compress(message):
+                _add_vary(message)
+            await send(message)
+
+        return send_wrapper
+
+    async def _send_compressed(self, scope: Scope, receive: Receive, send: Send, encoding: str) -> None:
+        start: Optional[Message] = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if self._should_compress(message):
+                    # Held until the first body chunk shows whether it is worth it
+                    start = message
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is not None:
+                data = encoder.chunk(body) if body else b""
+                if not more_body:
+                    data += encoder.finish()
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            assert start is not None
+            if not more_body:
+                # Complete body in one message: compress it in one go
+                if len(body) < self.minimum_size:
+                    passthrough = True
+                    _add_vary(start)
+                    await send(start)
+                    await send(message)
+                    return
+                with span("compress", {"encoding": encoding}):
+                    body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                start["headers"] = _encoded_headers(start.get("headers", []), encoding, len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            declared = Headers(raw=start.get("headers", [])).get("content-length")
+            if declared is not None and declared.isdigit() and int(declared) < self.minimum_size:
+                passthrough = True
+                _add_vary(start)
+                await send(start)
+                await send(message)
+                return
+            encoder = make_encoder(encoding, self.gzip_level, self.brotli_quality)
+            start["headers"] = _encoded_headers(start.get("headers", []), encoding, None)
+            await send(start)
+            await send({
+                "type": "http.response.body",
+                "body": encoder.chunk(body) if body else b"",
+                "more_body": True,
+            })
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_static(self, scope: Scope, receive: Receive, send: Send, encoding: Optional[str]) -> None:
+        entry = self._static.get(scope["path"])
+        if entry is None:
+            messages: List[Message] = []
+
+            async def capture(message: Message) -> None:
+                messages.append(message)
+
+            await self.app(scope, receive, capture)
+            start = messages[0]
+            body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+            if start["status"] != 200 or not self._should_compress(start):
+                for message in messages:
+                    await send(message)
+                return
+            headers = MutableHeaders(raw=list(start.get("headers", [])))
+            headers["content-length"] = str(len(body))
+            entry = self._static.setdefault(scope["path"], _StaticEntry(200, headers.raw, body))
+
+        if encoding is None or len(entry.body) < self.minimum_size:
+            headers = MutableHeaders(raw=list(entry.headers))
+            headers.add_vary_header("Accept-Encoding")
+            raw_headers, body = headers.raw, entry.body
+        else:
+            body = entry.encoded.get(encoding)
+            if body is None:
+                body = entry.encoded.setdefault(
+                    encoding, compress(entry.body, encoding, self.gzip_level, self.brotli_quality)
+                )
+            raw_headers = _encoded_headers(entry.headers, encoding, len(body))
+        await send({"type": "http.response.start", "status": entry.status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
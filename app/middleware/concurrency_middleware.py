@@ -0,0 +1,61 @@
+"""Adaptive concurrency limiting middleware."""
+import time
+from typing import Optional
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.concurrency import ConcurrencyLimiter, build_concurrency_limiter
+from app.core.config import settings
+from app.core.metrics import (
+    concurrency_limit,
+    concurrency_queue_depth,
+    http_requests_rejected_total,
+)
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Pure ASGI middleware bounding requests in flight with an adaptive limit.
+
+    Each request's service time (from admission to the end of the response,
+    the same span ``LoggingMiddleware`` times) feeds the limit algorithm,
+    so the limit follows backend latency. Requests over the limit wait
+    briefly in a FIFO queue, then get ``503`` with ``Retry-After``. The
+    current limit and queue depth are exported on ``/metrics``.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: Optional[ConcurrencyLimiter] = None) -> None:
+        self.app = app
+        self.limiter = limiter if limiter is not None else build_concurrency_limiter()
+        self.exempt_paths = frozenset(settings.concurrency_exempt_paths)
+        concurrency_limit.set(self.limiter.limit)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiter
+        if not await limiter.acquire():
+            http_requests_rejected_total.inc(("concurrency",))
+            concurrency_queue_depth.set(limiter.queue_depth)
+            response = JSONResponse(
+                {"detail": "Server busy"}, status_code=503, headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            limiter.release(time.perf_counter() - start, failed=status_code >= 500)
+            concurrency_limit.set(limiter.limit)
+            concurrency_queue_depth.set(limiter.queue_depth)
@@ -1,67 +1,131 @@
 """Generic logging middleware for FastAPI."""
 import logging
 import time
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Dict, Iterable, Optional, Tuple
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.core.config import settings
+from app.core.logging_config import RequestLogSampler
+from app.core.utils import route_path
 
+logger = logging.getLogger(__name__)
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level.upper(), logging.INFO),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+# Headers whose values are credentials or session state; logged as "[redacted]"
+# (names normalised to lowercase with dashes, as proxies may use underscores)
+SENSITIVE_HEADERS = frozenset({
+    "authorization",
+    "proxy-authorization",
+    "cookie",
+    "x-api-key",
+    "apikey",
+    "x-auth-token",
+    "x-access-token",
+    "bearer",
+})
 
-logger = logging.getLogger(__name__)
 
+def redact_headers(raw_headers: Iterable[Tuple[bytes, bytes]]) -> Dict[str, str]:
+    """ASGI headers as a dict for logging, with sensitive values redacted."""
+    headers = {}
+    for name, value in raw_headers:
+        key = name.decode("latin-1")
+        if key.lower().replace("_", "-") in SENSITIVE_HEADERS:
+            headers[key] = "[redacted]"
+        else:
+            headers[key] = value.decode("latin-1")
+    return headers
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware to log all HTTP requests and responses."""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Process request and log details."""
-        start_time = time.time()
-        
-        # Log request details
-        logger.info(
-            f"Request: {request.method} {request.url.path} - "
-            f"Client: {request.client.host if request.client else 'unknown'}"
+
+class LoggingMiddleware:
+    """
+    Pure ASGI middleware to log HTTP requests.
+
+    Unlike ``BaseHTTPMiddleware`` this does not spawn a task or buffer the
+    response stream; it only wraps ``send`` to stamp ``X-Process-Time`` on
+    the response start message.
+
+    One line is logged per completed request. Successful requests are
+    sampled per route (``LOG_SAMPLE_RATE`` / ``LOG_ROUTE_SAMPLE_RATES``);
+    server errors, exceptions and requests slower than
+    ``LOG_SLOW_REQUEST_MS`` are always logged.
+    """
+
+    def __init__(self, app: ASGIApp, sampler: Optional[RequestLogSampler] = None) -> None:
+        self.app = app
+        self.sampler = sampler or RequestLogSampler(
+            settings.log_sample_rate, settings.log_route_sample_rates
         )
-        
-        # Log request headers (at debug level for sensitive data)
+        self.slow_request_ms = settings.log_slow_request_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process request and log details."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        # Log request details (credentials redacted)
         if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f"Request headers: {dict(request.headers)}")
-        
-        # Log query parameters
-        if request.query_params:
-            logger.debug(f"Query params: {dict(request.query_params)}")
-        
+            client = scope.get("client")
+            logger.debug(
+                "Request: %s %s - Client: %s - Headers: %s",
+                scope["method"], scope["path"], client[0] if client else "unknown",
+                redact_headers(scope["headers"])
+            )
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Add process time to response headers
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+            await send(message)
+
         # Process request
         try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            # Log response details
-            logger.info(
-                f"Response: {request.method} {request.url.path} - "
-                f"Status: {response.status_code} - "
-                f"Time: {process_time:.3f}s"
-            )
-            
-            # Add process time to response headers
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            return response
-            
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            process_time = time.time() - start_time
+            duration_ms = (time.perf_counter() - start_time) * 1000
             logger.error(
-                f"Error: {request.method} {request.url.path} - "
-                f"Exception: {str(e)} - "
-                f"Time: {process_time:.3f}s",
-                exc_info=True
+                "Error: %s %s - Exception: %s - Time: %.1fms",
+                scope["method"], scope["path"], e, duration_ms,
+                exc_info=True,
+                extra=self._fields(scope, 500, duration_ms),
             )
             raise
 
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        route = route_path(scope)
+
+        if status_code >= 500:
+            level = logging.ERROR
+        elif duration_ms >= self.slow_request_ms:
+            level = logging.WARNING
+        elif self.sampler.sample(route):
+            level = logging.INFO
+        else:
+            return
+
+        if logger.isEnabledFor(level):
+            logger.log(
+                level,
+                "Response: %s %s - Status: %d - Time: %.1fms",
+                scope["method"], scope["path"], status_code, duration_ms,
+                extra=self._fields(scope, status_code, duration_ms, route),
+            )
+
+    @staticmethod
+    def _fields(
+        scope: Scope, status_code: int, duration_ms: float, route: Optional[str] = None
+    ) -> dict:
+        """Structured fields attached to the record (emitted by the JSON formatter)."""
+        return {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route or route_path(scope),
+            "status": status_code,
+            "duration_ms": round(duration_ms, 3),
+        }
@@ -0,0 +1,48 @@
+"""Request metrics middleware."""
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import (
+    http_request_duration_seconds,
+    http_requests_in_flight,
+    http_requests_total,
+)
+from app.core.utils import route_path
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts, latency and in-flight gauge.
+
+    Latency is measured with ``perf_counter_ns`` from the first byte of the
+    request to the end of the response, labelled by route template so
+    label cardinality stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = route_path(scope)
+            method = scope["method"]
+            http_request_duration_seconds.observe_ns(
+                time.perf_counter_ns() - start, (method, route)
+            )
+            http_requests_total.inc((method, route, str(status_code)))
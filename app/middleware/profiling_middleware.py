@@ -0,0 +1,110 @@
+"""On-demand and sampled request profiling middleware."""
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import parse_qsl
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.profiling import ProfileStore, build_profile_store, build_profiler
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_PARAM = "profile"
+REPORT_HEADER = b"x-profile-report"
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling individual requests.
+
+    Admin requests (``request.state.auth.is_admin``, so it must run inside
+    ``AuthMiddleware``) are profiled when they send an ``X-Profile`` header
+    or a ``profile`` query parameter. The value picks the profiler
+    (``cprofile`` or ``sample``; anything else uses ``PROFILING_PROFILER``).
+    The report is saved to the ``ProfileStore`` and its name returned in the
+    ``X-Profile-Report`` response header. The flag is ignored for everyone
+    else.
+
+    With ``sample_every`` set, 1 in N requests is also profiled into the
+    store, whoever sent it. Only one request is profiled at a time; others
+    run normally meanwhile. The middleware is only installed when
+    ``PROFILING_ENABLED`` is set, so it costs nothing otherwise.
+
+    Args:
+        app: ASGI application
+        store: Report store; built from settings by default
+        sample_every: Profile 1 in N requests (0 disables)
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: Optional[ProfileStore] = None,
+        sample_every: Optional[int] = None,
+    ) -> None:
+        self.app = app
+        self.store = store if store is not None else build_profile_store()
+        self.sample_every = settings.profiling_sample_every if sample_every is None else sample_every
+        self._count = 0
+        self._busy = False
+        # Fail at startup rather than on the first profiled request
+        build_profiler()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+
+        requested = self._requested_profiler(scope)
+        sampled = False
+        if self.sample_every > 0:
+            self._count += 1
+            sampled = self._count % self.sample_every == 0
+        if requested is None and not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        profiler = build_profiler(requested or None)
+        name = self.store.new_name(scope["method"], scope["path"], profiler.extension)
+
+        async def send_wrapper(message: Message) -> None:
+            if requested is not None and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REPORT_HEADER, name.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        self._busy = True
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            self._busy = False
+            try:
+                await asyncio.to_thread(self.store.save, profiler, name)
+            except OSError:
+                logger.exception("Could not save profile %s", name)
+
+    @staticmethod
+    def _requested_profiler(scope: Scope) -> Optional[str]:
+        """Profiler named by an admin's profile flag ('' for the default), else None."""
+        value = None
+        for raw_name, raw_value in scope.get("headers", ()):
+            if raw_name.lower() == PROFILE_HEADER:
+                value = raw_value.decode("latin-1")
+                break
+        if value is None:
+            query_string = scope.get("query_string", b"")
+            if PROFILE_QUERY_PARAM.encode() in query_string:
+                value = dict(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)).get(
+                    PROFILE_QUERY_PARAM
+                )
+        if value is None:
+            return None
+        auth = scope.get("state", {}).get("auth")
+        if auth is None or not auth.is_admin:
+            return None
+        value = value.strip().lower()
+        return value if value in ("cprofile", "sample") else ""
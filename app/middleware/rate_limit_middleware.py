@@ -0,0 +1,130 @@
+"""Rate limiting and load shedding middleware."""
+import logging
+from typing import Optional, Tuple
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.config import settings
+from app.core.metrics import http_requests_rejected_total
+from app.core.rate_limit import RateLimiter, parse_tiers, retry_after
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS_TIER = "anonymous"
+DEFAULT_TIER = "default"
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware applying per-client token buckets and load shedding.
+
+    Must run inside ``AuthMiddleware``: clients with a verified identity
+    (``request.state.auth.user_id``) are limited per user, in the tier named
+    by their ``RATE_LIMIT_TIER_CLAIM`` claim (``default`` otherwise).
+    Everyone else, including callers with unverified credentials (who could
+    otherwise mint a fresh bucket per request), is limited per client
+    address in the ``anonymous`` tier. Over-limit requests get ``429`` with
+    ``Retry-After``.
+
+    Behind ``proxy_hops`` proxies (``RATE_LIMIT_PROXY_HOPS``) the client
+    address is the ``X-Forwarded-For`` entry that many hops from the right:
+    the one appended by the outermost proxy. Entries to its left come from
+    the client and are ignored, so a spoofed header cannot mint a fresh
+    bucket. Requests that did not pass through all the proxies are keyed on
+    the connection's address.
+
+    When this worker already has ``LOAD_SHED_MAX_IN_FLIGHT`` requests in
+    progress it answers ``503``; low-priority paths are shed earlier, at
+    ``LOAD_SHED_LOW_PRIORITY_FRACTION`` of that. Exempt paths (``/health``)
+    are never limited or shed.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: Optional[RateLimiter] = None,
+        max_in_flight: Optional[int] = None,
+        proxy_hops: Optional[int] = None,
+    ) -> None:
+        self.app = app
+        if limiter is None:
+            limiter = RateLimiter(parse_tiers(settings.rate_limit_tiers), settings.rate_limit_max_keys)
+        self.limiter = limiter
+        for tier in (ANONYMOUS_TIER, DEFAULT_TIER):
+            if tier not in self.limiter.tiers:
+                raise ValueError(f"Rate limit tier {tier!r} must be configured")
+        self.tier_claim = settings.rate_limit_tier_claim
+        self.exempt_paths = frozenset(settings.rate_limit_exempt_paths)
+        self.low_priority_prefixes = tuple(settings.load_shed_low_priority_paths)
+        self.max_in_flight = (
+            max_in_flight if max_in_flight is not None else settings.load_shed_max_in_flight
+        )
+        self.low_priority_max_in_flight = (
+            self.max_in_flight * settings.load_shed_low_priority_fraction
+        )
+        self.proxy_hops = settings.rate_limit_proxy_hops if proxy_hops is None else proxy_hops
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self.max_in_flight and self.in_flight >= self._shed_limit(scope["path"]):
+            http_requests_rejected_total.inc(("shed",))
+            await self._reject(scope, receive, send, 503, "Server overloaded", 1)
+            return
+
+        key, tier = self._identify(scope)
+        wait = self.limiter.acquire(key, tier)
+        if wait:
+            http_requests_rejected_total.inc(("rate_limited",))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Rate limited %s (tier %s) on %s", key, tier, scope["path"])
+            await self._reject(scope, receive, send, 429, "Rate limit exceeded", wait)
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    def _shed_limit(self, path: str) -> float:
+        if path.startswith(self.low_priority_prefixes):
+            return self.low_priority_max_in_flight
+        return self.max_in_flight
+
+    def _identify(self, scope: Scope) -> Tuple[str, str]:
+        """Bucket key and tier for the request."""
+        auth = scope.get("state", {}).get("auth")
+        if auth is not None and auth.is_valid and auth.user_id:
+            tier = auth.claims.get(self.tier_claim)
+            # The claim comes from the token: it may be any JSON value
+            if not isinstance(tier, str) or tier not in self.limiter.tiers:
+                tier = DEFAULT_TIER
+            return f"user:{auth.user_id}", tier
+
+        return f"addr:{self._client_address(scope)}", ANONYMOUS_TIER
+
+    def _client_address(self, scope: Scope) -> str:
+        if self.proxy_hops:
+            hops = [
+                hop.strip()
+                for name, value in scope["headers"] if name == b"x-forwarded-for"
+                for hop in value.decode("latin-1").split(",")
+            ]
+            if len(hops) >= self.proxy_hops:
+                return hops[-self.proxy_hops]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    async def _reject(
+        scope: Scope, receive: Receive, send: Send, status_code: int, detail: str, wait: float
+    ) -> None:
+        response = JSONResponse(
+            {"detail": detail},
+            status_code=status_code,
+            headers={"Retry-After": retry_after(wait)},
+        )
+        await response(scope, receive, send)
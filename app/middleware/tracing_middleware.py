@@ -0,0 +1,92 @@
+"""Request tracing middleware."""
+from typing import Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.tracing import Trace, TraceExporter, end_trace, start_trace
+from app.core.utils import route_path
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware starting a trace for every HTTP request.
+
+    Spans opened while the request is handled (auth, handler, database
+    calls, serialization, compression) are collected in the request's trace
+    and, with ``server_timing``, summarised in a ``Server-Timing`` response
+    header. That header shows internal timings to every client, so it is
+    off unless enabled.
+
+    A W3C ``traceparent`` request header is continued (same trace id). Its
+    sampled flag is only followed with ``trust_upstream``, since any client
+    can set it; otherwise requests are sampled at the exporter's rate.
+    Sampled traces are handed to ``exporter`` once the response has been
+    sent.
+
+    Args:
+        app: ASGI application
+        exporter: Writes sampled traces (``None`` disables export)
+        server_timing: Add ``Server-Timing``; defaults to ``TRACING_SERVER_TIMING``
+        trust_upstream: Follow the caller's sampling decision; defaults to
+            ``TRACING_TRUST_UPSTREAM``
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        exporter: Optional[TraceExporter] = None,
+        server_timing: Optional[bool] = None,
+        trust_upstream: Optional[bool] = None,
+    ) -> None:
+        self.app = app
+        self.exporter = exporter
+        self.server_timing = settings.tracing_server_timing if server_timing is None else server_timing
+        self.trust_upstream = settings.tracing_trust_upstream if trust_upstream is None else trust_upstream
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        trace = Trace.from_traceparent(scope["method"], traceparent)
+        exporter = self.exporter
+        if exporter is not None and (trace.trace_id is None or not self.trust_upstream):
+            trace.sampled = exporter.should_sample()
+        server_timing = self.server_timing
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if server_timing:
+                    message["headers"] = [
+                        *message.get("headers", ()),
+                        (b"server-timing", trace.server_timing().encode("latin-1")),
+                    ]
+            await send(message)
+
+        token = start_trace(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            trace.error = True
+            raise
+        finally:
+            end_trace(token)
+            if exporter is not None and trace.sampled:
+                trace.finish()
+                route = route_path(scope)
+                trace.name = f"{scope['method']} {route}"
+                trace.error = trace.error or status_code >= 500
+                trace.attributes.update({
+                    "http.request.method": scope["method"],
+                    "http.route": route,
+                    "url.path": scope["path"],
+                    "http.response.status_code": status_code,
+                })
+                exporter.export(trace)
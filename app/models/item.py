@@ -0,0 +1,88 @@
+"""Item request and response models."""
+from datetime import datetime
+from typing import List, Literal, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ItemCreate(BaseModel):
+    """Fields accepted when creating an item."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    name: str = Field(min_length=1, max_length=255)
+    description: Optional[str] = None
+    price: Optional[float] = Field(default=None, ge=0)
+
+
+class Item(ItemCreate):
+    """An item as stored in the database."""
+
+    model_config = ConfigDict(extra="ignore")
+
+    id: int
+    created_at: Optional[datetime] = None
+
+
+class ItemAccepted(BaseModel):
+    """A journaled item waiting to be written (write-behind mode)."""
+
+    status: Literal["accepted"] = "accepted"
+    id: str
+
+
+class ItemRow(BaseModel):
+    """A listed item; with ``fields`` only the requested columns are present."""
+
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    created_at: Optional[datetime] = None
+
+
+class ItemPage(BaseModel):
+    """One keyset-paginated page of items."""
+
+    items: List[ItemRow]
+    next_cursor: Optional[str] = None
+
+
+class BulkCreatedRow(BaseModel):
+    """Bulk result for a row that was inserted."""
+
+    index: int
+    status: Literal["created"] = "created"
+    item: Item
+
+
+class BulkFailedRow(BaseModel):
+    """Bulk result for a row that was rejected."""
+
+    index: int
+    status: Literal["error"] = "error"
+    error: str
+
+
+class BulkCreateResult(BaseModel):
+    """Per-row outcome of ``POST /api/items/bulk``."""
+
+    created: int
+    failed: int
+    results: List[Union[BulkCreatedRow, BulkFailedRow]]
+
+
+class IngestError(BaseModel):
+    """A rejected line of an NDJSON ingest."""
+
+    line: int
+    error: str
+
+
+class IngestResult(BaseModel):
+    """Summary of ``POST /api/items/ingest``."""
+
+    lines: int
+    created: int
+    failed: int
+    errors: List[IngestError]
+    errors_truncated: bool = False
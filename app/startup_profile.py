@@ -0,0 +1,113 @@
+"""
+Startup profile: per-module import time and time to first response.
+
+Runs in fresh interpreters so nothing is already imported:
+  - ``python -X importtime`` on the app module, reporting the slowest
+    modules (cumulative) and self time grouped by top-level package
+  - the app under uvicorn, timing process start until ``/health`` first
+    returns 200
+
+Usage:
+    python -m app.startup_profile [--app app.main:app] [--top 20] [--runs 3]
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import httpx
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile_imports(module: str) -> List[Tuple[str, int, int]]:
+    """
+    Import ``module`` in a fresh interpreter with ``-X importtime``.
+
+    Returns:
+        ``(module, self_us, cumulative_us)`` for every module imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return rows
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response(app: str, path: str = "/health", timeout: float = 60.0) -> float:
+    """Seconds from starting uvicorn until ``path`` returns 200."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    env = {**os.environ, "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING")}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{app} exited with status {process.returncode}")
+                try:
+                    if client.get(url).status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise RuntimeError(f"{url} did not return 200 within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", default="app.main:app", help="uvicorn app to start")
+    parser.add_argument("--top", type=int, default=20, help="Modules/packages to list")
+    parser.add_argument("--runs", type=int, default=3, help="Server starts to time")
+    args = parser.parse_args(argv)
+
+    module = args.app.split(":", 1)[0]
+    rows = profile_imports(module)
+    total_us = next((cumulative for name, _, cumulative in rows if name == module), 0)
+
+    print(f"Import of {module}: {total_us / 1000:.1f}ms ({len(rows)} modules)\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".", 1)[0]] += self_us
+    print(f"\n{'self ms':>14}  package")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{self_us / 1000:>14.1f}  {package}")
+
+    samples = [time_to_first_response(args.app) for _ in range(args.runs)]
+    print(
+        f"\nProcess start -> GET /health 200 ({args.runs} runs): "
+        f"median {statistics.median(samples) * 1000:.0f}ms, "
+        f"min {min(samples) * 1000:.0f}ms, max {max(samples) * 1000:.0f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Two-tier cache across instances: hit rate, database loads and invalidation latency.
+
+Simulates ``--instances`` app instances in one process, each with its own
+in-process L1 and all sharing the local Redis stand-in (RESP over TCP) as
+L2. Requests pick keys from a Zipf-like distribution and go to a random
+instance; every ``--write-every`` requests an instance invalidates the
+namespace, as an item write does. Reports the hit rate per tier and the
+loads that reached the "database", against L1-only instances (which are
+invalidated all at once here, as if writes were broadcast; on their own
+they would serve other instances' stale pages), the same for a freshly
+started instance, and how long an invalidation takes to reach the other
+instances.
+
+Usage:
+    python -m benchmarks.bench_cache [--instances 10] [--requests 20000] [--keys 500]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from app.core.cache import ResponseCache, TieredCache
+from app.core.redis_client import RedisClient
+from benchmarks.fakes import FakeRedis
+
+
+async def run(
+    caches: list, requests: int, keys: int, write_every: int, load_ms: float, broadcast: bool = False
+) -> dict:
+    """Replay the same request mix against ``caches``; returns loads and elapsed time."""
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    loads = 0
+
+    async def load() -> bytes:
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(load_ms / 1000)
+        return b"x" * 2000
+
+    start = time.perf_counter()
+    for i in range(requests):
+        if write_every and i and i % write_every == 0:
+            for cache in (caches if broadcast else [rng.choice(caches)]):
+                cache.invalidate("items")
+            # Let the invalidation reach the other instances
+            await asyncio.sleep(0.002)
+        key = f"items:list?cursor={rng.choices(range(keys), weights)[0]}"
+        await rng.choice(caches).get_or_load("items", key, load)
+    return {"loads": loads, "elapsed": time.perf_counter() - start}
+
+
+async def _new_instance(redis_url: str, tiered: list) -> TieredCache:
+    cache = TieredCache(ResponseCache(ttl=60), shared=RedisClient(redis_url), prefix="bench")
+    cache.start()
+    await cache.subscribed.wait()
+    tiered.append(cache)
+    return cache
+
+
+async def invalidation_lag(caches: list, samples: int) -> list:
+    """Milliseconds until every other instance has dropped its entries, per invalidation."""
+    lags = []
+    for i in range(samples):
+        writer = caches[i % len(caches)]
+        others = [cache for cache in caches if cache is not writer]
+        before = [cache.remote_invalidations for cache in others]
+        start = time.perf_counter()
+        writer.invalidate("items")
+        while any(cache.remote_invalidations == count for cache, count in zip(others, before)):
+            await asyncio.sleep(0)
+        lags.append((time.perf_counter() - start) * 1000)
+    return lags
+
+
+async def main(instances: int, requests: int, keys: int, write_every: int, load_ms: float) -> None:
+    redis = FakeRedis()
+    await redis.start()
+    tiered: list = []
+    for _ in range(instances):
+        await _new_instance(redis.url, tiered)
+    local_only = [TieredCache(ResponseCache(ttl=60)) for _ in range(instances)]
+
+    print(f"{instances} instances, {requests} requests over {keys} keys, a write every {write_every}")
+    print(f"{'cache':<24} {'L1 hit %':>9} {'L2 hit %':>9} {'DB loads':>9} {'req/s':>8}")
+
+    async def report(label: str, caches: list, count: int, writes: int) -> None:
+        result = await run(caches, count, keys, writes, load_ms, broadcast=caches is local_only)
+        l1 = sum(cache.hits for cache in caches)
+        l2 = sum(cache.shared_hits for cache in caches)
+        print(
+            f"{label:<24} {l1 / count * 100:>9.1f} {l2 / count * 100:>9.1f} "
+            f"{result['loads']:>9} {count / result['elapsed']:>8.0f}"
+        )
+
+    await report("L1 only", local_only, requests, write_every)
+    await report("L1 + Redis", tiered, requests, write_every)
+    # A scale-up: one more instance joins and takes traffic
+    await report("new instance, L1 only", [TieredCache(ResponseCache(ttl=60))], requests // 10, 0)
+    await report("new instance, L1 + Redis", [await _new_instance(redis.url, tiered)], requests // 10, 0)
+
+    lags = sorted(await invalidation_lag(tiered, 200))
+    print(
+        f"invalidation reaching {len(tiered) - 1} other instances: "
+        f"p50 {statistics.median(lags):.2f} ms, p99 {lags[int(len(lags) * 0.99) - 1]:.2f} ms"
+    )
+    for cache in tiered:
+        await cache.stop()
+    await redis.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--instances", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=500)
+    parser.add_argument("--write-every", type=int, default=2000)
+    parser.add_argument("--load-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.instances, args.requests, args.keys, args.write_every, args.load_ms))
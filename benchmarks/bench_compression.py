@@ -0,0 +1,83 @@
+"""
+Response compression: bytes on the wire and CPU time per response size.
+
+For item pages of 10, 100, 1k and 10k items (encoded as GET /api/items
+does) and the app's OpenAPI schema, reports the body size and median
+compression time for gzip levels and brotli qualities, then the request
+rate for ``/openapi.json`` served from the precompressed cache vs
+compressed per request.
+
+Usage:
+    python -m benchmarks.bench_compression [--sizes 10 100 1000 10000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Tuple
+import httpx
+from app.core.compression import brotli, compress
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.main import create_application
+from benchmarks.bench_serialization import make_page, median_ms
+
+
+def _variants() -> List[Tuple[str, str, int]]:
+    variants = [("gzip-1", "gzip", 1), ("gzip-6", "gzip", 6)]
+    if brotli is not None:
+        variants += [("br-4", "br", 4), ("br-6", "br", 6)]
+    return variants
+
+
+def _compress(body: bytes, encoding: str, level: int) -> bytes:
+    return compress(body, encoding, gzip_level=level, brotli_quality=level)
+
+
+async def _openapi_rps(static: bool, total: int) -> float:
+    settings.rate_limit_enabled = False
+    settings.concurrency_limit_enabled = False
+    settings.compression_static_paths = ["/openapi.json"] if static else []
+    app = create_application()
+    transport = httpx.ASGITransport(app=app)
+    headers = {"accept-encoding": "br, gzip"}
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await client.get("/openapi.json", headers=headers)
+        start = time.perf_counter()
+        for _ in range(total):
+            response = await client.get("/openapi.json", headers=headers)
+            assert response.status_code == 200, response.status_code
+        return total / (time.perf_counter() - start)
+
+
+def main(sizes: List[int], repeat: int) -> None:
+    variants = _variants()
+    bodies = [(f"{size} items", dumps(make_page(size))) for size in sizes]
+    bodies.append(("openapi.json", dumps(create_application().openapi())))
+
+    print(f"{'payload':<14}{'raw bytes':>11}" + "".join(f"{name:>18}" for name, _, _ in variants))
+    print(f"{'':<14}{'':>11}" + "".join(f"{'bytes / ms':>18}" for _ in variants))
+    for label, body in bodies:
+        cells = []
+        for _, encoding, level in variants:
+            size = len(_compress(body, encoding, level))
+            ms = median_ms(repeat, lambda: _compress(body, encoding, level))
+            cells.append(f"{size:>10} / {ms:>5.2f}")
+        print(f"{label:<14}{len(body):>11}" + "".join(f"{cell:>18}" for cell in cells))
+
+    total = repeat * 50
+    cached = asyncio.run(_openapi_rps(static=True, total=total))
+    uncached = asyncio.run(_openapi_rps(static=False, total=total))
+    print(
+        f"\n/openapi.json  precompressed: {cached:8.0f} req/s  "
+        f"compressed per request: {uncached:8.0f} req/s  ({cached / uncached:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,89 @@
+"""
+GET /api/items/export: throughput and memory growth by format.
+
+Streams the whole table through the app in-process (calling the ASGI app
+directly, so the body is never buffered) against the SQLite-backed
+Supabase stand-in, and reports rows/s, MB/s and the peak RSS growth during
+the export. ``--latency-ms`` adds simulated database latency per page,
+which the next-page prefetch overlaps with sending the current page.
+
+Usage:
+    python -m benchmarks.bench_export [--rows 1000000] [--latency-ms 0]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from app.core.config import settings
+from app.core.database import get_db
+from app.main import create_application
+from benchmarks.fakes import FakeSupabase
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def export(app, query_string: bytes) -> tuple:
+    """Stream one export; returns (bytes received, peak RSS growth)."""
+    received = 0
+    baseline = peak = rss_bytes()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/api/items/export",
+        "raw_path": b"/api/items/export", "root_path": "", "query_string": query_string,
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal received, peak
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            peak = max(peak, rss_bytes())
+
+    await app(scope, receive, send)
+    return received, peak - baseline
+
+
+async def main(rows: int, latency_ms: float) -> None:
+    settings.rate_limit_enabled = False
+    settings.loop_monitor_enabled = False
+    db = FakeSupabase()
+    db.conn.execute(
+        "INSERT INTO items (name, description, price) "
+        "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+        "SELECT 'Item ' || i, 'Description of item ' || i, i % 100 FROM n",
+        (rows,),
+    )
+    db.latency = latency_ms / 1000
+    app = create_application()
+    app.dependency_overrides[get_db] = lambda: db
+
+    print(f"{'export':<22} {'rows/s':>10} {'MB/s':>8} {'MB sent':>8} {'RSS +MB':>8}")
+    for label, query_string in (
+        ("ndjson", b""),
+        ("ndjson fields=id,name", b"fields=id,name"),
+        ("csv", b"format=csv"),
+    ):
+        start = time.perf_counter()
+        received, growth = await export(app, query_string)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:<22} {rows / elapsed:>10.0f} {received / elapsed / 2**20:>8.1f} "
+            f"{received / 2**20:>8.1f} {growth / 2**20:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    # Request log lines (and slow-request warnings for every export) would add noise
+    logging.disable(logging.WARNING)
+    asyncio.run(main(args.rows, args.latency_ms))
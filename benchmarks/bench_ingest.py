@@ -0,0 +1,110 @@
+"""
+POST /api/items/ingest: throughput and memory growth by upload size.
+
+Uploads a generated NDJSON body through the app in-process, calling the
+ASGI app directly with 64 KiB chunks (as a server would pass them on), so
+the body is never buffered. Rows go to a database stub that counts them
+without keeping them, so the RSS growth is the ingest path's own.
+``--latency-ms`` adds simulated latency per insert, which the next batch's
+parsing overlaps.
+
+Usage:
+    python -m benchmarks.bench_ingest [--mb 64 256 1024] [--line-bytes 1000] [--latency-ms 0]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from types import SimpleNamespace
+from app.core.config import settings
+from app.core.database import get_db
+from app.main import create_application
+
+CHUNK_BYTES = 64 * 1024
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class CountingDB:
+    """Supabase stand-in whose inserts only count rows."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.rows = 0
+
+    def table(self, name: str) -> "CountingDB":
+        return self
+
+    def insert(self, rows: list) -> SimpleNamespace:
+        async def execute() -> SimpleNamespace:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            self.rows += len(rows)
+            return SimpleNamespace(data=rows)
+
+        return SimpleNamespace(execute=execute)
+
+
+async def ingest(app, chunk: bytes, chunks: int) -> tuple:
+    """Upload ``chunks`` copies of ``chunk``; returns (summary, peak RSS growth)."""
+    sent = 0
+    baseline = peak = rss_bytes()
+    body = bytearray()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/api/items/ingest",
+        "raw_path": b"/api/items/ingest", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/x-ndjson")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        nonlocal sent, peak
+        sent += 1
+        if sent % 64 == 0:
+            peak = max(peak, rss_bytes())
+        return {"type": "http.request", "body": chunk, "more_body": sent < chunks}
+
+    async def send(message):
+        body.extend(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return json.loads(body), peak - baseline
+
+
+async def main(sizes_mb: list, line_bytes: int, latency_ms: float) -> None:
+    settings.rate_limit_enabled = False
+    settings.loop_monitor_enabled = False
+    db = CountingDB(latency_ms / 1000)
+    app = create_application()
+    app.dependency_overrides[get_db] = lambda: db
+
+    line = json.dumps({"name": "Item", "description": "x" * line_bytes, "price": 1.5}).encode() + b"\n"
+    chunk = line * max(1, CHUNK_BYTES // len(line))
+    print(f"{'upload MB':>9} {'lines':>9} {'lines/s':>9} {'MB/s':>7} {'RSS +MB':>8}")
+    for size_mb in sizes_mb:
+        chunks = size_mb * 2**20 // len(chunk)
+        start = time.perf_counter()
+        summary, growth = await ingest(app, chunk, chunks)
+        elapsed = time.perf_counter() - start
+        assert summary["created"] == summary["lines"], summary
+        print(
+            f"{size_mb:>9} {summary['lines']:>9} {summary['lines'] / elapsed:>9.0f} "
+            f"{chunks * len(chunk) / elapsed / 2**20:>7.1f} {growth / 2**20:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=int, nargs="+", default=[64, 256, 1024])
+    parser.add_argument("--line-bytes", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    # Request log lines would add noise
+    logging.disable(logging.WARNING)
+    asyncio.run(main(args.mb, args.line_bytes, args.latency_ms))
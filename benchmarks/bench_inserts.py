@@ -0,0 +1,65 @@
+"""
+Insert throughput: one round trip per item vs coalesced batched inserts.
+
+Drives concurrent ``create_item``-style inserts through ``InsertCoalescer``
+against the SQLite-backed Supabase stand-in with simulated network latency
+and a bounded connection pool.
+
+Usage:
+    python -m benchmarks.bench_inserts [--items 5000] [--concurrency 200] [--latency-ms 5] [--pool 10]
+"""
+import argparse
+import asyncio
+import time
+from app.core.batching import InsertCoalescer
+from benchmarks.fakes import FakeSupabase
+
+
+async def run(
+    coalescer: InsertCoalescer, total: int, concurrency: int, latency: float, pool: int
+) -> dict:
+    db = FakeSupabase(latency=latency, max_connections=pool)
+    remaining = total
+
+    async def producer():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await coalescer.insert(db, {"name": "bench"})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(producer() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"rps": total / elapsed, "round_trips": db.executions}
+
+
+async def main(
+    total: int, concurrency: int, latency: float, pool: int, batch_size: int, window_ms: float
+) -> None:
+    configs = {
+        "per-item": InsertCoalescer("items", max_batch_size=1),
+        "coalesced": InsertCoalescer(
+            "items", max_batch_size=batch_size, flush_interval=window_ms / 1000
+        ),
+    }
+    for label, coalescer in configs.items():
+        result = await run(coalescer, total, concurrency, latency, pool)
+        print(
+            f"{label:<10} {result['rps']:10.0f} inserts/s  "
+            f"{result['round_trips']:6d} round trips"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--pool", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(
+        args.items, args.concurrency, args.latency_ms / 1000, args.pool,
+        args.batch_size, args.window_ms,
+    ))
@@ -0,0 +1,114 @@
+"""
+Per-request logging cost: synchronous handler vs queue-backed sampled logging.
+
+"before" mimics the previous setup: a synchronous file handler on the root
+logger and two f-string ``logger.info`` lines per request. "after" runs the
+current ``LoggingMiddleware`` with the root logger routed through a
+``QueueHandler`` at several sample rates. Log output goes to a temp file so
+real I/O is included; ``--sink-delay-us`` additionally simulates a slow sink
+(e.g. a stalled stdout pipe) by sleeping in the handler.
+
+Usage:
+    python -m benchmarks.bench_logging [--requests 20000] [--sink-delay-us 0]
+"""
+import argparse
+import asyncio
+import logging
+import queue
+import tempfile
+import time
+from logging.handlers import QueueListener
+from app.core.logging_config import DroppingQueueHandler, TEXT_FORMAT, RequestLogSampler
+from app.middleware.logging_middleware import LoggingMiddleware
+
+SCOPE = {
+    "type": "http",
+    "method": "GET",
+    "path": "/api/items/",
+    "client": ("127.0.0.1", 5000),
+    "headers": [],
+    "query_string": b"",
+}
+
+
+async def inner_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def noop_send(message):
+    pass
+
+
+async def legacy_middleware(scope, receive, send):
+    """Previous behaviour: two eagerly formatted lines per request."""
+    logger = logging.getLogger("app.middleware.logging_middleware")
+    start_time = time.time()
+    logger.info(
+        f"Request: {scope['method']} {scope['path']} - Client: {scope['client'][0]}"
+    )
+    await inner_app(scope, receive, send)
+    process_time = time.time() - start_time
+    logger.info(
+        f"Response: {scope['method']} {scope['path']} - Status: 200 - "
+        f"Time: {process_time:.3f}s"
+    )
+
+
+class SlowFileHandler(logging.FileHandler):
+    """File handler whose writes stall for a fixed delay."""
+
+    def __init__(self, filename: str, delay: float):
+        super().__init__(filename)
+        self.delay = delay
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        super().emit(record)
+
+
+async def time_requests(app, total: int) -> float:
+    """Return mean microseconds per request."""
+    start = time.perf_counter()
+    for _ in range(total):
+        await app(dict(SCOPE), None, noop_send)
+    return (time.perf_counter() - start) / total * 1e6
+
+
+def configure_root(handler: logging.Handler) -> None:
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+
+
+async def main(total: int, sink_delay: float) -> None:
+    with tempfile.NamedTemporaryFile("w", suffix=".log") as log_file:
+        file_handler = SlowFileHandler(log_file.name, sink_delay)
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        configure_root(file_handler)
+        before = await time_requests(legacy_middleware, total)
+        print(f"{'before (sync handler, 2 lines)':<38} {before:7.1f} us/request")
+
+        log_queue: queue.Queue = queue.Queue(maxsize=100000)
+        listener = QueueListener(log_queue, file_handler)
+        listener.start()
+        configure_root(DroppingQueueHandler(log_queue))
+        try:
+            for rate in (1.0, 0.1, 0.0):
+                middleware = LoggingMiddleware(inner_app, sampler=RequestLogSampler(rate))
+                after = await time_requests(middleware, total)
+                label = f"after (queue handler, sample {rate:.0%})"
+                print(f"{label:<38} {after:7.1f} us/request")
+        finally:
+            listener.stop()
+            file_handler.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sink-delay-us", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.sink_delay_us / 1e6))
@@ -0,0 +1,138 @@
+"""
+Requests-per-second comparison of the middleware stack.
+
+"before" rebuilds the previous ``BaseHTTPMiddleware``-based logging/auth
+middleware (including the per-request ``print``); "after" is the current
+pure ASGI stack from ``create_application``. Requests are driven in-process
+through ``httpx.ASGITransport`` so only application overhead is measured.
+
+Usage:
+    python -m benchmarks.bench_middleware [--requests 5000] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+import httpx
+from app.core.database import get_db
+from app.core.config import settings
+from app.main import create_application
+from app.middleware.logging_middleware import LoggingMiddleware
+from app.middleware.auth_middleware import AuthMiddleware
+from benchmarks.fakes import FakeSupabase
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """Previous BaseHTTPMiddleware logging implementation."""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        logger = logging.getLogger("app.middleware.logging_middleware")
+        logger.info(
+            f"Request: {request.method} {request.url.path} - "
+            f"Client: {request.client.host if request.client else 'unknown'}"
+        )
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logger.info(
+            f"Response: {request.method} {request.url.path} - "
+            f"Status: {response.status_code} - Time: {process_time:.3f}s"
+        )
+        response.headers["X-Process-Time"] = str(process_time)
+        return response
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    """Previous BaseHTTPMiddleware auth implementation."""
+
+    async def dispatch(self, request: Request, call_next):
+        auth_headers = {}
+        for header_name in AuthMiddleware.AUTH_HEADER_NAMES:
+            header_value = request.headers.get(header_name) or request.headers.get(
+                header_name.replace("-", "_")
+            )
+            if header_value:
+                auth_headers[header_name] = header_value
+        if auth_headers:
+            print(f"[Auth Middleware] Intercepted auth headers: {auth_headers}")
+        else:
+            print("[Auth Middleware] No auth headers found in request")
+        request.state.auth = None
+        return await call_next(request)
+
+
+def build_legacy_app() -> FastAPI:
+    """Build the application with the legacy middleware swapped in."""
+    app = create_application()
+    app.user_middleware = [
+        m for m in app.user_middleware
+        if m.cls not in (LoggingMiddleware, AuthMiddleware)
+    ]
+    app.add_middleware(LegacyLoggingMiddleware)
+    app.add_middleware(LegacyAuthMiddleware)
+    return app
+
+
+async def measure(app: FastAPI, path: str, total: int, concurrency: int) -> float:
+    """Drive ``total`` GET requests at ``concurrency`` and return RPS."""
+    transport = httpx.ASGITransport(app=app)
+    remaining = total
+
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get(path, headers={"x-api-key": "bench"})
+                assert response.status_code == 200, response.status_code
+
+        await app.state.warm_up_task
+        # Warm up routing and dependency caches
+        for _ in range(50):
+            await client.get(path)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return total / elapsed
+
+
+async def main(total: int, concurrency: int) -> None:
+    # A single benchmark client would exhaust its rate limit bucket, and the
+    # CPU-bound in-process run would trip the adaptive concurrency limit
+    settings.rate_limit_enabled = False
+    settings.concurrency_limit_enabled = False
+    apps = {"before": build_legacy_app(), "after": create_application()}
+    fake_db = FakeSupabase()
+    fake_db.seed("items", [{"name": f"Item {i}"} for i in range(100)])
+    for app in apps.values():
+        app.dependency_overrides[get_db] = lambda: fake_db
+    results = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for path in ("/health", "/api/items/"):
+            for label, app in apps.items():
+                results[(path, label)] = await measure(app, path, total, concurrency)
+
+    for path in ("/health", "/api/items/"):
+        before = results[(path, "before")]
+        after = results[(path, "after")]
+        print(
+            f"{path:<14} before: {before:8.0f} req/s  after: {after:8.0f} req/s  "
+            f"({after / before:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    # Request log lines would dominate the measurement
+    logging.disable(logging.INFO)
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,48 @@
+"""
+Latency of GET /api/items by page depth: offset vs keyset pagination.
+
+Runs ``list_items`` (the uncached query path of GET /api/items) against the SQLite-backed Supabase stand-in so OFFSET
+scans behave as they would on a real database.
+
+Usage:
+    python -m benchmarks.bench_pagination [--rows 200000] [--limit 100]
+"""
+import argparse
+import asyncio
+import time
+from app.api.endpoints.items import list_items, ITEMS_SORT_KEY
+from app.core.pagination import encode_cursor
+from benchmarks.fakes import FakeSupabase
+
+
+async def time_call(repeat: int, db: FakeSupabase, **kwargs) -> float:
+    """Return the median latency (ms) of ``list_items(db, **kwargs)``."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await list_items(db, **kwargs)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+async def main(rows: int, limit: int, repeat: int) -> None:
+    db = FakeSupabase()
+    db.seed("items", ({"name": f"Item {i}"} for i in range(rows)))
+
+    print(f"{'depth':>10} {'offset ms':>10} {'cursor ms':>10}")
+    for depth in (0, rows // 100, rows // 10, rows // 2, rows - limit):
+        offset_ms = await time_call(repeat, db, skip=depth, limit=limit)
+        # Cursor pointing at the row just before ``depth`` (ids start at 1)
+        cursor = encode_cursor({ITEMS_SORT_KEY: depth}) if depth else None
+        cursor_ms = await time_call(repeat, db, cursor=cursor, limit=limit)
+        print(f"{depth:>10} {offset_ms:>10.3f} {cursor_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.limit, args.repeat))
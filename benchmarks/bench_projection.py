@@ -0,0 +1,91 @@
+"""
+Column projection and filtering on GET /api/items: bytes fetched and page latency.
+
+Runs ``list_items`` through the real Supabase client against the PostgREST
+stand-in (over an in-process ASGI transport), so the response body is
+encoded, sent and decoded as it would be from Supabase. Rows carry a
+``--description-bytes`` description, as wide rows do in practice. Also
+reports the cost of parsing a query plan against fetching a cached one.
+
+Usage:
+    python -m benchmarks.bench_projection [--rows 10000] [--limit 100] [--description-bytes 1000]
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from supabase import AsyncClientOptions, acreate_client
+from app.api.endpoints.items import ITEMS_QUERY, list_items
+from app.core.query import QueryPlan
+from benchmarks.fakes import FakeSupabase, create_postgrest_app
+
+QUERIES = {
+    "all columns": {},
+    "fields=id,name": {"fields": "id,name"},
+    "fields=id,name, -price": {"fields": "id,name", "sort": "-price"},
+    "fields=id,name, filter": {"fields": "id,name", "filters": ["price.gte.50", "name.ilike.Item 1*"]},
+}
+
+
+async def time_page(client, plan: QueryPlan, limit: int, repeat: int, received: list) -> float:
+    """Median latency (ms) of the second page (a cursor query) for ``plan``."""
+    cursor = (await list_items(client, limit=limit, plan=plan))["next_cursor"]
+    samples = []
+    for _ in range(repeat):
+        received.clear()
+        start = time.perf_counter()
+        await list_items(client, limit=limit, cursor=cursor, plan=plan)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def plan_us(count: int) -> tuple:
+    """Microseconds per ``ITEMS_QUERY.plan`` call: parsed (cache miss) and cached."""
+    params = QUERIES["fields=id,name, filter"]
+    start = time.perf_counter()
+    for i in range(count):
+        ITEMS_QUERY.plan(fields=params["fields"], filters=[f"price.gte.{i}", *params["filters"][1:]])
+    parsed = (time.perf_counter() - start) / count * 1e6
+    start = time.perf_counter()
+    for _ in range(count):
+        ITEMS_QUERY.plan(**params)
+    cached = (time.perf_counter() - start) / count * 1e6
+    return parsed, cached
+
+
+async def main(rows: int, limit: int, description_bytes: int, repeat: int) -> None:
+    db = FakeSupabase()
+    db.seed("items", (
+        {"name": f"Item {i}", "description": "x" * description_bytes, "price": float(i % 100)}
+        for i in range(rows)
+    ))
+    received: list = []
+
+    async def count_bytes(response: httpx.Response) -> None:
+        await response.aread()
+        received.append(len(response.content))
+
+    transport = httpx.ASGITransport(app=create_postgrest_app(db))
+    async with httpx.AsyncClient(transport=transport, event_hooks={"response": [count_bytes]}) as http:
+        client = await acreate_client(
+            "http://postgrest.local", "bench-key", options=AsyncClientOptions(httpx_client=http)
+        )
+        print(f"{'query':<26} {'bytes/page':>11} {'page ms':>9}")
+        for label, params in QUERIES.items():
+            plan = ITEMS_QUERY.plan(**params)
+            page_ms = await time_page(client, plan, limit, repeat, received)
+            print(f"{label:<26} {received[-1]:>11} {page_ms:>9.2f}")
+
+    parsed, cached = plan_us(10000)
+    print(f"query plan: parsed {parsed:.1f} us, cached {cached:.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--description-bytes", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.limit, args.description_bytes, args.repeat))
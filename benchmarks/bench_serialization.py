@@ -0,0 +1,72 @@
+"""
+Serialization time of item pages: default FastAPI path vs direct encoding.
+
+Compares, for pages of 100, 1k and 10k items:
+  - ``jsonable_encoder`` + stdlib ``json`` (FastAPI's default for ``dict`` returns)
+  - pydantic ``ItemPage`` validation + ``model_dump_json`` (typed response model)
+  - ``app.core.serialization`` encoders straight to bytes (what GET /api/items uses)
+
+Usage:
+    python -m benchmarks.bench_serialization [--sizes 100 1000 10000] [--repeat 20]
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Callable, List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.serialization import get_dumps, orjson, msgspec
+from app.models.item import ItemPage
+
+
+def make_page(size: int) -> dict:
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat()
+    return {
+        "items": [
+            {
+                "id": i,
+                "name": f"Item {i}",
+                "description": "A reasonably sized description for item number %d" % i,
+                "price": i * 1.25,
+                "created_at": created_at,
+            }
+            for i in range(size)
+        ],
+        "next_cursor": "eyJpZCI6IDk5fQ",
+    }
+
+
+def median_ms(repeat: int, fn: Callable[[], bytes]) -> float:
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main(sizes: List[int], repeat: int) -> None:
+    strategies = {
+        "jsonable+json": lambda page: JSONResponse(jsonable_encoder(page)).body,
+        "pydantic": lambda page: ItemPage.model_validate(page).model_dump_json().encode(),
+        "stdlib": get_dumps("stdlib"),
+    }
+    if orjson is not None:
+        strategies["orjson"] = get_dumps("orjson")
+    if msgspec is not None:
+        strategies["msgspec"] = get_dumps("msgspec")
+
+    print(f"{'items':>7}" + "".join(f"{name:>15}" for name in strategies) + "   (median ms)")
+    for size in sizes:
+        page = make_page(size)
+        timings = [median_ms(repeat, lambda: encode(page)) for encode in strategies.values()]
+        print(f"{size:>7}" + "".join(f"{ms:>15.3f}" for ms in timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
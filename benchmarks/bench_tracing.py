@@ -0,0 +1,124 @@
+"""
+Tracing overhead: cost per span and per request.
+
+Reports the time to open and close one span inside a traced request and
+outside one (the no-op path every instrumented call takes when tracing is
+off), the cost of building a ``Server-Timing`` header, and the request rate
+of ``/health`` and ``/api/items/`` with tracing disabled, enabled, and
+enabled with every trace exported.
+
+Usage:
+    python -m benchmarks.bench_tracing [--spans 200000] [--requests 5000] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.tracing import Trace, end_trace, span, start_trace
+from app.main import create_application
+from benchmarks.bench_middleware import measure
+from benchmarks.fakes import FakeSupabase
+
+
+def span_ns(count: int, traced: bool) -> float:
+    """Mean nanoseconds to enter and exit a span, with or without an active trace."""
+    best = float("inf")
+    batch = 100  # below MAX_SPANS, so every span in a batch is recorded
+    for _ in range(5):
+        elapsed = 0
+        for _ in range(count // batch):
+            trace = Trace("GET")
+            token = start_trace(trace) if traced else None
+            start = time.perf_counter_ns()
+            for _ in range(batch):
+                with span("db"):
+                    pass
+            elapsed += time.perf_counter_ns() - start
+            if token is not None:
+                end_trace(token)
+        best = min(best, elapsed / (count // batch * batch))
+    return best
+
+
+def server_timing_ns(count: int) -> float:
+    """Mean nanoseconds to render Server-Timing for a request with a typical set of spans."""
+    trace = Trace("GET")
+    token = start_trace(trace)
+    with span("auth"):
+        pass
+    with span("handler"):
+        for _ in range(3):
+            with span("db"):
+                pass
+    with span("serialize"):
+        pass
+    end_trace(token)
+    start = time.perf_counter_ns()
+    for _ in range(count):
+        trace.server_timing()
+    return (time.perf_counter_ns() - start) / count
+
+
+async def request_rates(total: int, concurrency: int, export_path: str) -> dict:
+    settings.rate_limit_enabled = False
+    settings.concurrency_limit_enabled = False
+    settings.loop_monitor_enabled = False
+    fake_db = FakeSupabase()
+    fake_db.seed("items", [{"name": f"Item {i}"} for i in range(100)])
+    variants = {
+        "off": (False, None, 0.0),
+        "on": (True, None, 0.0),
+        "on+export": (True, export_path, 1.0),
+    }
+    apps = {}
+    for label, (enabled, path, rate) in variants.items():
+        settings.tracing_enabled = enabled
+        settings.tracing_server_timing = enabled
+        settings.tracing_export_path = path
+        settings.tracing_sample_rate = rate
+        apps[label] = create_application()
+        apps[label].dependency_overrides[get_db] = lambda: fake_db
+    results = {}
+    # Variants take turns, best of three rounds, to even out drift on a noisy machine
+    for _ in range(3):
+        for route in ("/health", "/api/items/"):
+            for label, app in apps.items():
+                rate = await measure(app, route, total, concurrency)
+                results[(route, label)] = max(rate, results.get((route, label), 0.0))
+    return results
+
+
+def main(spans: int, total: int, concurrency: int) -> None:
+    traced = span_ns(spans, traced=True)
+    untraced = span_ns(spans, traced=False)
+    header = server_timing_ns(spans // 10)
+    print(f"span (traced request):   {traced:7.0f} ns")
+    print(f"span (no active trace):  {untraced:7.0f} ns")
+    print(f"Server-Timing header:    {header:7.0f} ns")
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = asyncio.run(
+            request_rates(total, concurrency, os.path.join(directory, "traces.jsonl"))
+        )
+    for route in ("/health", "/api/items/"):
+        off = results[(route, "off")]
+        cells = "  ".join(
+            f"{label}: {results[(route, label)]:7.0f} req/s ({results[(route, label)] / off - 1:+.1%})"
+            for label in ("on", "on+export")
+        )
+        print(f"{route:<14} off: {off:7.0f} req/s  {cells}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--spans", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    # Request log lines would dominate the measurement
+    logging.disable(logging.INFO)
+    main(args.spans, args.requests, args.concurrency)
@@ -0,0 +1,51 @@
+"""
+Local Supabase/PostgREST stand-in server for load tests.
+
+Serves ``benchmarks.fakes.create_postgrest_app`` over HTTP with injected latency
+and faults, so the app's real Supabase client and connection pool are
+exercised.
+
+Usage:
+    python -m benchmarks.fake_postgrest [--port 54321] [--latency-ms 5] [--rows 1000]
+        [--error-rate 0.01] [--slow-rate 0.02 --slow-ms 500]
+"""
+import argparse
+import uvicorn
+from benchmarks.fakes import FakeSupabase, create_postgrest_app
+
+
+def build_app(
+    latency_ms: float,
+    rows: int,
+    error_rate: float = 0.0,
+    slow_rate: float = 0.0,
+    slow_ms: float = 0.0,
+):
+    """Create the stand-in seeded with ``rows`` items."""
+    db = FakeSupabase(
+        latency=latency_ms / 1000,
+        error_rate=error_rate,
+        slow_rate=slow_rate,
+        slow_latency=slow_ms / 1000,
+    )
+    db.seed("items", ({"name": f"Item {i}", "price": i} for i in range(rows)))
+    return create_postgrest_app(db)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of requests taking --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(
+        build_app(args.latency_ms, args.rows, args.error_rate, args.slow_rate, args.slow_ms),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        access_log=False,
+    )
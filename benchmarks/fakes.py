@@ -0,0 +1,482 @@
+"""
+Local Supabase stand-ins backed by SQLite.
+
+Used by the benchmarks and load tests, and imported by the test suite from
+here, so running them needs nothing from ``tests/``.
+
+``FakeSupabase`` implements the subset of the async postgrest query builder
+used by the app (``table().select()/insert()``, comparison, ``in``,
+``ilike``, ``is`` and ``or`` filters, ``order``, ``limit``, ``range`` and
+``execute``). NULLs sort as in Postgres (last ascending, first
+descending, unless ``nullsfirst`` is given). Because it runs real SQL
+against an indexed table, OFFSET and keyset queries cost what they would on
+a real database.
+
+``create_postgrest_app`` serves the same engine over HTTP with PostgREST's
+URL grammar, so the real Supabase client (and its connection pool) can be
+pointed at it.
+
+``FakeRedis`` is a local Redis server speaking RESP over TCP, for the
+shared cache tier.
+"""
+import asyncio
+import json
+import random
+import sqlite3
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from postgrest.exceptions import APIError
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class FakeResponse:
+    """Mimics ``postgrest.APIResponse``."""
+
+    def __init__(self, data: List[dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """Chainable query builder compatible with the async postgrest API."""
+
+    _OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._columns = "*"
+        self._insert_rows: Optional[List[dict]] = None
+        self._where: List[Tuple[str, List[Any]]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+
+    def select(self, *columns: str, count: Optional[str] = None) -> "FakeQuery":
+        self._columns = ",".join(columns) or "*"
+        return self
+
+    def insert(self, json: Any, **kwargs: Any) -> "FakeQuery":
+        self._insert_rows = json if isinstance(json, list) else [json]
+        return self
+
+    def _filter(self, column: str, op: str, value: Any) -> "FakeQuery":
+        self._where.append((f'"{column}" {op} ?', [value]))
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(column, "=", value)
+
+    def neq(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(column, "!=", value)
+
+    def gt(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(column, ">", value)
+
+    def gte(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(column, ">=", value)
+
+    def lt(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(column, "<", value)
+
+    def lte(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(column, "<=", value)
+
+    def in_(self, column: str, values: Iterable[Any]) -> "FakeQuery":
+        values = list(values)
+        placeholders = ",".join("?" for _ in values)
+        self._where.append((f'"{column}" IN ({placeholders})', values))
+        return self
+
+    def ilike(self, column: str, pattern: str) -> "FakeQuery":
+        self._where.append((f'"{column}" LIKE ?', [pattern.replace("*", "%")]))
+        return self
+
+    def is_(self, column: str, value: Any) -> "FakeQuery":
+        self._where.append((f'"{column}" IS NULL', []))
+        return self
+
+    def or_(self, filters: str) -> "FakeQuery":
+        sql, params = _parse_or(filters)
+        self._where.append((sql, params))
+        return self
+
+    def order(
+        self, column: str, *, desc: bool = False, nullsfirst: Optional[bool] = None, **kwargs: Any
+    ) -> "FakeQuery":
+        nulls_first = desc if nullsfirst is None else nullsfirst
+        self._order.append(
+            f'"{column}" {"DESC" if desc else "ASC"} NULLS {"FIRST" if nulls_first else "LAST"}'
+        )
+        return self
+
+    def limit(self, size: int, **kwargs: Any) -> "FakeQuery":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs: Any) -> "FakeQuery":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    async def execute(self) -> FakeResponse:
+        self._db.executions += 1
+        if self._db.connections is not None:
+            async with self._db.connections:
+                return await self._execute()
+        return await self._execute()
+
+    async def _execute(self) -> FakeResponse:
+        db = self._db
+        latency = db.latency
+        if db.slow_rate and db.random.random() < db.slow_rate:
+            latency = db.slow_latency
+        if latency:
+            await asyncio.sleep(latency)
+        if db.fail_next:
+            db.fail_next -= 1
+            raise ConnectionError("injected failure")
+        if db.error_rate and db.random.random() < db.error_rate:
+            raise ConnectionError("injected failure")
+        try:
+            if self._insert_rows is not None:
+                return FakeResponse(self._db._insert(self._table, self._insert_rows))
+            return FakeResponse(self._db._query(self))
+        except sqlite3.Error as e:
+            # Rejected as PostgREST would: a constraint violation or an unknown column (400)
+            code = "23502" if isinstance(e, sqlite3.IntegrityError) else "PGRST204"
+            raise APIError({"code": code, "message": str(e), "hint": None, "details": None}) from e
+
+    def _sql(self) -> Tuple[str, List[Any]]:
+        columns = (
+            "*" if self._columns.strip() == "*"
+            else ", ".join(f'"{c.strip()}"' for c in self._columns.split(","))
+        )
+        sql = f'SELECT {columns} FROM "{self._table}"'
+        params: List[Any] = []
+        if self._where:
+            sql += " WHERE " + " AND ".join(clause for clause, _ in self._where)
+            for _, values in self._where:
+                params.extend(values)
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+            if self._offset is not None:
+                sql += " OFFSET ?"
+                params.append(self._offset)
+        return sql, params
+
+
+def _parse_or(filters: str) -> Tuple[str, List[Any]]:
+    """Translate a PostgREST ``or=(...)`` expression into SQL."""
+    filters = filters.strip()
+    joiner = " OR "
+    for prefix, nested_joiner in (("and(", " AND "), ("or(", " OR ")):
+        if filters.startswith(prefix) and filters.endswith(")"):
+            filters, joiner = filters[len(prefix):-1], nested_joiner
+            break
+    parts = _split_top_level(filters)
+    if len(parts) > 1 or joiner == " AND ":
+        clauses = [_parse_or(part) for part in parts]
+        return (
+            "(" + joiner.join(c for c, _ in clauses) + ")",
+            [p for _, params in clauses for p in params],
+        )
+    column, op, value = filters.split(".", 2)
+    if op == "is":
+        return f'"{column}" IS NULL', []
+    return f'"{column}" {FakeQuery._OPERATORS[op]} ?', [_coerce(value)]
+
+
+def _split_top_level(expr: str) -> List[str]:
+    """Split on commas outside parentheses and double-quoted values."""
+    parts, depth, current = [], 0, ""
+    quoted = escaped = False
+    for char in expr:
+        if quoted:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                quoted = False
+        elif char == '"':
+            quoted = True
+        elif char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        else:
+            depth += char == "("
+            depth -= char == ")"
+        current += char
+    parts.append(current)
+    return parts
+
+
+def _coerce(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value.strip('"')
+
+
+class FakeSupabase:
+    """
+    In-process Supabase client stand-in.
+
+    Faults can be injected with ``fail_next`` (fail the next N executions),
+    ``error_rate`` and ``slow_rate``; random faults use a seeded generator,
+    so runs are reproducible.
+
+    Args:
+        latency: Seconds of simulated network latency per ``execute``
+        max_connections: Simulated connection pool size (unbounded if None)
+        error_rate: Fraction of executions failing with ``ConnectionError``
+        slow_rate: Fraction of executions taking ``slow_latency`` instead
+        slow_latency: Seconds taken by a slow execution
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        max_connections: Optional[int] = None,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+    ):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.random = random.Random(0)
+        self.connections = (
+            asyncio.Semaphore(max_connections) if max_connections else None
+        )
+        self.fail_next = 0
+        self.executions = 0
+        self.create_table("items", ["name", "description", "price", "created_at"])
+
+    def create_table(self, name: str, columns: List[str]) -> None:
+        column_sql = ", ".join(f'"{c}"' for c in columns)
+        self.conn.execute(
+            f'CREATE TABLE "{name}" (id INTEGER PRIMARY KEY AUTOINCREMENT, {column_sql})'
+        )
+
+    def seed(self, table: str, rows: Iterable[dict]) -> None:
+        self._insert(table, list(rows))
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def _insert(self, table: str, rows: List[dict]) -> List[dict]:
+        inserted = []
+        # One transaction per insert call, so a bad row rolls back the batch
+        with self.conn:
+            for row in rows:
+                columns = ", ".join(f'"{c}"' for c in row)
+                placeholders = ", ".join("?" for _ in row)
+                cursor = self.conn.execute(
+                    f'INSERT INTO "{table}" ({columns}) VALUES ({placeholders})',
+                    list(row.values()),
+                )
+                inserted.append({"id": cursor.lastrowid, **row})
+        return inserted
+
+    def _query(self, query: FakeQuery) -> List[Dict[str, Any]]:
+        sql, params = query._sql()
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+
+def create_postgrest_app(db: FakeSupabase) -> Starlette:
+    """
+    Serve ``db`` as a PostgREST-compatible ``/rest/v1/{table}`` API.
+
+    Supports ``select``, ``order``, ``limit``, ``offset``, ``or`` and
+    ``column=op.value`` (including ``in`` and ``is.null``) filters on GET, and JSON inserts on POST. Latency
+    and failures injected on ``db`` apply to every request.
+    """
+    async def table_endpoint(request: Request) -> JSONResponse:
+        query = db.table(request.path_params["table"])
+        try:
+            if request.method == "POST":
+                query.insert(json.loads(await request.body()))
+            else:
+                _apply_params(query, request.query_params.multi_items())
+            response = await query.execute()
+        except APIError as e:
+            return JSONResponse(e.json(), status_code=400)
+        except ConnectionError as e:
+            return JSONResponse(
+                {"code": "PGRST001", "message": str(e), "hint": None, "details": None}, status_code=503
+            )
+        return JSONResponse(response.data, status_code=201 if request.method == "POST" else 200)
+
+    return Starlette(routes=[
+        Route("/rest/v1/{table}", table_endpoint, methods=["GET", "POST"]),
+    ])
+
+
+def _apply_params(query: FakeQuery, params: List[Tuple[str, str]]) -> None:
+    offset = None
+    for name, value in params:
+        if name == "select":
+            query.select(value)
+        elif name == "order":
+            for term in value.split(","):
+                column, *modifiers = term.split(".")
+                nullsfirst = (
+                    True if "nullsfirst" in modifiers
+                    else False if "nullslast" in modifiers
+                    else None
+                )
+                query.order(column, desc="desc" in modifiers, nullsfirst=nullsfirst)
+        elif name == "limit":
+            query.limit(int(value))
+        elif name == "offset":
+            offset = int(value)
+        elif name == "or":
+            query.or_(value[1:-1] if value.startswith("(") else value)
+        else:
+            op, _, operand = value.partition(".")
+            if op == "in":
+                query.in_(name, [_coerce(v) for v in _split_top_level(operand[1:-1])])
+            elif op == "is":
+                query.is_(name, None)
+            elif op == "ilike":
+                query.ilike(name, operand)
+            else:
+                query._filter(name, FakeQuery._OPERATORS[op], _coerce(operand))
+    if offset is not None:
+        query._offset = offset
+        if query._limit is None:
+            query._limit = -1
+
+
+class FakeRedis:
+    """
+    In-memory Redis server on localhost, speaking RESP2 over TCP.
+
+    Supports ``PING``, ``AUTH``, ``SELECT``, ``GET``, ``SET`` (with ``PX``),
+    ``DEL``, ``INCR``, ``FLUSHALL``, ``PUBLISH`` and ``SUBSCRIBE``, which is
+    what the app's Redis client uses. ``latency`` delays every reply;
+    ``commands`` counts commands by name. ``stop`` closes the server and all
+    connections, as a Redis restart would.
+
+    Usage:
+        redis = FakeRedis()
+        await redis.start()
+        client = RedisClient(redis.url)
+    """
+
+    def __init__(self) -> None:
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.subscribers: Dict[bytes, Set[asyncio.StreamWriter]] = defaultdict(set)
+        self.commands: Dict[str, int] = defaultdict(int)
+        self.latency = 0.0
+        self.port = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._connections: Set[asyncio.Task] = set()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        # Connection handlers see EOF and return
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self.subscribers.clear()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        self._connections.add(asyncio.current_task())
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    return
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(self._execute(command, writer))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            self._connections.discard(asyncio.current_task())
+            self._writers.discard(writer)
+            for subscribers in self.subscribers.values():
+                subscribers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _execute(self, command: List[bytes], writer: asyncio.StreamWriter) -> bytes:
+        name, args = command[0].upper().decode(), command[1:]
+        self.commands[name] += 1
+        if name in ("PING", "AUTH", "SELECT", "FLUSHALL"):
+            if name == "FLUSHALL":
+                self.data.clear()
+            return b"+OK\r\n" if name != "PING" else b"+PONG\r\n"
+        if name == "GET":
+            return _bulk(self._get(args[0]))
+        if name == "SET":
+            expires_at = None
+            if len(args) == 4 and args[2].upper() == b"PX":
+                expires_at = time.monotonic() + int(args[3]) / 1000
+            self.data[args[0]] = (args[1], expires_at)
+            return b"+OK\r\n"
+        if name == "DEL":
+            return b":%d\r\n" % sum(self.data.pop(key, None) is not None for key in args)
+        if name == "INCR":
+            value = int(self._get(args[0]) or 0) + 1
+            self.data[args[0]] = (b"%d" % value, None)
+            return b":%d\r\n" % value
+        if name == "PUBLISH":
+            message = b"*3\r\n" + _bulk(b"message") + _bulk(args[0]) + _bulk(args[1])
+            subscribers = self.subscribers.get(args[0], ())
+            for subscriber in subscribers:
+                subscriber.write(message)
+            return b":%d\r\n" % len(subscribers)
+        if name == "SUBSCRIBE":
+            self.subscribers[args[0]].add(writer)
+            return b"*3\r\n" + _bulk(b"subscribe") + _bulk(args[0]) + b":1\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
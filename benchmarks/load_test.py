@@ -0,0 +1,231 @@
+"""
+Load test the app against a local PostgREST stand-in and track baselines.
+
+Starts ``benchmarks.fake_postgrest`` and the app (``uvicorn --factory
+app.main:create_application``) as subprocesses, then drives ``/health``,
+``GET /api/items`` and ``POST /api/items`` at fixed concurrency levels and
+reports requests/s and p50/p95/p99 latency. Results can be saved as a JSON
+baseline and later runs compared against it; the process exits with status
+1 if any scenario regressed beyond the threshold.
+
+Usage:
+    python -m benchmarks.load_test [--duration 5] [--concurrency 1 16 64]
+        [--latency-ms 5] [--save benchmarks/baselines/local.json]
+        [--compare benchmarks/baselines/local.json] [--threshold 0.15]
+        [--min-delta-ms 1] [--db-arg=--slow-rate=0.05 --db-arg=--slow-ms=500]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence
+import httpx
+
+SCENARIOS = {
+    "health": ("GET", "/health", None),
+    "list_items": ("GET", "/api/items/", None),
+    "create_item": ("POST", "/api/items/", {"name": "load-test", "price": 1}),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+@contextlib.contextmanager
+def running_stack(
+    latency_ms: float, rows: int, app_env: Dict[str, str], db_args: Sequence[str] = ()
+) -> Iterator[str]:
+    """Start the PostgREST stand-in and the app; yield the app base URL."""
+    db_port, app_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "SUPABASE_URL": f"http://127.0.0.1:{db_port}",
+        "SUPABASE_KEY": "load-test-key",
+        "ENVIRONMENT": "benchmark",
+        "LOG_LEVEL": "WARNING",
+        "DB_HTTP2": "false",
+        # One load generator would otherwise be limited as a single client
+        "RATE_LIMIT_ENABLED": "false",
+        **app_env,
+    }
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fake_postgrest", "--port", str(db_port),
+             "--latency-ms", str(latency_ms), "--rows", str(rows), *db_args],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ),
+    ]
+    try:
+        wait_ready(f"http://127.0.0.1:{db_port}/rest/v1/items?limit=1")
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "--factory", "app.main:create_application",
+             "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning",
+             "--no-access-log"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+        wait_ready(f"http://127.0.0.1:{app_port}/health")
+        yield f"http://127.0.0.1:{app_port}"
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                process.wait(timeout=10)
+
+
+def percentile(sorted_samples: List[float], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+async def drive(base_url: str, scenario: str, concurrency: int, duration: float) -> dict:
+    """Run one scenario at fixed concurrency for ``duration`` seconds."""
+    method, path, body = SCENARIOS[scenario]
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        # Warm up connections and caches
+        for _ in range(min(concurrency, 10)):
+            await client.request(method, path, json=body)
+
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += failed
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta_ms: float = 1.0) -> List[str]:
+    """
+    Return descriptions of results that regressed beyond ``threshold``.
+
+    Latency changes smaller than ``min_delta_ms`` are ignored so that
+    sub-millisecond scenarios do not fail on scheduler noise.
+    """
+    regressions = []
+    for key, result in current["results"].items():
+        previous = baseline.get("results", {}).get(key)
+        if previous is None:
+            continue
+        if result["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append(f"{key}: rps {previous['rps']} -> {result['rps']}")
+        for metric in ("p95_ms", "p99_ms"):
+            limit = max(previous[metric] * (1 + threshold), previous[metric] + min_delta_ms)
+            if result[metric] > limit:
+                regressions.append(f"{key}: {metric} {previous[metric]} -> {result[metric]}")
+    return regressions
+
+
+async def run(base_url: str, scenarios: List[str], levels: List[int], duration: float) -> Dict[str, dict]:
+    results = {}
+    print(f"{'scenario':<14}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for scenario in scenarios:
+        for concurrency in levels:
+            result = await drive(base_url, scenario, concurrency, duration)
+            results[f"{scenario}@{concurrency}"] = result
+            print(
+                f"{scenario:<14}{concurrency:>6}{result['rps']:>10.0f}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}"
+            )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per scenario/level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Injected database latency")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows seeded in the stand-in")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the app process")
+    parser.add_argument("--db-arg", action="append", default=[], metavar="ARG",
+                        help="Extra stand-in argument, e.g. --db-arg=--slow-rate=0.05")
+    parser.add_argument("--save", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", help="Compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed relative regression before failing")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore latency regressions smaller than this")
+    args = parser.parse_args(argv)
+
+    app_env = dict(item.split("=", 1) for item in args.app_env)
+    with running_stack(args.latency_ms, args.rows, app_env, args.db_arg) as base_url:
+        results = asyncio.run(run(base_url, args.scenarios, args.concurrency, args.duration))
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {"duration": args.duration, "latency_ms": args.latency_ms, "rows": args.rows,
+                   "app_env": app_env, "db_args": args.db_arg},
+        "results": results,
+    }
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold, args.min_delta_ms)
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
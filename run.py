@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
-"""Simple script to run the FastAPI application."""
+"""Run the FastAPI application (reloading dev server or production workers)."""
 import uvicorn
 from app.core.config import settings
+from app.core.server import serve
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=settings.is_development,
-        log_level=settings.log_level.lower()
-    )
-
+    if settings.is_development:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.host,
+            port=settings.port,
+            reload=True,
+            log_level=settings.log_level.lower()
+        )
+    else:
+        serve()
@@ -1,22 +1,27 @@
 """Pytest configuration and fixtures."""
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, patch
-from supabase import Client
+from supabase import AsyncClient
 from app.main import create_application
 from app.core.config import settings
+from benchmarks.fakes import FakeRedis, FakeSupabase
 
 
 @pytest.fixture(scope="session")
 def app():
-    """Create FastAPI application for testing."""
-    return create_application()
+    """Create FastAPI application for testing (rate limiting is covered separately)."""
+    with patch.object(settings, "rate_limit_enabled", False):
+        return create_application()
 
 
 @pytest.fixture(scope="function")
 def client(app):
-    """Create test client."""
-    return TestClient(app)
+    """Create test client (runs the application lifespan and waits for warm-up)."""
+    with TestClient(app) as test_client:
+        test_client.portal.call(asyncio.wait_for, app.state.warm_up_task, 10)
+        yield test_client
 
 
 @pytest.fixture(scope="function")
@@ -28,25 +33,54 @@ def mock_db():
         def test_something(mock_db):
             mock_db.table.return_value.select.return_value.execute.return_value.data = [...]
     """
-    mock_client = Mock(spec=Client)
+    mock_client = Mock(spec=AsyncClient)
     return mock_client
 
 
 @pytest.fixture(scope="function")
-def override_get_db(mock_db):
+def fake_db():
     """
-    Override database dependency with mock.
+    Local SQLite-backed Supabase stand-in with an empty ``items`` table.
+    
+    Usage:
+        def test_something(fake_db):
+            fake_db.seed("items", [{"name": "Item 1"}])
+    """
+    return FakeSupabase()
+
+
+@pytest.fixture(scope="function")
+async def fake_redis():
+    """
+    Local Redis server (RESP over TCP on an ephemeral port).
+    
+    Usage:
+        async def test_something(fake_redis):
+            client = RedisClient(fake_redis.url)
+    """
+    redis = FakeRedis()
+    await redis.start()
+    yield redis
+    await redis.stop()
+
+
+@pytest.fixture(scope="function")
+def override_get_db(app, fake_db):
+    """
+    Override database dependency with the local stand-in.
     
     Usage:
         def test_endpoint(client, override_get_db):
-            app.dependency_overrides[get_db] = lambda: mock_db
+            override_get_db.seed("items", [...])
             response = client.get("/api/items")
     """
     from app.core.database import get_db
-    from app.main import app
+    from app.api.endpoints.items import items_cache
     
-    app.dependency_overrides[get_db] = lambda: mock_db
-    yield mock_db
+    # Cached pages from another test's database must not leak in
+    items_cache.clear()
+    app.dependency_overrides[get_db] = lambda: fake_db
+    yield fake_db
     app.dependency_overrides.clear()
 
 
@@ -1,35 +1,132 @@
 """Tests for API endpoints."""
+import asyncio
 import pytest
-from unittest.mock import Mock
-from app.api.endpoints.items import get_items, create_item
+from unittest.mock import AsyncMock
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.api.endpoints.items import ITEMS_QUERY, list_items, create_item, items_cache
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor
+from app.main import create_application
+from app.models.item import ItemCreate
 
 
 class TestItemsEndpoint:
     """Test items API endpoints."""
     
+    @pytest.fixture
+    def seeded_db(self, fake_db):
+        """Local database with 25 items."""
+        fake_db.seed("items", [{"name": f"Item {i}"} for i in range(25)])
+        return fake_db
+    
     @pytest.mark.asyncio
-    async def test_get_items(self, mock_db):
-        """Test getting items."""
-        # Mock database response
-        mock_db.table.return_value.select.return_value.range.return_value.execute.return_value.data = [
-            {"id": "1", "name": "Item 1"},
-            {"id": "2", "name": "Item 2"}
-        ]
-        
-        result = await get_items(skip=0, limit=10, db=mock_db)
+    async def test_get_items(self, seeded_db):
+        """Test getting items in offset mode."""
+        result = await list_items(seeded_db, skip=0, limit=10)
         assert isinstance(result, list)
-        assert len(result) > 0
-        assert "message" in result[0]
+        assert len(result) == 10
+        assert result[0]["name"] == "Item 0"
+        
+        result = await list_items(seeded_db, skip=20, limit=10)
+        assert [row["name"] for row in result] == [f"Item {i}" for i in range(20, 25)]
     
     @pytest.mark.asyncio
-    async def test_create_item(self, mock_db, sample_item):
+    async def test_get_items_cursor_pages(self, seeded_db):
+        """Test walking every page with keyset pagination."""
+        names, cursor, pages = [], None, 0
+        while True:
+            page = await list_items(seeded_db, limit=10, cursor=cursor)
+            names.extend(row["name"] for row in page["items"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert pages == 3
+        assert names == [f"Item {i}" for i in range(25)]
+    
+    @pytest.mark.asyncio
+    async def test_get_items_exact_last_page(self, fake_db):
+        """Test no cursor is returned when the last page is exactly full."""
+        fake_db.seed("items", [{"name": f"Item {i}"} for i in range(10)])
+        page = await list_items(fake_db, limit=10)
+        assert len(page["items"]) == 10
+        assert page["next_cursor"] is None
+    
+    @pytest.mark.asyncio
+    async def test_get_items_max_page_size(self, fake_db, monkeypatch):
+        """Test the server-side page size cap."""
+        monkeypatch.setattr(settings, "items_max_page_size", 5)
+        fake_db.seed("items", [{"name": f"Item {i}"} for i in range(10)])
+        page = await list_items(fake_db, limit=100)
+        assert len(page["items"]) == 5
+        assert decode_cursor(page["next_cursor"]) == {"id": page["items"][-1]["id"]}
+        assert len(await list_items(fake_db, skip=0, limit=100)) == 5
+    
+    @pytest.mark.asyncio
+    async def test_get_items_invalid_cursor(self, fake_db):
+        """Test malformed cursors are rejected."""
+        for cursor in ("not-base64!", encode_cursor({"other": 1})):
+            with pytest.raises(HTTPException) as exc_info:
+                await list_items(fake_db, limit=10, cursor=cursor)
+            assert exc_info.value.status_code == 400
+    
+    @pytest.mark.asyncio
+    async def test_get_items_compound_cursor_pages(self, fake_db):
+        """Test walking pages sorted by a nullable, non-unique column."""
+        prices = [3.0, None, 1.0, 3.0, None, 2.0, 3.0, 1.0, None, 2.0, 3.0]
+        fake_db.seed("items", [{"name": f"Item {i}", "price": p} for i, p in enumerate(prices)])
+        plan = ITEMS_QUERY.plan(fields="name", sort="-price")
+        rows, cursor = [], None
+        while True:
+            page = await list_items(fake_db, limit=3, cursor=cursor, plan=plan)
+            rows.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        expected = sorted(
+            enumerate(prices), key=lambda item: (item[1] is None, -(item[1] or 0), item[0])
+        )
+        assert rows == [{"name": f"Item {i}"} for i, _ in expected]
+
+    @pytest.mark.asyncio
+    async def test_get_items_filtered(self, seeded_db):
+        """Test filters in offset and keyset mode."""
+        plan = ITEMS_QUERY.plan(fields="id", filters=["id.gt.20"], sort="-id")
+        assert await list_items(seeded_db, skip=0, limit=10, plan=plan) == [
+            {"id": i} for i in (25, 24, 23, 22, 21)
+        ]
+        page = await list_items(seeded_db, limit=3, plan=plan)
+        assert [row["id"] for row in page["items"]] == [25, 24, 23]
+        page = await list_items(seeded_db, limit=3, cursor=page["next_cursor"], plan=plan)
+        assert [row["id"] for row in page["items"]] == [22, 21]
+
+    @pytest.mark.asyncio
+    async def test_get_items_cursor_bound_to_sort(self, seeded_db):
+        """Test a cursor issued for one sort order is rejected by another."""
+        page = await list_items(seeded_db, limit=3)
+        with pytest.raises(HTTPException) as exc_info:
+            await list_items(
+                seeded_db, limit=3, cursor=page["next_cursor"], plan=ITEMS_QUERY.plan(sort="name")
+            )
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_create_item(self, fake_db):
         """Test creating an item."""
-        # Mock database response
-        mock_db.table.return_value.insert.return_value.execute.return_value.data = [sample_item]
-        
-        result = await create_item(item=sample_item, db=mock_db)
+        result = await create_item(item=ItemCreate(name="Test Item"), db=fake_db)
         assert isinstance(result, dict)
-        assert "message" in result
+        assert result["name"] == "Test Item"
+        assert result["id"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_create_item_error(self, fake_db):
+        """Test database errors surface as HTTP errors."""
+        # Fail both the batch insert and its per-row retry
+        fake_db.fail_next = 2
+        with pytest.raises(HTTPException) as exc_info:
+            await create_item(item=ItemCreate(name="Test Item"), db=fake_db)
+        assert exc_info.value.status_code == 500
 
 
 class TestAPIEndpoints:
@@ -50,10 +147,167 @@ class TestAPIEndpoints:
         data = response.json()
         assert data["status"] == "healthy"
     
+    def test_health_not_ready_during_warm_up(self, monkeypatch):
+        """Test /health reports 503 until the worker has warmed up."""
+        async def slow_connect():
+            await asyncio.sleep(10)
+        
+        monkeypatch.setattr("app.main.connect_db", slow_connect)
+        with TestClient(create_application()) as client:
+            response = client.get("/health")
+            assert response.status_code == 503
+            assert response.json() == {"status": "starting"}
+    
+    def test_warm_up_retries(self, monkeypatch):
+        """Test a failed warm-up is retried before reporting ready."""
+        connect = AsyncMock(side_effect=[ConnectionError("down"), None])
+        monkeypatch.setattr("app.main.connect_db", connect)
+        monkeypatch.setattr("app.main.WARM_UP_MAX_BACKOFF", 0.01)
+        app = create_application()
+        with TestClient(app) as client:
+            client.portal.call(asyncio.wait_for, app.state.warm_up_task, 5)
+            assert client.get("/health").status_code == 200
+        assert connect.await_count == 2
+    
     def test_items_endpoint(self, client, override_get_db):
         """Test items endpoint."""
+        override_get_db.seed("items", [{"name": f"Item {i}"} for i in range(3)])
+        response = client.get("/api/items", params={"limit": 2})
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) == 2
+        
+        response = client.get("/api/items", params={"cursor": page["next_cursor"]})
+        assert response.status_code == 200
+        assert [row["name"] for row in response.json()["items"]] == ["Item 2"]
+    
+    def test_items_endpoint_offset_mode(self, client, override_get_db):
+        """Test the legacy skip/limit mode still returns a list."""
+        override_get_db.seed("items", [{"name": f"Item {i}"} for i in range(3)])
+        response = client.get("/api/items", params={"skip": 1, "limit": 5})
+        assert response.status_code == 200
+        assert [row["name"] for row in response.json()] == ["Item 1", "Item 2"]
+    
+    def test_items_endpoint_invalid_cursor(self, client, override_get_db):
+        """Test an invalid cursor returns 400."""
+        response = client.get("/api/items", params={"cursor": "garbage"})
+        assert response.status_code == 400
+    
+    def test_items_endpoint_projection_filter_sort(self, client, override_get_db):
+        """Test fields=, filter= and sort= over HTTP."""
+        override_get_db.seed("items", [
+            {"name": f"Item {i}", "description": "x" * 100, "price": float(i % 3)} for i in range(6)
+        ])
+        response = client.get("/api/items", params={
+            "fields": "name,price", "filter": ["price.gte.1", "name.neq.Item 4"], "sort": "-price",
+        })
+        assert response.status_code == 200
+        assert response.json()["items"] == [
+            {"name": "Item 2", "price": 2.0},
+            {"name": "Item 5", "price": 2.0},
+            {"name": "Item 1", "price": 1.0},
+        ]
+    
+    @pytest.mark.parametrize("params", [
+        {"fields": "id,password"},
+        {"filter": "price.gte.cheap"},
+        {"filter": "description.gt.a"},
+        {"sort": "description"},
+    ])
+    def test_items_endpoint_invalid_query(self, client, override_get_db, params):
+        """Test invalid projections, filters and sorts are rejected before any I/O."""
+        executions = override_get_db.executions
+        response = client.get("/api/items", params=params)
+        assert response.status_code == 400
+        assert override_get_db.executions == executions
+    
+    def test_items_cache_keyed_by_query(self, client, override_get_db):
+        """Test different projections are cached separately."""
+        items_cache.clear()
+        override_get_db.seed("items", [{"name": "Item 0", "price": 1.0}])
+        full = client.get("/api/items").json()["items"]
+        names = client.get("/api/items", params={"fields": "name"}).json()["items"]
+        assert names == [{"name": "Item 0"}]
+        assert full[0]["price"] == 1.0
+    
+    def test_items_etag_not_modified(self, client, override_get_db):
+        """Test strong ETags and 304 responses."""
+        override_get_db.seed("items", [{"name": "Item 0"}])
+        response = client.get("/api/items")
+        etag = response.headers["ETag"]
+        assert etag.startswith('"')
+        
+        response = client.get("/api/items", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        
+        response = client.get("/api/items", headers={"If-None-Match": '"other"'})
+        assert response.status_code == 200
+    
+    def test_items_cache_hit_and_invalidation(self, client, override_get_db):
+        """Test reads are served from cache until an item is written."""
+        items_cache.clear()
+        override_get_db.seed("items", [{"name": "Item 0"}])
+        first = client.get("/api/items")
+        executions = override_get_db.executions
+        hits = items_cache.hits
+        
+        # Same normalized query: served from cache, no database call
+        second = client.get("/api/items", params={"limit": settings.items_default_page_size})
+        assert second.content == first.content
+        assert items_cache.hits == hits + 1
+        assert override_get_db.executions == executions
+        
+        client.post("/api/items", json={"name": "Item 1"})
+        third = client.get("/api/items")
+        assert len(third.json()["items"]) == 2
+        assert third.headers["ETag"] != first.headers["ETag"]
+    
+    def test_items_cache_disabled(self, client, override_get_db, monkeypatch):
+        """Test reads bypass the cache when disabled but keep ETags."""
+        monkeypatch.setattr(settings, "items_cache_enabled", False)
+        hits = items_cache.hits
+        client.get("/api/items")
         response = client.get("/api/items")
+        assert items_cache.hits == hits
+        assert "ETag" in response.headers
+    
+    def test_create_item_endpoint(self, client, override_get_db):
+        """Test creating an item over HTTP."""
+        response = client.post("/api/items", json={"name": "Widget"})
         assert response.status_code == 200
+        assert response.json()["name"] == "Widget"
+    
+    def test_bulk_create_endpoint(self, client, override_get_db):
+        """Test bulk creation returns per-row results."""
+        items = [{"name": "A"}, {"bogus": 1}, {"name": "C"}]
+        response = client.post("/api/items/bulk", json=items)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["created"] == 2
+        assert body["failed"] == 1
+        assert [row["status"] for row in body["results"]] == ["created", "error", "created"]
+        assert body["results"][2]["item"]["name"] == "C"
+    
+    def test_create_item_validation(self, client, override_get_db):
+        """Test item bodies are validated against the schema."""
+        assert client.post("/api/items", json={"name": ""}).status_code == 422
+        assert client.post("/api/items", json={"name": "x", "bogus": 1}).status_code == 422
+        assert override_get_db.executions == 0
+    
+    def test_bulk_create_validates_rows_individually(self, client, override_get_db):
+        """Test invalid bulk rows are reported without reaching the database."""
+        response = client.post("/api/items/bulk", json=[{"name": "A", "price": -1}, {"name": "B"}])
+        body = response.json()
+        assert [row["status"] for row in body["results"]] == ["error", "created"]
+        assert "price" in body["results"][0]["error"]
+        assert override_get_db.executions == 1
+    
+    def test_bulk_create_too_many_rows(self, client, override_get_db, monkeypatch):
+        """Test the bulk row limit."""
+        monkeypatch.setattr(settings, "items_bulk_max_rows", 2)
+        response = client.post("/api/items/bulk", json=[{"name": "x"}] * 3)
+        assert response.status_code == 413
     
     def test_swagger_docs(self, client):
         """Test Swagger documentation endpoint."""
@@ -67,4 +321,15 @@ class TestAPIEndpoints:
         data = response.json()
         assert "openapi" in data
         assert "info" in data
+        # Projected rows (?fields=) may lack any column, so none is required
+        row = data["components"]["schemas"]["ItemRow"]
+        assert "required" not in row
+        assert set(row["properties"]) == {"id", "name", "description", "price", "created_at"}
 
+    
+    def test_openapi_disabled(self, monkeypatch):
+        """Test docs and schema routes can be turned off."""
+        monkeypatch.setattr(settings, "openapi_enabled", False)
+        with TestClient(create_application()) as client:
+            assert client.get("/openapi.json").status_code == 404
+            assert client.get("/docs").status_code == 404
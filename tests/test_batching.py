@@ -0,0 +1,136 @@
+"""Tests for batched inserts and the insert coalescer."""
+import asyncio
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+from app.core.batching import InsertCoalescer, api_error_status, chunked, insert_rows, is_row_rejection
+
+
+def _commit_then_fail(db, error):
+    """Make ``db`` commit the next insert and then raise ``error``, as after a lost response."""
+    table = db.table
+
+    def failing_table(name):
+        query = table(name)
+        execute = query.execute
+
+        async def commit_then_raise():
+            await execute()
+            db.table = table
+            raise error
+
+        query.execute = commit_then_raise
+        return query
+
+    db.table = failing_table
+
+
+class TestInsertRows:
+    """Test batch inserts with per-row fallback."""
+
+    @pytest.mark.asyncio
+    async def test_single_round_trip(self, fake_db):
+        results = await insert_rows(fake_db, "items", [{"name": "a"}, {"name": "b"}])
+        assert [row["name"] for row in results] == ["a", "b"]
+        assert fake_db.executions == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_isolates_bad_rows(self, fake_db):
+        results = await insert_rows(fake_db, "items", [{"name": "a"}, {"bad": 1}])
+        assert results[0]["name"] == "a"
+        assert isinstance(results[1], Exception)
+        # Batch rolled back, then good row re-inserted on its own
+        rows = (await fake_db.table("items").select("*").execute()).data
+        assert [row["name"] for row in rows] == ["a"]
+
+    @pytest.mark.asyncio
+    async def test_timeout_after_commit_is_not_retried(self, fake_db):
+        _commit_then_fail(fake_db, httpx.ReadTimeout("timed out"))
+        with pytest.raises(httpx.ReadTimeout):
+            await insert_rows(fake_db, "items", [{"name": str(i)} for i in range(5)])
+        # Committed once, not again row by row
+        rows = (await fake_db.table("items").select("*").execute()).data
+        assert len(rows) == 5
+        assert fake_db.executions == 2
+
+    @pytest.mark.asyncio
+    async def test_server_error_is_not_retried(self, fake_db):
+        fake_db.fail_next = 1
+        results = await insert_rows(fake_db, "items", [{"name": "a"}, {"name": "b"}])
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert fake_db.executions == 1
+
+    @pytest.mark.parametrize("code, status", [
+        ("23505", 400),
+        ("PGRST204", 400),
+        ("PGRST301", 401),
+        ("PGRST001", 503),
+        ("08006", 503),
+        ("57014", 500),
+        ("P0001", 400),
+        (502, 502),
+        (None, 500),
+    ])
+    def test_api_error_status(self, code, status):
+        error = APIError({"code": code, "message": "x", "hint": None, "details": None})
+        assert api_error_status(error) == status
+        assert is_row_rejection(error) == (400 <= status < 500)
+
+    @pytest.mark.asyncio
+    async def test_empty(self, fake_db):
+        assert await insert_rows(fake_db, "items", []) == []
+        assert fake_db.executions == 0
+
+    def test_chunked(self):
+        assert chunked([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+
+
+class TestInsertCoalescer:
+    """Test coalescing of concurrent single-row inserts."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_inserts_share_one_batch(self, fake_db):
+        coalescer = InsertCoalescer("items", max_batch_size=100, flush_interval=0.01)
+        results = await asyncio.gather(
+            *(coalescer.insert(fake_db, {"name": f"Item {i}"}) for i in range(20))
+        )
+        assert [row["name"] for row in results] == [f"Item {i}" for i in range(20)]
+        assert len({row["id"] for row in results}) == 20
+        assert fake_db.executions == 1
+
+    @pytest.mark.asyncio
+    async def test_flush_on_batch_size(self, fake_db):
+        coalescer = InsertCoalescer("items", max_batch_size=5, flush_interval=60)
+        results = await asyncio.gather(
+            *(coalescer.insert(fake_db, {"name": str(i)}) for i in range(10))
+        )
+        assert len(results) == 10
+        assert fake_db.executions == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_fan_out_to_their_callers(self, fake_db):
+        coalescer = InsertCoalescer("items", max_batch_size=100, flush_interval=0.001)
+        results = await asyncio.gather(
+            coalescer.insert(fake_db, {"name": "ok"}),
+            coalescer.insert(fake_db, {"bad": 1}),
+            return_exceptions=True,
+        )
+        assert results[0]["name"] == "ok"
+        assert isinstance(results[1], Exception)
+
+    @pytest.mark.asyncio
+    async def test_batching_disabled(self, fake_db):
+        coalescer = InsertCoalescer("items", max_batch_size=1)
+        await asyncio.gather(*(coalescer.insert(fake_db, {"name": "x"}) for _ in range(3)))
+        assert fake_db.executions == 3
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_row_still_written(self, fake_db):
+        coalescer = InsertCoalescer("items", max_batch_size=100, flush_interval=0.01)
+        task = asyncio.ensure_future(coalescer.insert(fake_db, {"name": "x"}))
+        await asyncio.sleep(0)
+        task.cancel()
+        await coalescer.drain()
+        rows = (await fake_db.table("items").select("*").execute()).data
+        assert len(rows) == 1
+        assert coalescer.pending == 0
@@ -0,0 +1,319 @@
+"""Tests for the in-process and two-tier response caches."""
+import asyncio
+import time
+import httpx
+import pytest
+from app.core.cache import ResponseCache, TieredCache, etag_matches, make_cache_key, make_etag
+from app.core.redis_client import RedisClient
+
+
+class TestResponseCache:
+    """Test TTL, LRU budget, invalidation and counters."""
+
+    def test_hit_and_miss(self):
+        cache = ResponseCache(ttl=60)
+        assert cache.get("items", "k") is None
+        stored = cache.set("items", "k", b"body")
+        entry = cache.get("items", "k")
+        assert entry.body == b"body"
+        assert entry.etag == stored.etag
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(ttl=0)
+        cache.set("items", "k", b"body")
+        assert cache.get("items", "k") is None
+        assert len(cache) == 0
+
+    def test_lru_memory_budget(self):
+        cache = ResponseCache(ttl=60, max_bytes=100)
+        cache.set("n", "a", b"x" * 40)
+        cache.set("n", "b", b"x" * 40)
+        cache.get("n", "a")
+        cache.set("n", "c", b"x" * 40)
+        assert cache.get("n", "b") is None
+        assert cache.get("n", "a") is not None
+        assert cache.stats()["evictions"] == 1
+        assert cache.size <= 100
+
+    def test_oversized_body_not_stored(self):
+        cache = ResponseCache(ttl=60, max_bytes=10)
+        entry = cache.set("n", "k", b"x" * 100)
+        assert entry.body == b"x" * 100
+        assert len(cache) == 0
+
+    def test_invalidate_namespace(self):
+        cache = ResponseCache(ttl=60)
+        cache.set("items", "k", b"a")
+        cache.set("other", "k", b"b")
+        cache.invalidate("items")
+        assert cache.get("items", "k") is None
+        assert cache.get("other", "k") is not None
+
+    def test_set_with_stale_generation_skipped(self):
+        cache = ResponseCache(ttl=60)
+        generation = cache.generation("items")
+        cache.invalidate("items")  # a write landed while the read was running
+        cache.set("items", "k", b"old", generation)
+        assert cache.get("items", "k") is None
+
+    def test_stale_entries(self):
+        cache = ResponseCache(ttl=60, stale_ttl=60)
+        cache.set("items", "k", b"a", expires_at=time.monotonic() - 1)
+        assert cache.get("items", "k") is None
+        # Kept for stale reads until the stale window ends too
+        assert cache.get("items", "k", allow_stale=True).body == b"a"
+        cache.set("items", "k", b"a", expires_at=time.monotonic() - 61)
+        assert cache.get("items", "k", allow_stale=True) is None
+        assert len(cache) == 0
+
+
+class Loader:
+    """Counts calls and returns a new body each time."""
+
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self) -> bytes:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return b"v%d" % self.calls
+
+
+async def _instance(redis_url: str, **kwargs) -> TieredCache:
+    """A TieredCache as one app instance would build it, listening for invalidations."""
+    cache = TieredCache(
+        ResponseCache(ttl=kwargs.pop("ttl", 60), stale_ttl=kwargs.pop("stale_ttl", 0)),
+        shared=RedisClient(redis_url),
+        prefix="test",
+        **kwargs,
+    )
+    cache.start()
+    await asyncio.wait_for(cache.subscribed.wait(), 1)
+    return cache
+
+
+async def _wait_for(condition, timeout: float = 1.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.001)
+
+
+class TestTieredCache:
+    """Test the shared tier, stampede protection and cross-instance invalidation."""
+
+    @pytest.mark.asyncio
+    async def test_local_only(self):
+        cache = TieredCache(ResponseCache(ttl=60))
+        load = Loader()
+        assert (await cache.get_or_load("items", "k", load)).body == b"v1"
+        assert (await cache.get_or_load("items", "k", load)).body == b"v1"
+        cache.invalidate("items")
+        assert (await cache.get_or_load("items", "k", load)).body == b"v2"
+        assert cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self):
+        cache = TieredCache(ResponseCache(ttl=60))
+        load = Loader(delay=0.01)
+        entries = await asyncio.gather(*(cache.get_or_load("items", "k", load) for _ in range(20)))
+        assert load.calls == 1
+        assert {entry.body for entry in entries} == {b"v1"}
+
+    @pytest.mark.asyncio
+    async def test_failed_load_raises_to_waiters(self):
+        cache = TieredCache(ResponseCache(ttl=60))
+
+        async def load():
+            raise RuntimeError("database down")
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("items", "k", load)
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(self):
+        cache = TieredCache(ResponseCache(ttl=0.01, stale_ttl=60), early_refresh_beta=0)
+        load = Loader(delay=0.01)
+        await cache.get_or_load("items", "k", load)
+        await asyncio.sleep(0.02)
+        # Expired: served stale at once, refreshed in the background (once)
+        entries = [await cache.get_or_load("items", "k", load) for _ in range(3)]
+        assert [entry.body for entry in entries] == [b"v1"] * 3
+        assert cache.stale_hits == 3
+        await _wait_for(lambda: load.calls == 2 and not cache._loading)
+        assert (await cache.get_or_load("items", "k", load)).body == b"v2"
+
+    @pytest.mark.asyncio
+    async def test_probabilistic_early_refresh(self, monkeypatch):
+        cache = TieredCache(ResponseCache(ttl=60), early_refresh_beta=1.0)
+        load = Loader()
+        entry = await cache.get_or_load("items", "k", load)
+        now = time.monotonic()
+        entry.delta = 1.0
+        assert not cache._refresh_early(entry, now)  # a minute before expiry
+        assert cache._refresh_early(entry, entry.expires_at - 0.001)
+        # Early refreshes spread out before expiry instead of at it
+        monkeypatch.setattr("app.core.cache.random.random", lambda: 0.5)  # -ln(0.5) = 0.69
+        assert cache._refresh_early(entry, entry.expires_at - 0.6)
+        assert not cache._refresh_early(entry, entry.expires_at - 0.8)
+        entry.expires_at = time.monotonic() + 0.1
+        assert (await cache.get_or_load("items", "k", load)).body == b"v1"
+        assert cache.early_refreshes == 1
+        await _wait_for(lambda: load.calls == 2 and not cache._loading)
+
+    @pytest.mark.asyncio
+    async def test_new_instance_is_warm(self, fake_redis):
+        first = await _instance(fake_redis.url)
+        second = await _instance(fake_redis.url)
+        try:
+            load = Loader()
+            await first.get_or_load("items", "k", load)
+            await _wait_for(lambda: not first._tasks)  # L2 write done
+            entry = await second.get_or_load("items", "k", load)
+            assert entry.body == b"v1"
+            assert entry.etag == make_etag(b"v1")
+            assert load.calls == 1
+            assert second.stats()["shared_hits"] == 1
+        finally:
+            await first.stop()
+            await second.stop()
+
+    @pytest.mark.asyncio
+    async def test_cross_instance_invalidation(self, fake_redis):
+        writer = await _instance(fake_redis.url)
+        reader = await _instance(fake_redis.url)
+        try:
+            load = Loader()
+            await writer.get_or_load("items", "k", load)
+            await _wait_for(lambda: not writer._tasks)
+            await reader.get_or_load("items", "k", load)
+            assert load.calls == 1
+
+            start = time.perf_counter()
+            writer.invalidate("items")
+            await _wait_for(lambda: reader.remote_invalidations == 1)
+            lag = time.perf_counter() - start
+            assert lag < 0.1
+            # Dropped locally, and the old shared entry is under the previous generation
+            assert (await reader.get_or_load("items", "k", load)).body == b"v2"
+            assert (await writer.get_or_load("items", "k", load)).body in (b"v2", b"v3")
+            assert writer.stats()["remote_invalidations"] == 0  # its own message is ignored
+        finally:
+            await writer.stop()
+            await reader.stop()
+
+    @pytest.mark.asyncio
+    async def test_hit_rate_across_instances(self, fake_redis):
+        instances = [await _instance(fake_redis.url) for _ in range(3)]
+        try:
+            load = Loader()
+            for i in range(300):
+                await instances[i % 3].get_or_load("items", f"k{i % 20}", load)
+                await asyncio.sleep(0)
+            # Each key computed once; other instances got it from Redis
+            assert load.calls == 20
+            hits = sum(cache.hits + cache.shared_hits for cache in instances)
+            assert hits / 300 == pytest.approx(280 / 300)
+        finally:
+            for cache in instances:
+                await cache.stop()
+
+    @pytest.mark.asyncio
+    async def test_redis_down_falls_back_to_local(self, fake_redis, caplog):
+        cache = await _instance(fake_redis.url, retry_after=0.05)
+        try:
+            await fake_redis.stop()
+            load = Loader()
+            assert (await cache.get_or_load("items", "k", load)).body == b"v1"
+            assert (await cache.get_or_load("items", "k", load)).body == b"v1"
+            cache.invalidate("items")
+            assert (await cache.get_or_load("items", "k", load)).body == b"v2"
+            assert cache.stats()["shared_errors"] >= 1
+            assert "using the local cache only" in caplog.text
+
+            # Back after the retry window, and listening again
+            await fake_redis.start()
+            await asyncio.sleep(0.06)
+            await asyncio.wait_for(cache.subscribed.wait(), 2)
+            cache.invalidate("items")
+            await _wait_for(lambda: not cache._tasks)  # announced
+            assert (await cache.get_or_load("items", "k", load)).body == b"v3"
+            await _wait_for(lambda: not cache._tasks)
+            assert any(key.startswith(b"test:items:") for key in fake_redis.data)
+        finally:
+            await cache.stop()
+
+    @pytest.mark.asyncio
+    async def test_slow_redis_times_out(self, fake_redis):
+        cache = await _instance(fake_redis.url, timeout=0.01)
+        try:
+            fake_redis.latency = 0.1
+            start = time.perf_counter()
+            assert (await cache.get_or_load("items", "k", Loader())).body == b"v1"
+            assert time.perf_counter() - start < 0.05
+        finally:
+            await cache.stop()
+
+
+class TestItemsSharedCache:
+    """Test GET /api/items with the Redis tier enabled."""
+
+    @pytest.mark.asyncio
+    async def test_page_served_from_redis_after_local_miss(self, app, override_get_db, fake_redis, monkeypatch):
+        from app.api.endpoints.items import items_cache
+
+        shared = RedisClient(fake_redis.url)
+        monkeypatch.setattr(items_cache, "shared", shared)
+        monkeypatch.setattr(items_cache, "_generations", {})
+        override_get_db.seed("items", [{"name": "Item 0"}])
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = await client.get("/api/items/")
+                await _wait_for(lambda: not items_cache._tasks)
+                executions = override_get_db.executions
+                # Another instance's view: nothing cached locally
+                items_cache.clear()
+                second = await client.get("/api/items/")
+                assert second.content == first.content
+                assert second.headers["ETag"] == first.headers["ETag"]
+                assert override_get_db.executions == executions
+
+                await client.post("/api/items/", json={"name": "Item 1"})
+                await _wait_for(lambda: not items_cache._tasks)
+                assert fake_redis.data[b"base0:generation:items"][0] == b"1"
+                assert len((await client.get("/api/items/")).json()["items"]) == 2
+        finally:
+            await shared.close()
+
+
+class TestCacheHelpers:
+    """Test key normalization and ETag helpers."""
+
+    def test_cache_key_normalized(self):
+        a = make_cache_key("r", {"b": 1, "a": 2, "c": None}, "user")
+        b = make_cache_key("r", {"a": 2, "b": 1}, "user")
+        assert a == b
+        assert make_cache_key("r", {"a": 2, "b": 1}, "other") != a
+
+    def test_cache_key_values_escaped(self):
+        assert make_cache_key("r", {"a": "x&b=1"}) != make_cache_key("r", {"a": "x", "b": 1})
+
+    def test_etag_stable(self):
+        assert make_etag(b"x") == make_etag(b"x")
+        assert make_etag(b"x") != make_etag(b"y")
+
+    @pytest.mark.parametrize("header,expected", [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"zzz", "abc"', True),
+        ("*", True),
+        ('"zzz"', False),
+    ])
+    def test_etag_matches(self, header, expected):
+        assert etag_matches(header, '"abc"') is expected
@@ -0,0 +1,220 @@
+"""Tests for response compression."""
+import asyncio
+import gzip
+import json
+import zlib
+import brotli
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from app.core.compression import (
+    BrotliEncoder,
+    GzipEncoder,
+    is_compressible,
+    negotiate,
+    parse_accept_encoding,
+)
+from app.middleware.compression_middleware import CompressionMiddleware
+
+ROWS = [{"id": i, "name": f"Item {i}", "description": "x" * 20} for i in range(100)]
+
+
+def _build_app(calls):
+    async def items(request):
+        calls.append(request.url.path)
+        return JSONResponse(ROWS, headers={"etag": '"abc"'})
+
+    async def small(request):
+        return JSONResponse({"ok": True})
+
+    async def image(request):
+        return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+    async def stream(request):
+        async def chunks():
+            for i in range(3):
+                yield json.dumps(ROWS[i * 10:(i + 1) * 10]).encode() + b"\n"
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    async def schema(request):
+        calls.append(request.url.path)
+        return JSONResponse({"paths": {f"/p{i}": {} for i in range(200)}})
+
+    app = Starlette(routes=[
+        Route("/items", items),
+        Route("/small", small),
+        Route("/image", image),
+        Route("/stream", stream),
+        Route("/openapi.json", schema),
+    ])
+    return CompressionMiddleware(
+        app, minimum_size=500, gzip_level=6, brotli_quality=4, static_paths=["/openapi.json"]
+    )
+
+
+async def _raw_get(app, path, accept_encoding="gzip"):
+    """Run one request and return (status, headers, body chunks) without decoding."""
+    scope = {
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+        "server": ("test", 80), "client": ("127.0.0.1", 1),
+        "headers": [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else [],
+    }
+    sent = []
+    received = []
+
+    async def receive():
+        if received:
+            # Streaming responses listen for a disconnect until they finish
+            await asyncio.Event().wait()
+        received.append(True)
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    chunks = [m.get("body", b"") for m in sent[1:]]
+    return start["status"], headers, chunks
+
+
+class TestNegotiation:
+    """Test Accept-Encoding parsing and encoding choice."""
+
+    def test_parse(self):
+        assert parse_accept_encoding("gzip, BR;q=0.5, *;q=0") == {"gzip": 1.0, "br": 0.5, "*": 0.0}
+
+    @pytest.mark.parametrize("header,expected", [
+        ("gzip, deflate, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("gzip;q=0, br;q=0", None),
+        ("*", "br"),
+        ("identity", None),
+        ("", None),
+    ])
+    def test_negotiate(self, header, expected):
+        assert negotiate(header) == expected
+
+    def test_compressible_types(self):
+        assert is_compressible("application/json")
+        assert is_compressible("text/html; charset=utf-8")
+        assert is_compressible("application/problem+json")
+        assert not is_compressible("image/png")
+        assert not is_compressible("")
+
+
+class TestEncoders:
+    """Test incremental encoders."""
+
+    def test_gzip_chunks_decode_as_they_arrive(self):
+        encoder = GzipEncoder()
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert decoder.decompress(encoder.chunk(b"hello ")) == b"hello "
+        assert decoder.decompress(encoder.chunk(b"world")) == b"world"
+        assert decoder.decompress(encoder.finish()) == b""
+        assert decoder.eof
+
+    def test_brotli_chunks_decode_as_they_arrive(self):
+        encoder = BrotliEncoder()
+        decoder = brotli.Decompressor()
+        assert decoder.process(encoder.chunk(b"hello ")) == b"hello "
+        assert decoder.process(encoder.chunk(b"world") + encoder.finish()) == b"world"
+        assert decoder.is_finished()
+
+
+class TestCompressionMiddleware:
+    """Test response compression."""
+
+    @pytest.mark.asyncio
+    async def test_compresses_large_json(self):
+        app = _build_app([])
+        status, headers, chunks = await _raw_get(app, "/items", "gzip")
+        body = b"".join(chunks)
+        assert status == 200
+        assert headers["content-encoding"] == "gzip"
+        assert headers["content-length"] == str(len(body))
+        assert headers["vary"] == "Accept-Encoding"
+        assert headers["etag"] == 'W/"abc"'
+        assert json.loads(gzip.decompress(body)) == ROWS
+
+    @pytest.mark.asyncio
+    async def test_prefers_brotli(self):
+        status, headers, chunks = await _raw_get(_build_app([]), "/items", "gzip, br")
+        assert headers["content-encoding"] == "br"
+        assert json.loads(brotli.decompress(b"".join(chunks))) == ROWS
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("path,accept_encoding,vary", [
+        ("/small", "gzip", True),   # below minimum_size
+        ("/image", "gzip", False),  # not compressible
+        ("/items", "", True),       # client did not ask
+        ("/items", "identity", True),
+        ("/image", "", False),
+    ])
+    async def test_passthrough(self, path, accept_encoding, vary):
+        status, headers, _ = await _raw_get(_build_app([]), path, accept_encoding)
+        assert status == 200
+        assert "content-encoding" not in headers
+        # Compressible types vary by Accept-Encoding even when sent as is
+        assert (headers.get("vary") == "Accept-Encoding") is vary
+
+    @pytest.mark.asyncio
+    async def test_streaming_is_compressed_incrementally(self):
+        status, headers, chunks = await _raw_get(_build_app([]), "/stream", "gzip")
+        assert headers["content-encoding"] == "gzip"
+        assert "content-length" not in headers
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        lines = [decoder.decompress(chunk) for chunk in chunks]
+        # Every streamed line can be decoded as soon as its chunk arrives
+        assert [json.loads(line) for line in lines if line] == [ROWS[0:10], ROWS[10:20], ROWS[20:30]]
+        assert decoder.eof
+
+    @pytest.mark.asyncio
+    async def test_static_paths_served_from_memory(self):
+        calls = []
+        app = _build_app(calls)
+        _, gzip_headers, gzip_chunks = await _raw_get(app, "/openapi.json", "gzip")
+        _, br_headers, br_chunks = await _raw_get(app, "/openapi.json", "br")
+        _, plain_headers, plain_chunks = await _raw_get(app, "/openapi.json", "")
+        _, _, again = await _raw_get(app, "/openapi.json", "gzip")
+
+        assert calls == ["/openapi.json"]
+        plain = b"".join(plain_chunks)
+        assert "content-encoding" not in plain_headers
+        assert plain_headers["content-length"] == str(len(plain))
+        assert gzip.decompress(b"".join(gzip_chunks)) == plain
+        assert brotli.decompress(b"".join(br_chunks)) == plain
+        assert gzip_headers["content-encoding"] == "gzip" and br_headers["content-encoding"] == "br"
+        assert again == gzip_chunks
+
+    def test_app_openapi_compressed(self, client):
+        response = client.get("/openapi.json", headers={"accept-encoding": "br"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "br"
+        assert response.json()["info"]["title"]
+
+    def test_app_items_compressed(self, client, override_get_db):
+        override_get_db.seed("items", [{"name": f"Item {i}"} for i in range(50)])
+        response = client.get("/api/items/", headers={"accept-encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()["items"]) == 50
+
+    def test_app_not_modified_keeps_the_compressed_etag(self, client, override_get_db):
+        override_get_db.seed("items", [{"name": f"Item {i}"} for i in range(50)])
+        response = client.get("/api/items/", headers={"accept-encoding": "gzip"})
+        etag = response.headers["etag"]
+        assert etag.startswith('W/"')
+        revalidated = client.get("/api/items/", headers={"accept-encoding": "gzip", "if-none-match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == etag
+        # Revalidating the identity response keeps the strong ETag
+        plain = client.get("/api/items/", headers={"accept-encoding": "identity"})
+        assert not plain.headers["etag"].startswith("W/")
+        revalidated = client.get("/api/items/", headers={"if-none-match": plain.headers["etag"]})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == plain.headers["etag"]
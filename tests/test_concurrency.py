@@ -0,0 +1,142 @@
+"""Tests for the adaptive concurrency limiter."""
+import asyncio
+import httpx
+import pytest
+from app.core.concurrency import AIMDLimit, ConcurrencyLimiter, GradientLimit
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.metrics import concurrency_limit
+from app.main import create_application
+from benchmarks.fakes import FakeSupabase
+
+
+class TestLimitAlgorithms:
+    """Test how the limits react to latency."""
+
+    def test_aimd(self):
+        limit = AIMDLimit(initial_limit=10, min_limit=2, max_limit=12, latency_target=0.1)
+        assert limit.update(0.01, in_flight=10) == 11
+        # Not enough load to justify growth
+        assert limit.update(0.01, in_flight=1) == 11
+        assert limit.update(0.5, in_flight=10) == pytest.approx(9.9)
+        assert limit.update(0.01, in_flight=10, failed=True) == pytest.approx(8.91)
+        for _ in range(10):
+            limit.update(0.01, in_flight=12)
+        assert limit.limit == 12
+        for _ in range(50):
+            limit.update(1.0, in_flight=12)
+        assert limit.limit == 2
+
+    def test_gradient_follows_latency(self):
+        limit = GradientLimit(initial_limit=20, min_limit=2, max_limit=200)
+        for _ in range(50):
+            limit.update(0.01, in_flight=100)
+        grown = limit.limit
+        assert grown > 20
+
+        for _ in range(20):
+            limit.update(0.1, in_flight=100)
+        assert limit.limit < grown / 2
+
+        # Slowdown over: the baseline catches up and the limit grows again
+        shrunk = limit.limit
+        for _ in range(200):
+            limit.update(0.01, in_flight=100)
+        assert limit.limit > shrunk
+
+    def test_gradient_ignores_idle_periods(self):
+        limit = GradientLimit(initial_limit=20)
+        limit.update(0.01, in_flight=1)
+        limit.update(5.0, in_flight=1)
+        assert limit.limit == 20
+
+
+class TestConcurrencyLimiter:
+    """Test admission, queueing and rejection."""
+
+    @pytest.mark.asyncio
+    async def test_queued_request_gets_released_slot(self):
+        limiter = ConcurrencyLimiter(AIMDLimit(initial_limit=1, min_limit=1), queue_timeout=1)
+        assert await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 1
+        limiter.release(0.01)
+        assert await waiter
+        assert limiter.in_flight == 1
+        assert limiter.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_full_or_timed_out(self):
+        limiter = ConcurrencyLimiter(AIMDLimit(initial_limit=1), max_queue=1, queue_timeout=0.01)
+        assert await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # Queue full: rejected without waiting
+        assert await limiter.acquire() is False
+        # Queued request times out
+        assert await waiting is False
+        assert limiter.rejected == 2
+        limiter.release(0.01)
+        assert limiter.in_flight == 0
+        assert await limiter.acquire()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        limiter = ConcurrencyLimiter(AIMDLimit(initial_limit=1), queue_timeout=1)
+        assert await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # Slot handed over, then the waiting request is cancelled before it runs
+        limiter.release(0.01)
+        waiter.cancel()
+        try:
+            acquired = await waiter
+        except asyncio.CancelledError:
+            acquired = False
+        # Either the request kept the slot (and will release it) or gave it back
+        assert limiter.in_flight == (1 if acquired else 0)
+
+
+class TestConcurrencyMiddleware:
+    """Drive the app against the local stand-in while the backend slows down."""
+
+    @pytest.mark.asyncio
+    async def test_backend_slowdown_shrinks_limit(self, monkeypatch):
+        monkeypatch.setattr(settings, "rate_limit_enabled", False)
+        monkeypatch.setattr(settings, "items_cache_enabled", False)
+        monkeypatch.setattr(settings, "concurrency_initial_limit", 16)
+        monkeypatch.setattr(settings, "concurrency_min_limit", 2)
+        monkeypatch.setattr(settings, "concurrency_max_limit", 16)
+        monkeypatch.setattr(settings, "concurrency_queue_timeout_ms", 20)
+        app = create_application()
+        db = FakeSupabase(latency=0.005)
+        db.seed("items", [{"name": f"Item {i}"} for i in range(50)])
+        app.dependency_overrides[get_db] = lambda: db
+
+        async def drive(client, rounds):
+            statuses = []
+
+            async def worker(n):
+                for i in range(rounds):
+                    # Distinct queries, so single-flight does not merge them
+                    response = await client.get("/api/items/", params={"limit": n * rounds + i + 1})
+                    statuses.append(response.status_code)
+
+            await asyncio.gather(*(worker(n) for n in range(24)))
+            return statuses
+
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app), httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            fast = await drive(client, 10)
+            fast_limit = concurrency_limit.value()
+            db.latency = 0.1
+            slow = await drive(client, 3)
+
+        assert fast.count(200) > len(fast) / 2
+        assert concurrency_limit.value() < fast_limit
+        # Excess requests were turned away quickly instead of queueing
+        assert slow.count(503) > 0
+        assert slow.count(200) > 0
@@ -1,7 +1,11 @@
 """Tests for database connection and operations."""
+import asyncio
 import pytest
-from unittest.mock import Mock, patch
+import httpx
+from unittest.mock import AsyncMock, Mock, patch
+from app.core.config import settings
 from app.core.database import Database, get_db
+from app.core.resilience import ResilientTransport
 
 
 class TestDatabase:
@@ -11,31 +15,92 @@ class TestDatabase:
         """Test database initialization."""
         db = Database()
         assert db._client is None
+        assert db.is_connected is False
     
-    @patch("app.core.database.create_client")
-    def test_database_client_creation(self, mock_create_client):
-        """Test Supabase client creation."""
+    def test_client_before_connect_raises(self):
+        """Test accessing the client before the lifespan connected it."""
+        db = Database()
+        with pytest.raises(RuntimeError):
+            db.client
+    
+    @pytest.mark.asyncio
+    @patch("supabase.acreate_client", new_callable=AsyncMock)
+    async def test_database_client_creation(self, mock_create_client):
+        """Test async Supabase client creation with a shared HTTP pool."""
         mock_client = Mock()
         mock_create_client.return_value = mock_client
         
         db = Database()
-        client = db.client
+        client = await db.connect()
         
         assert client == mock_client
-        mock_create_client.assert_called_once()
+        assert db.client == mock_client
+        mock_create_client.assert_awaited_once()
+        options = mock_create_client.call_args.kwargs["options"]
+        assert options.httpx_client is db._http_client
+        
+        # Connecting again reuses the existing client
+        await db.connect()
+        mock_create_client.assert_awaited_once()
+        await db.close()
+    
+    @pytest.mark.asyncio
+    @patch("supabase.acreate_client", new_callable=AsyncMock)
+    async def test_concurrent_connects_share_one_client(self, mock_create_client):
+        """Test requests racing the warm-up share a single connection attempt."""
+        db = Database()
+        clients = await asyncio.gather(*(db.connect() for _ in range(5)))
+        assert all(client is clients[0] for client in clients)
+        mock_create_client.assert_awaited_once()
+        await db.close()
+    
+    @pytest.mark.asyncio
+    @patch("supabase.acreate_client", new_callable=AsyncMock)
+    async def test_failed_connect_can_retry(self, mock_create_client):
+        """Test a failed connection leaves the database unconnected."""
+        mock_create_client.side_effect = [ConnectionError("down"), Mock()]
+        db = Database()
+        with pytest.raises(ConnectionError):
+            await db.connect()
+        assert db.is_connected is False
+        assert db._http_client is None
+        await db.connect()
+        assert db.is_connected
+        await db.close()
+    
+    def test_http_client_pool_settings(self):
+        """Test the HTTP pool is configured from settings."""
+        http_client = Database()._build_http_client()
+        # ResilientTransport -> InstrumentedTransport -> AsyncHTTPTransport
+        assert isinstance(http_client._transport, ResilientTransport)
+        pool = http_client._transport._transport._transport._pool
+        assert pool._max_connections == settings.db_max_connections
+        assert pool._max_keepalive_connections == settings.db_max_keepalive_connections
+        assert http_client.timeout.connect == settings.db_connect_timeout
+        assert http_client.timeout.read == settings.db_read_timeout
     
-    def test_database_close(self):
+    @pytest.mark.asyncio
+    async def test_database_close(self):
         """Test database connection closing."""
         db = Database()
+        http_client = Mock(spec=httpx.AsyncClient)
         db._client = Mock()
-        db.close()
+        db._http_client = http_client
+        await db.close()
+        http_client.aclose.assert_awaited_once()
         assert db._client is None
+        assert db._http_client is None
     
-    def test_get_db_dependency(self, mock_db):
-        """Test database dependency injection."""
-        from app.main import app
-        from app.core.database import get_db
+    def test_lifespan_connects_and_closes(self, client):
+        """Test the application lifespan manages the global client."""
+        from app.core.database import _db
         
+        # The warm-up connects in the background; get_db waits for it
+        assert client.portal.call(get_db) is _db.client
+        assert _db.is_connected
+    
+    def test_get_db_dependency(self, app, mock_db):
+        """Test database dependency injection."""
         # Override the dependency
         app.dependency_overrides[get_db] = lambda: mock_db
         
@@ -46,4 +111,3 @@ class TestDatabase:
         # Clean up
         app.dependency_overrides.clear()
         assert get_db not in app.dependency_overrides
-
@@ -0,0 +1,205 @@
+"""Tests for streaming item exports."""
+import asyncio
+import csv
+import io
+import json
+import os
+import pytest
+from app.api.endpoints.items import export_slots
+from app.core.config import settings
+from app.core.export import CSVEncoder, encode_ndjson, prefetch_pages
+from app.core.metrics import export_rows_total, exports_total
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def _stream(app, query_string: bytes, on_chunk, disconnect: asyncio.Event = None) -> int:
+    """Call ``app`` directly (no body buffering) for GET /api/items/export; returns the status."""
+    disconnect = disconnect or asyncio.Event()
+    status_code = None
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/items/export",
+        "raw_path": b"/api/items/export",
+        "root_path": "",
+        "query_string": query_string,
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message.get("body"):
+            on_chunk(message["body"])
+
+    await app(scope, receive, send)
+    return status_code
+
+
+class TestEncoders:
+    """Test chunk encoders and page prefetching."""
+
+    def test_ndjson(self):
+        assert encode_ndjson([{"id": 1}, {"id": 2, "name": "a\nb"}]) == b'{"id":1}\n{"id":2,"name":"a\\nb"}\n'
+        assert encode_ndjson([]) == b""
+
+    def test_csv(self):
+        encoder = CSVEncoder(["id", "name", "price"])
+        data = encoder.header() + encoder([{"id": 1, "name": 'a,"b"', "price": None, "other": 1}])
+        assert list(csv.reader(io.StringIO(data.decode()))) == [["id", "name", "price"], ["1", 'a,"b"', ""]]
+
+    @pytest.mark.asyncio
+    async def test_prefetch_pages(self):
+        pages = [[1, 2], [3, 4], [5]]
+        requested = []
+
+        async def fetch(previous):
+            index = 0 if previous is None else pages.index(previous) + 1
+            requested.append(index)
+            return pages[index]
+
+        iterator = prefetch_pages(fetch, page_size=2)
+        assert await iterator.__anext__() == [1, 2]
+        await asyncio.sleep(0)
+        # The second page is requested while the first is being consumed
+        assert requested == [0, 1]
+        assert [page async for page in iterator] == [[3, 4], [5]]
+
+    @pytest.mark.asyncio
+    async def test_prefetch_cancelled_on_close(self):
+        cancelled = asyncio.Event()
+
+        async def fetch(previous):
+            if previous is None:
+                return [1]
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        iterator = prefetch_pages(fetch, page_size=1)
+        await iterator.__anext__()
+        await asyncio.sleep(0)
+        await iterator.aclose()
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+
+class TestExportEndpoint:
+    """Test GET /api/items/export."""
+
+    def test_ndjson_export(self, client, override_get_db, monkeypatch):
+        monkeypatch.setattr(settings, "items_export_chunk_size", 4)
+        override_get_db.seed("items", [{"name": f"Item {i}"} for i in range(10)])
+        before = export_rows_total.value(("ndjson",))
+        response = client.get("/api/items/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.headers["content-disposition"] == 'attachment; filename="items.ndjson"'
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["name"] for row in rows] == [f"Item {i}" for i in range(10)]
+        assert export_rows_total.value(("ndjson",)) == before + 10
+        # Three keyset pages of 4, 4 and 2 rows
+        assert override_get_db.executions == 3
+
+    def test_csv_export_with_query(self, client, override_get_db, monkeypatch):
+        monkeypatch.setattr(settings, "items_export_chunk_size", 2)
+        override_get_db.seed("items", [
+            {"name": f"Item {i}", "price": None if i == 3 else float(i % 3)} for i in range(6)
+        ])
+        response = client.get("/api/items/export", params={
+            "format": "csv", "fields": "name,price", "filter": "id.neq.1", "sort": "-price",
+        })
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "text/csv; charset=utf-8"
+        assert list(csv.reader(io.StringIO(response.text))) == [
+            ["name", "price"],
+            ["Item 2", "2.0"], ["Item 5", "2.0"], ["Item 1", "1.0"], ["Item 4", "1.0"], ["Item 3", ""],
+        ]
+
+    def test_empty_export(self, client, override_get_db):
+        response = client.get("/api/items/export", params={"format": "csv", "fields": "id"})
+        assert response.text.splitlines() == ["id"]
+
+    @pytest.mark.parametrize("params", [{"format": "xml"}, {"fields": "secret"}, {"sort": "description"}])
+    def test_invalid_query(self, client, override_get_db, params):
+        response = client.get("/api/items/export", params=params)
+        assert response.status_code in (400, 422)
+        assert override_get_db.executions == 0
+
+    def test_too_many_exports(self, client, override_get_db, monkeypatch):
+        monkeypatch.setattr(export_slots, "_value", 0)
+        response = client.get("/api/items/export")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+
+    @pytest.mark.asyncio
+    async def test_client_disconnect_cancels_export(self, app, override_get_db, monkeypatch):
+        monkeypatch.setattr(settings, "items_export_chunk_size", 10)
+        override_get_db.seed("items", [{"name": f"Item {i}"} for i in range(1000)])
+        # Slow pages, so the disconnect lands mid-export
+        override_get_db.latency = 0.01
+        cancelled = exports_total.value(("ndjson", "cancelled"))
+        disconnect = asyncio.Event()
+        chunks = []
+
+        def on_chunk(chunk):
+            chunks.append(chunk)
+            if len(chunks) == 3:
+                disconnect.set()
+
+        status_code = await asyncio.wait_for(_stream(app, b"", on_chunk, disconnect), 5)
+        assert status_code == 200
+        assert 3 <= len(chunks) < 100
+        # Stopped fetching pages; the prefetched one at most was in flight
+        assert override_get_db.executions <= len(chunks) + 2
+        assert exports_total.value(("ndjson", "cancelled")) == cancelled + 1
+        assert not export_slots.locked() and export_slots._value == settings.items_export_max_concurrent
+
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc for RSS")
+    async def test_million_rows_in_flat_memory(self, app, override_get_db):
+        rows = 1_000_000
+        override_get_db.conn.execute(
+            "INSERT INTO items (name, price) "
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "SELECT 'Item ' || i, i % 100 FROM n",
+            (rows,),
+        )
+        received = {"bytes": 0, "lines": 0, "chunks": 0}
+        baseline = peak = _rss_bytes()
+
+        def on_chunk(chunk):
+            nonlocal peak
+            received["bytes"] += len(chunk)
+            received["lines"] += chunk.count(b"\n")
+            received["chunks"] += 1
+            if received["chunks"] % 20 == 0:
+                peak = max(peak, _rss_bytes())
+
+        status_code = await _stream(app, b"fields=id,name,price", on_chunk)
+        assert status_code == 200
+        assert received["lines"] == rows
+        # Materializing the export would take hundreds of MB (~110 MB of NDJSON alone)
+        assert received["bytes"] > 30 * 1024 * 1024
+        assert peak - baseline < 20 * 1024 * 1024
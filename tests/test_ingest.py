@@ -0,0 +1,296 @@
+"""Tests for NDJSON ingestion and request body limits."""
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+import httpx
+import pytest
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from app.api.endpoints.items import ingest_slots
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.ingest import LineSplitter, LineTooLong, ingest_ndjson
+from app.middleware.body_limit_middleware import BodyLimitMiddleware
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def _parse(line: bytes) -> dict:
+    row = json.loads(line)
+    if "name" not in row:
+        raise ValueError("name: Field required")
+    return row
+
+
+class TestLineSplitter:
+    """Test splitting a byte stream into lines."""
+
+    def test_lines_across_chunks(self):
+        splitter = LineSplitter(max_line_bytes=10)
+        assert splitter.feed(b"ab") == []
+        assert splitter.feed(b"c\nde\n\nf") == [b"abc", b"de", b""]
+        assert splitter.feed(b"g") == []
+        assert splitter.close() == [b"fg"]
+        assert splitter.close() == []
+
+    def test_line_too_long(self):
+        splitter = LineSplitter(max_line_bytes=4)
+        assert splitter.feed(b"abcd\n") == [b"abcd"]
+        splitter.feed(b"abc")
+        # Detected before the line is complete
+        with pytest.raises(LineTooLong):
+            splitter.feed(b"de")
+        with pytest.raises(LineTooLong):
+            LineSplitter(max_line_bytes=4).feed(b"a\nabcde\n")
+
+
+class TestIngestNDJSON:
+    """Test parsing, batching and the per-line report."""
+
+    @pytest.mark.asyncio
+    async def test_report(self):
+        batches = []
+
+        async def insert(rows):
+            batches.append(rows)
+            return [ValueError("duplicate") if row["name"] == "dup" else row for row in rows]
+
+        report = await ingest_ndjson(
+            _chunks(b'{"name": "a"}\n\n{"na', b'me": "dup"}\n{}\nnot json\n{"name": "b"}\n{"name": "c"}'),
+            _parse, insert, batch_size=2,
+        )
+        assert [[row["name"] for row in batch] for batch in batches] == [["a", "dup"], ["b", "c"]]
+        assert report.to_dict() == {
+            "lines": 7,
+            "created": 3,
+            "failed": 3,
+            "errors": [
+                {"line": 4, "error": "name: Field required"},
+                {"line": 5, "error": "Expecting value: line 1 column 1 (char 0)"},
+                {"line": 3, "error": "duplicate"},
+            ],
+            "errors_truncated": False,
+        }
+
+    @pytest.mark.asyncio
+    async def test_errors_capped(self):
+        async def insert(rows):
+            return rows
+
+        report = await ingest_ndjson(_chunks(b"{}\n" * 5), _parse, insert, max_errors=2)
+        assert report.failed == 5
+        assert [error["line"] for error in report.errors] == [1, 2]
+        assert report.to_dict()["errors_truncated"] is True
+
+    @pytest.mark.asyncio
+    async def test_backpressure(self):
+        release = asyncio.Event()
+        inserting = []
+        chunks_read = 0
+
+        async def chunks():
+            nonlocal chunks_read
+            for _ in range(10):
+                chunks_read += 1
+                yield b'{"name": "a"}\n'
+
+        async def insert(rows):
+            inserting.append(rows)
+            await release.wait()
+            return rows
+
+        task = asyncio.create_task(ingest_ndjson(chunks(), _parse, insert, batch_size=1))
+        await asyncio.sleep(0.05)
+        # One batch inserting, one parsed and waiting for it; nothing read beyond that
+        assert len(inserting) == 1
+        assert chunks_read == 2
+        release.set()
+        report = await task
+        assert report.created == 10
+
+    @pytest.mark.asyncio
+    async def test_transport_error_aborts(self):
+        async def insert(rows):
+            return [httpx.ConnectError("down")] * len(rows)
+
+        with pytest.raises(httpx.ConnectError):
+            await ingest_ndjson(_chunks(b'{"name": "a"}\n' * 3), _parse, insert, batch_size=1)
+
+
+class TestIngestEndpoint:
+    """Test POST /api/items/ingest."""
+
+    def test_ingest(self, client, override_get_db, monkeypatch):
+        monkeypatch.setattr(settings, "items_ingest_batch_size", 2)
+        lines = [json.dumps({"name": f"Item {i}", "price": i}) for i in range(5)]
+        lines.insert(2, '{"name": "", "price": -1}')
+        response = client.post(
+            "/api/items/ingest",
+            content="\n".join(lines).encode(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "lines": 6,
+            "created": 5,
+            "failed": 1,
+            "errors": [{
+                "line": 3,
+                "error": "name: String should have at least 1 character; "
+                         "price: Input should be greater than or equal to 0",
+            }],
+            "errors_truncated": False,
+        }
+        assert [item["name"] for item in client.get("/api/items").json()["items"]] == [
+            f"Item {i}" for i in range(5)
+        ]
+        # Three batches of 2, 2 and 1 rows
+        assert override_get_db.executions == 4
+
+    def test_streamed_upload(self, client, override_get_db):
+        def body():
+            for i in range(100):
+                yield json.dumps({"name": f"Item {i}"}).encode() + b"\n"
+
+        response = client.post("/api/items/ingest", content=body())
+        assert response.json()["created"] == 100
+
+    def test_line_too_long(self, client, override_get_db, monkeypatch):
+        monkeypatch.setattr(settings, "items_ingest_max_line_bytes", 100)
+        response = client.post("/api/items/ingest", content=b'{"name": "' + b"x" * 200 + b'"}\n')
+        assert response.status_code == 413
+        assert response.json()["detail"] == "Line longer than 100 bytes"
+
+    def test_too_many_ingests(self, client, override_get_db, monkeypatch):
+        monkeypatch.setattr(ingest_slots, "_value", 0)
+        response = client.post("/api/items/ingest", content=b'{"name": "a"}\n')
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+        assert override_get_db.executions == 0
+
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc for RSS")
+    async def test_large_upload_in_flat_memory(self, app):
+        inserted = 0
+
+        class Table:
+            def insert(self, rows):
+                self.rows = rows
+                return self
+
+            async def execute(self):
+                nonlocal inserted
+                inserted += len(self.rows)
+                # Rows are counted, not kept
+                return SimpleNamespace(data=self.rows)
+
+        class CountingDB:
+            def table(self, name):
+                return Table()
+
+        line = json.dumps({"name": "Item", "description": "x" * 1000, "price": 1.5}).encode() + b"\n"
+        chunk = line * (64 * 1024 // len(line))
+        total_chunks = 256 * 1024 * 1024 // len(chunk)
+        sent = 0
+        baseline = peak = _rss_bytes()
+
+        async def receive():
+            nonlocal sent, peak
+            sent += 1
+            if sent % 100 == 0:
+                peak = max(peak, _rss_bytes())
+            return {"type": "http.request", "body": chunk, "more_body": sent < total_chunks}
+
+        body = bytearray()
+
+        async def send(message):
+            body.extend(message.get("body", b""))
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": "/api/items/ingest",
+            "raw_path": b"/api/items/ingest", "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"testserver"), (b"content-type", b"application/x-ndjson")],
+            "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+        }
+        app.dependency_overrides[get_db] = CountingDB
+        try:
+            await app(scope, receive, send)
+        finally:
+            app.dependency_overrides.clear()
+        lines = total_chunks * (len(chunk) // len(line))
+        assert json.loads(body)["created"] == lines == inserted
+        assert peak - baseline < 30 * 1024 * 1024
+
+
+class TestBodyLimitMiddleware:
+    """Test request body and line length limits."""
+
+    @staticmethod
+    async def _echo(scope, receive, send):
+        body = await Request(scope, receive).body()
+        await JSONResponse({"bytes": len(body)})(scope, receive, send)
+
+    def _client(self, **kwargs) -> httpx.AsyncClient:
+        app = BodyLimitMiddleware(self._echo, **kwargs)
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    @pytest.mark.asyncio
+    async def test_content_length_over_limit(self):
+        called = False
+
+        async def app(scope, receive, send):
+            nonlocal called
+            called = True
+
+        middleware = BodyLimitMiddleware(app, max_body_size=10, path_limits={})
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test") as client:
+            response = await client.post("/", content=b"x" * 11)
+        assert response.status_code == 413
+        assert not called
+
+    @pytest.mark.asyncio
+    async def test_streamed_body_over_limit(self):
+        async def body():
+            for _ in range(4):
+                yield b"x" * 4
+
+        async with self._client(max_body_size=10, path_limits={}) as client:
+            assert (await client.post("/", content=b"x" * 10)).json() == {"bytes": 10}
+            # No Content-Length: counted as it is read
+            response = await client.post("/", content=body())
+        assert response.status_code == 413
+        assert response.json() == {"detail": "Request body larger than 10 bytes"}
+
+    @pytest.mark.asyncio
+    async def test_path_limits(self):
+        async def body(*chunks):
+            for chunk in chunks:
+                yield chunk
+
+        async with self._client(max_body_size=10, path_limits={"/ingest": (0, 4)}) as client:
+            # Body limit replaced; lines checked across chunks
+            response = await client.post("/ingest", content=body(b"abcd\nab", b"cd\n", b"a" * 4))
+            assert response.json() == {"bytes": 14}
+            response = await client.post("/ingest", content=body(b"abcd\nab", b"c", b"de\n"))
+            assert response.status_code == 413
+            assert response.json() == {"detail": "Line longer than 4 bytes"}
+            assert (await client.post("/other", content=b"x" * 11)).status_code == 413
+
+    def test_default_limit(self, client, override_get_db):
+        response = client.post(
+            "/api/items/bulk",
+            content=b"[" + b" " * settings.max_request_body_bytes + b"]",
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.status_code == 413
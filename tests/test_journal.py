@@ -0,0 +1,276 @@
+"""Tests for the write-behind journal."""
+import asyncio
+import json
+import os
+from unittest.mock import patch
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+from app.api.endpoints.items import items_journal
+from app.core.config import settings
+from app.core.journal import DEAD_LETTER_FILE, JournalFull, WriteBehindJournal
+from app.core.resilience import CircuitOpenError
+from benchmarks.fakes import FakeSupabase
+
+
+def _segments(directory):
+    """Segment paths relative to the journal root, across worker directories."""
+    return sorted(
+        os.path.join(worker, name)
+        for worker in os.listdir(directory) if worker.startswith("worker-")
+        for name in os.listdir(directory / worker) if name.startswith("segment-")
+    )
+
+
+def _names(db):
+    return [row["name"] for row in db.conn.execute('SELECT name FROM items ORDER BY id')]
+
+
+class TestWriteBehindJournal:
+    """Test journaling, flushing and replay."""
+
+    @pytest.mark.asyncio
+    async def test_append_then_flush_removes_segment(self, tmp_path):
+        db = FakeSupabase()
+        flushed = []
+        journal = WriteBehindJournal(str(tmp_path), "items", on_flush=lambda: flushed.append(1))
+        await journal.open()
+        ids = [await journal.append({"name": f"Item {i}"}) for i in range(3)]
+
+        segment, = _segments(tmp_path)
+        records = [json.loads(line) for line in (tmp_path / segment).read_text().splitlines()]
+        assert [r["id"] for r in records] == ids
+        assert journal.pending == 3
+
+        assert await journal.flush_once(db) is True
+        assert _names(db) == ["Item 0", "Item 1", "Item 2"]
+        assert journal.pending == 0
+        assert flushed == [1]
+        assert _segments(tmp_path) == []
+
+    @pytest.mark.asyncio
+    async def test_replays_unflushed_rows(self, tmp_path):
+        journal = WriteBehindJournal(str(tmp_path), "items")
+        await journal.open()
+        for i in range(3):
+            await journal.append({"name": f"Item {i}"})
+        await journal.close()
+        # A torn write from a crash is skipped
+        segment, = _segments(tmp_path)
+        with open(tmp_path / segment, "ab") as f:
+            f.write(b'{"id": "x", "ro')
+
+        db = FakeSupabase()
+        restarted = WriteBehindJournal(str(tmp_path), "items")
+        assert await restarted.open() == 3
+        await restarted.append({"name": "Item 3"})
+        # New rows go to a new segment
+        assert len(_segments(tmp_path)) == 2
+        assert await restarted.flush_once(db) is True
+        assert _names(db) == ["Item 0", "Item 1", "Item 2", "Item 3"]
+        assert _segments(tmp_path) == []
+
+    @pytest.mark.asyncio
+    async def test_workers_sharing_a_root_keep_their_rows(self, tmp_path):
+        first = WriteBehindJournal(str(tmp_path), "items")
+        await first.open()
+        await first.append({"name": "Item 0"})
+
+        # A second worker does not replay (or remove) rows of a live one
+        second = WriteBehindJournal(str(tmp_path), "items")
+        assert await second.open() == 0
+        await second.append({"name": "Item 1"})
+        assert first.worker_directory != second.worker_directory
+        assert len(_segments(tmp_path)) == 2
+        db = FakeSupabase()
+        assert await second.flush_once(db) is True
+        assert _names(db) == ["Item 1"]
+        assert len(_segments(tmp_path)) == 1
+
+        # Once the first worker is gone its rows are adopted by the next open
+        await first.close(timeout=0)
+        third = WriteBehindJournal(str(tmp_path), "items")
+        assert await third.open() == 1
+        assert await third.flush_once(db) is True
+        assert _names(db) == ["Item 1", "Item 0"]
+        assert _segments(tmp_path) == []
+        await second.close()
+        await third.close()
+        assert sorted(os.listdir(tmp_path)) == [".lock"]
+
+    @pytest.mark.asyncio
+    async def test_adopts_segments_from_the_root(self, tmp_path):
+        (tmp_path / "segment-000000000001.jsonl").write_text('{"id": "a", "row": {"name": "Item 0"}}\n')
+        journal = WriteBehindJournal(str(tmp_path), "items")
+        assert await journal.open() == 1
+        assert not (tmp_path / "segment-000000000001.jsonl").exists()
+
+    @pytest.mark.asyncio
+    async def test_open_twice_fails(self, tmp_path):
+        journal = WriteBehindJournal(str(tmp_path), "items")
+        await journal.open()
+        with pytest.raises(RuntimeError):
+            await journal.open()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_appends_share_fsyncs(self, tmp_path):
+        journal = WriteBehindJournal(str(tmp_path), "items")
+        await journal.open()
+        writes = []
+        original = journal._write
+
+        def counting_write(*args):
+            writes.append(args)
+            original(*args)
+
+        with patch.object(journal, "_write", counting_write):
+            await asyncio.gather(*(journal.append({"name": f"Item {i}"}) for i in range(50)))
+        assert journal.pending == 50
+        assert len(writes) < 10
+
+    @pytest.mark.asyncio
+    async def test_full_journal_rejects(self, tmp_path):
+        journal = WriteBehindJournal(str(tmp_path), "items", max_pending=2)
+        await journal.open()
+        await journal.append({"name": "a"})
+        await journal.append({"name": "b"})
+        with pytest.raises(JournalFull):
+            await journal.append({"name": "c"})
+
+    @pytest.mark.asyncio
+    async def test_append_requires_open(self, tmp_path):
+        with pytest.raises(RuntimeError):
+            await WriteBehindJournal(str(tmp_path), "items").append({"name": "a"})
+
+    @pytest.mark.asyncio
+    async def test_transient_failure_is_retried(self, tmp_path):
+        db = FakeSupabase()
+        journal = WriteBehindJournal(str(tmp_path), "items", max_attempts=1)
+        await journal.open()
+        await journal.append({"name": "a"})
+        await journal.append({"name": "b"})
+
+        db.fail_next = 1
+        assert await journal.flush_once(db) is False
+        assert journal.pending == 2
+        assert await journal.flush_once(db) is True
+        assert _names(db) == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_unreachable_database_keeps_rows(self, tmp_path):
+        class Unreachable:
+            def table(self, name):
+                raise httpx.ConnectError("connection refused")
+
+        journal = WriteBehindJournal(str(tmp_path), "items", max_attempts=1)
+        await journal.open()
+        await journal.append({"name": "a"})
+        for _ in range(3):
+            assert await journal.flush_once(Unreachable()) is False
+        assert journal.pending == 1
+        assert not (tmp_path / DEAD_LETTER_FILE).exists()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error", [
+        APIError({"code": "PGRST001", "message": "database unavailable", "hint": None, "details": None}),
+        APIError({"code": 502, "message": "JSON could not be generated", "hint": None, "details": None}),
+        CircuitOpenError("circuit open", retry_after=10),
+    ])
+    async def test_outage_does_not_dead_letter(self, tmp_path, error):
+        class Failing:
+            def table(self, name):
+                raise error
+
+        db = FakeSupabase()
+        journal = WriteBehindJournal(str(tmp_path), "items", max_attempts=2)
+        await journal.open()
+        await journal.append({"name": "a"})
+        await journal.append({"name": "b"})
+        for _ in range(5):
+            assert await journal.flush_once(Failing()) is False
+        assert journal.pending == 2
+        assert not (tmp_path / DEAD_LETTER_FILE).exists()
+        # Back up: every row is written, once
+        assert await journal.flush_once(db) is True
+        assert _names(db) == ["a", "b"]
+        assert db.executions == 1
+
+    @pytest.mark.asyncio
+    async def test_rejected_rows_are_dead_lettered(self, tmp_path):
+        db = FakeSupabase()
+        journal = WriteBehindJournal(str(tmp_path), "items", max_attempts=2)
+        await journal.open()
+        await journal.append({"name": "good"})
+        bad_id = await journal.append({"name": "bad", "no_such_column": 1})
+
+        assert await journal.flush_once(db) is False
+        assert _names(db) == ["good"]
+        assert await journal.flush_once(db) is True
+        assert journal.pending == 0
+        dead, = [json.loads(line) for line in (tmp_path / DEAD_LETTER_FILE).read_text().splitlines()]
+        assert dead["id"] == bad_id and "no_such_column" in dead["error"]
+        assert _segments(tmp_path) == []
+
+    @pytest.mark.asyncio
+    async def test_segments_rotate_and_are_removed(self, tmp_path):
+        db = FakeSupabase()
+        journal = WriteBehindJournal(str(tmp_path), "items", segment_bytes=100, batch_size=2)
+        await journal.open()
+        for i in range(6):
+            await journal.append({"name": f"Item {i}"})
+        assert len(_segments(tmp_path)) > 1
+        while journal.pending:
+            await journal.flush_once(db)
+        assert len(_names(db)) == 6
+        assert _segments(tmp_path) == []
+
+    @pytest.mark.asyncio
+    async def test_background_flusher(self, tmp_path):
+        db = FakeSupabase()
+        journal = WriteBehindJournal(str(tmp_path), "items", flush_interval=0.01)
+        await journal.open()
+
+        async def get_db():
+            return db
+
+        journal.start(get_db)
+        await asyncio.gather(*(journal.append({"name": f"Item {i}"}) for i in range(20)))
+        for _ in range(100):
+            if not journal.pending:
+                break
+            await asyncio.sleep(0.01)
+        await journal.close()
+        assert len(_names(db)) == 20
+
+
+class TestWriteBehindEndpoint:
+    """Test POST /api/items in write-behind mode."""
+
+    @pytest.fixture
+    def write_behind_client(self, app, fake_db, tmp_path, monkeypatch):
+        from app.core.database import get_db
+        monkeypatch.setattr(settings, "items_write_behind_enabled", True)
+        monkeypatch.setattr(items_journal, "directory", str(tmp_path))
+        monkeypatch.setattr(items_journal, "flush_interval", 0.01)
+        app.dependency_overrides[get_db] = lambda: fake_db
+        with TestClient(app) as client:
+            yield client
+        app.dependency_overrides.clear()
+
+    def test_accepted_then_written(self, write_behind_client, fake_db):
+        response = write_behind_client.post("/api/items/", json={"name": "Later"})
+        assert response.status_code == 202
+        assert response.json()["status"] == "accepted" and response.json()["id"]
+
+        for _ in range(100):
+            if _names(fake_db):
+                break
+            write_behind_client.portal.call(asyncio.sleep, 0.01)
+        assert _names(fake_db) == ["Later"]
+
+    def test_full_journal_returns_503(self, write_behind_client, monkeypatch):
+        monkeypatch.setattr(items_journal, "max_pending", 0)
+        response = write_behind_client.post("/api/items/", json={"name": "Nope"})
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
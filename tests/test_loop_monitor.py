@@ -0,0 +1,70 @@
+"""Tests for event loop lag monitoring."""
+import asyncio
+import logging
+import time
+import pytest
+from app.core.loop_monitor import LoopMonitor
+from app.core.metrics import event_loop_blocked_total, event_loop_lag_seconds
+
+
+def _block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+class TestLoopMonitor:
+    """Test lag sampling and blocked-loop detection."""
+
+    def test_percentiles(self):
+        monitor = LoopMonitor(interval=0.05, window=100)
+        assert monitor.percentiles() == {}
+        for lag in range(1, 101):
+            monitor.record(lag / 1000)
+        percentiles = monitor.percentiles()
+        assert percentiles[0.5] == pytest.approx(0.051)
+        assert percentiles[0.99] == pytest.approx(0.099)
+        assert percentiles[1.0] == pytest.approx(0.1)
+        # Published every 20 samples (once a second at 50ms)
+        assert event_loop_lag_seconds.value(("0.9",)) == pytest.approx(0.090)
+
+    def test_window_is_bounded(self):
+        monitor = LoopMonitor(window=10)
+        for _ in range(50):
+            monitor.record(0.5)
+        monitor.record(0.0)
+        assert len(monitor.samples) == 10
+        assert monitor.percentiles()[1.0] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_captures_blocking_stack(self, caplog):
+        monitor = LoopMonitor(interval=0.01, block_threshold=0.05)
+        before = event_loop_blocked_total.value()
+        monitor.start()
+        try:
+            await asyncio.sleep(0.03)
+            with caplog.at_level(logging.WARNING, logger="app.core.loop_monitor"):
+                _block_the_loop(0.3)
+                await asyncio.sleep(0.05)
+        finally:
+            await monitor.stop()
+
+        # Reported once while blocked, with the blocking call on the stack
+        assert monitor.blocked == 1
+        assert event_loop_blocked_total.value() == before + 1
+        assert "_block_the_loop" in caplog.text
+        assert monitor.percentiles()[1.0] >= 0.2
+
+    @pytest.mark.asyncio
+    async def test_idle_loop_is_not_blocked(self):
+        monitor = LoopMonitor(interval=0.01, block_threshold=0.05)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            await monitor.stop()
+        assert monitor.blocked == 0
+        assert len(monitor.samples) >= 10
+        assert not monitor.running
+
+    def test_started_by_lifespan(self, client, app):
+        monitor = app.state.loop_monitor
+        assert monitor is not None and monitor.running
@@ -0,0 +1,102 @@
+"""Tests for metrics collection and the /metrics endpoint."""
+import httpx
+import pytest
+from app.core.metrics import (
+    Counter,
+    Histogram,
+    InstrumentedTransport,
+    MetricsRegistry,
+    db_request_duration_seconds,
+    db_requests_total,
+    http_request_duration_seconds,
+    http_requests_total,
+)
+
+
+class TestHistogram:
+    """Test fixed-bucket histograms."""
+
+    def test_bucketing_and_render(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.01, 0.1))
+        histogram.observe_ns(5_000_000, ("/a",))      # 5ms
+        histogram.observe_ns(10_000_000, ("/a",))     # exactly on the 10ms bound
+        histogram.observe_ns(50_000_000, ("/a",))     # 50ms
+        histogram.observe_ns(2_000_000_000, ("/a",))  # 2s -> +Inf only
+        text = registry.render()
+        assert 'latency_seconds_bucket{route="/a",le="0.01"} 2' in text
+        assert 'latency_seconds_bucket{route="/a",le="0.1"} 3' in text
+        assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+        assert 'latency_seconds_count{route="/a"} 4' in text
+        assert 'latency_seconds_sum{route="/a"} 2.065' in text
+        assert histogram.count(("/a",)) == 4
+
+
+class TestCounter:
+    """Test counters and label rendering."""
+
+    def test_inc_and_escape(self):
+        counter = Counter("things_total", "Things.", ("name",))
+        counter.inc(('a"b',))
+        counter.inc(('a"b',), 2)
+        assert counter.value(('a"b',)) == 3
+        assert list(counter.samples()) == ['things_total{name="a\\"b"} 3']
+
+    def test_duplicate_registration(self):
+        registry = MetricsRegistry()
+        registry.counter("x_total", "X.")
+        with pytest.raises(ValueError):
+            registry.counter("x_total", "X.")
+
+
+class TestInstrumentedTransport:
+    """Test database call timing."""
+
+    @pytest.mark.asyncio
+    async def test_records_table_and_outcome(self):
+        def handler(request):
+            return httpx.Response(200, json=[])
+
+        transport = InstrumentedTransport(httpx.MockTransport(handler))
+        labels = ("GET", "widgets")
+        before = db_request_duration_seconds.count(labels)
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get("https://db.local/rest/v1/widgets?select=*")
+        assert db_request_duration_seconds.count(labels) == before + 1
+        assert db_requests_total.value(labels + ("ok",)) >= 1
+
+    @pytest.mark.asyncio
+    async def test_records_errors(self):
+        def handler(request):
+            raise httpx.ConnectError("down")
+
+        transport = InstrumentedTransport(httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as client:
+            with pytest.raises(httpx.ConnectError):
+                await client.get("https://db.local/rest/v1/broken")
+        assert db_requests_total.value(("GET", "broken", "error")) >= 1
+
+
+class TestMetricsEndpoint:
+    """Test request metrics through the app."""
+
+    def test_request_metrics_recorded(self, client):
+        before = http_requests_total.value(("GET", "/health", "200"))
+        client.get("/health")
+        assert http_requests_total.value(("GET", "/health", "200")) == before + 1
+        assert http_request_duration_seconds.count(("GET", "/health")) >= 1
+
+    def test_unmatched_routes_collapse(self, client):
+        client.get("/no/such/path/123")
+        assert http_requests_total.value(("GET", "<unmatched>", "404")) >= 1
+
+    def test_metrics_endpoint(self, client, override_get_db):
+        client.get("/api/items")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert "# TYPE http_request_duration_seconds histogram" in text
+        assert 'http_requests_total{method="GET",route="/api/items/",status="200"}' in text
+        assert "http_requests_in_flight 1" in text  # the scrape itself
+        assert "items_cache_misses_total" in text
@@ -0,0 +1,160 @@
+"""Tests for per-request profiling."""
+import os
+import pstats
+import time
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from unittest.mock import patch
+from app.core.config import settings
+from app.core.profiling import ProfileStore, SamplingProfiler, pstats_summary
+from app.main import create_application
+from app.middleware.auth_middleware import AuthResult
+from app.middleware.profiling_middleware import ProfilingMiddleware
+
+
+def _spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def _slow_endpoint(request):
+    _spin(0.02)
+    return PlainTextResponse("ok")
+
+
+def _profiled_app(store: ProfileStore, sample_every: int = 0):
+    """Starlette app behind ProfilingMiddleware; ``x-role: admin`` marks an admin."""
+    app = ProfilingMiddleware(
+        Starlette(routes=[Route("/slow", _slow_endpoint)]),
+        store=store,
+        sample_every=sample_every,
+    )
+
+    async def with_auth(scope, receive, send):
+        headers = dict(scope["headers"])
+        claims = {"role": headers.get(b"x-role", b"").decode()}
+        scope.setdefault("state", {})["auth"] = AuthResult(True, "ok", "u1", "t", claims)
+        await app(scope, receive, send)
+
+    return with_auth
+
+
+class TestProfileStore:
+    """Test the rolling report directory."""
+
+    def test_prunes_oldest_and_rejects_unsafe_names(self, tmp_path):
+        store = ProfileStore(str(tmp_path), max_files=2)
+        profiler = SamplingProfiler()
+        names = [store.new_name("GET", "/api/items", "collapsed") for _ in range(3)]
+        for name in names:
+            store.save(profiler, name)
+        assert store.list() == names[:0:-1]
+        assert store.path(names[0]) is None
+        assert store.path(names[2]) == os.path.join(str(tmp_path), names[2])
+        assert store.path("../secrets.pstats") is None
+        assert store.path("report.txt") is None
+
+    def test_missing_directory_lists_nothing(self, tmp_path):
+        assert ProfileStore(str(tmp_path / "none")).list() == []
+
+
+class TestSamplingProfiler:
+    """Test the thread-sampling profiler."""
+
+    def test_collapsed_stacks(self, tmp_path):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        _spin(0.1)
+        profiler.stop()
+        path = str(tmp_path / "out.collapsed")
+        profiler.write(path)
+        lines = open(path).read().splitlines()
+        assert any("test_collapsed_stacks" in line and "_spin" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+class TestProfilingMiddleware:
+    """Test admin-triggered and sampled profiling."""
+
+    @pytest.mark.asyncio
+    async def test_admin_header_profiles_request(self, tmp_path):
+        store = ProfileStore(str(tmp_path))
+        transport = httpx.ASGITransport(app=_profiled_app(store))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/slow", headers={"x-profile": "1", "x-role": "admin"})
+
+        assert response.status_code == 200
+        name = response.headers["x-profile-report"]
+        assert name.endswith(".pstats") and "GET-slow" in name
+        stats = pstats.Stats(store.path(name))
+        assert any(func[2] == "_spin" for func in stats.stats)
+        assert "_spin" in pstats_summary(store.path(name))
+
+    @pytest.mark.asyncio
+    async def test_query_flag_selects_sampler(self, tmp_path):
+        store = ProfileStore(str(tmp_path))
+        transport = httpx.ASGITransport(app=_profiled_app(store))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/slow?profile=sample", headers={"x-role": "admin"})
+
+        name = response.headers["x-profile-report"]
+        assert name.endswith(".collapsed")
+        assert "_spin" in open(store.path(name)).read()
+
+    @pytest.mark.asyncio
+    async def test_flag_ignored_for_non_admin(self, tmp_path):
+        store = ProfileStore(str(tmp_path))
+        transport = httpx.ASGITransport(app=_profiled_app(store))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/slow?profile=1", headers={"x-profile": "1"})
+
+        assert response.status_code == 200
+        assert "x-profile-report" not in response.headers
+        assert store.list() == []
+
+    @pytest.mark.asyncio
+    async def test_sampled_mode(self, tmp_path):
+        store = ProfileStore(str(tmp_path))
+        transport = httpx.ASGITransport(app=_profiled_app(store, sample_every=2))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = [await client.get("/slow") for _ in range(4)]
+
+        # Stored without telling the (non-admin) client
+        assert all("x-profile-report" not in r.headers for r in responses)
+        assert len(store.list()) == 2
+
+    def test_disabled_by_default(self, app):
+        assert not any(m.cls is ProfilingMiddleware for m in app.user_middleware)
+        assert "/debug/profiles" not in {route.path for route in app.routes}
+
+    def test_reports_endpoint_requires_admin(self, tmp_path):
+        with patch.object(settings, "profiling_enabled", True), \
+                patch.object(settings, "profiling_dir", str(tmp_path)):
+            app = create_application()
+        with TestClient(app) as client:
+            response = client.get("/debug/profiles", headers={"x-profile": "1"})
+        assert response.status_code == 404
+        assert "x-profile-report" not in response.headers
+
+    def test_reports_endpoint_for_admin(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(AuthResult, "is_admin", property(lambda self: self.is_valid))
+        with patch.object(settings, "profiling_enabled", True), \
+                patch.object(settings, "profiling_dir", str(tmp_path)):
+            app = create_application()
+        with TestClient(app) as client:
+            profiled = client.get("/", headers={"x-profile": "cprofile", "x-api-key": "k"})
+            name = profiled.headers["x-profile-report"]
+            listing = client.get("/debug/profiles", headers={"x-api-key": "k"})
+            text = client.get(f"/debug/profiles/{name}?format=text", headers={"x-api-key": "k"})
+            raw = client.get(f"/debug/profiles/{name}", headers={"x-api-key": "k"})
+            missing = client.get("/debug/profiles/nope.pstats", headers={"x-api-key": "k"})
+
+        assert listing.json() == {"reports": [name]}
+        assert "cumulative" in text.text
+        assert pstats.Stats(str(tmp_path / name)).total_calls > 0 and raw.content
+        assert missing.status_code == 404
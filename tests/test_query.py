@@ -0,0 +1,117 @@
+"""Tests for query plans: projection, filters, sort order and cursors."""
+import pytest
+from datetime import datetime
+from app.core.pagination import encode_cursor
+from app.core.query import COMPARISON_OPERATORS, QueryError, QueryField, QuerySchema
+
+
+@pytest.fixture
+def schema():
+    return QuerySchema(
+        [
+            QueryField("id", int, COMPARISON_OPERATORS | {"in"}, sortable=True),
+            QueryField("name", str, {"eq", "in", "ilike"}, sortable=True),
+            QueryField("description", str, {"ilike", "is"}, nullable=True),
+            QueryField("price", float, COMPARISON_OPERATORS | {"is"}, sortable=True, nullable=True),
+            QueryField("created_at", datetime, {"gte"}, sortable=True, nullable=True),
+        ],
+        max_filters=3,
+        cache_size=2,
+    )
+
+
+class TestQuerySchema:
+    """Test parsing and validating query parameters."""
+
+    def test_default_plan(self, schema):
+        plan = schema.plan()
+        assert plan.key == ""
+        assert plan.fields is None
+        assert plan.select == plan.keyset_select == "*"
+        assert [(field.name, desc) for field, desc in plan.sort] == [("id", False)]
+
+    def test_projection_and_sort(self, schema):
+        plan = schema.plan(fields="name, id,name", sort="-price,name")
+        assert plan.fields == ("name", "id")
+        assert plan.select == "name,id"
+        # Sort columns are fetched for the cursor; the unique key breaks ties
+        assert plan.keyset_select == "name,id,price"
+        assert [(field.name, desc) for field, desc in plan.sort] == [
+            ("price", True), ("name", False), ("id", False),
+        ]
+        assert plan.project([{"name": "a", "id": 1, "price": 2.0}]) == [{"name": "a", "id": 1}]
+
+    def test_sort_stops_at_unique_key(self, schema):
+        plan = schema.plan(sort="-id,name")
+        assert [(field.name, desc) for field, desc in plan.sort] == [("id", True)]
+
+    def test_filters_are_typed(self, schema):
+        plan = schema.plan(filters=["price.gte.10", "id.in.(1, 2)", "description.is.null"])
+        assert plan.filters == (
+            ("description", "is", None),
+            ("id", "in", (1, 2)),
+            ("price", "gte", 10.0),
+        )
+
+    @pytest.mark.parametrize("kwargs,message", [
+        ({"fields": "id,secret"}, "Unknown field: secret"),
+        ({"fields": ""}, "at least one field"),
+        ({"filters": ["price.like.1"]}, "not allowed on price"),
+        ({"filters": ["price.gte.cheap"]}, "Invalid value for price"),
+        ({"filters": ["price.gte.nan"]}, "Invalid value for price"),
+        ({"filters": ["id.eq.1.5"]}, "Invalid value for id"),
+        ({"filters": ["created_at.gte.yesterday"]}, "Invalid value for created_at"),
+        ({"filters": ["price"]}, "expected column.operator.value"),
+        ({"filters": ["price.is.1"]}, "only is.null"),
+        ({"filters": ["id.in.1,2"]}, r"expected in\.\(a,b"),
+        ({"filters": ["id.gt.1"] * 4}, "At most 3 filters"),
+        ({"sort": "description"}, "Cannot sort by description"),
+        ({"sort": "name,-name"}, "Duplicate sort field"),
+    ])
+    def test_rejected(self, schema, kwargs, message):
+        with pytest.raises(QueryError, match=message):
+            schema.plan(**kwargs)
+        assert len(schema) == 0
+
+    def test_plans_cached_by_normalized_query(self, schema):
+        plan = schema.plan(fields="id,name", filters=["price.gt.1", "id.lt.9"])
+        assert schema.plan(fields=" id, name ", filters=["id.lt.9", "price.gt.1"]) is plan
+        assert plan.key == "fields=id,name&filter=id.lt.9&filter=price.gt.1"
+        schema.plan(sort="name")
+        schema.plan(sort="price")
+        # LRU bounded by cache_size
+        assert len(schema) == 2
+        assert schema.plan(fields="id,name", filters=["price.gt.1", "id.lt.9"]) is not plan
+
+
+class TestCursors:
+    """Test compound keyset cursors."""
+
+    def test_round_trip(self, schema):
+        plan = schema.plan(sort="-price,name")
+        cursor = plan.encode_cursor({"id": 7, "name": "b", "price": 2.5, "description": None})
+        assert plan.decode_cursor(cursor) == {"price": 2.5, "name": "b", "id": 7}
+
+    @pytest.mark.parametrize("values", [
+        {"id": 1},  # issued for another sort order
+        {"price": 1.0, "name": "a", "id": 1, "extra": 1},
+        {"price": "high", "name": "a", "id": 1},
+        {"price": 1.0, "name": None, "id": 1},
+    ])
+    def test_rejects_foreign_or_tampered(self, schema, values):
+        plan = schema.plan(sort="-price,name")
+        with pytest.raises(QueryError):
+            plan.decode_cursor(encode_cursor(values))
+
+    def test_after_expands_sort_keys(self, schema):
+        plan = schema.plan(sort="-price,name")
+        assert plan.after({"price": 2.5, "name": 'a "b"', "id": 7}) == (
+            "price.lt.2.5,"
+            "price.is.null,"
+            'and(price.eq.2.5,name.gt."a \\"b\\""),'
+            'and(price.eq.2.5,name.eq."a \\"b\\"",id.gt.7)'
+        )
+
+    def test_after_null_sorts_last(self, schema):
+        plan = schema.plan(sort="price")
+        assert plan.after({"price": None, "id": 3}) == "and(price.is.null,id.gt.3)"
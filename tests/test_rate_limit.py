@@ -0,0 +1,197 @@
+"""Tests for token-bucket rate limiting and load shedding."""
+import asyncio
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from app.core.rate_limit import RateLimiter, Tier, parse_tiers, retry_after
+from app.middleware.auth_middleware import AuthResult
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+TIERS = {
+    "anonymous": Tier("anonymous", rate=1, burst=2),
+    "default": Tier("default", rate=10, burst=10),
+    "premium": Tier("premium", rate=100, burst=100),
+}
+
+
+class TestRateLimiter:
+    """Test bucket accounting, refill and eviction."""
+
+    def test_burst_then_limited(self):
+        clock = FakeClock()
+        limiter = RateLimiter(TIERS, clock=clock)
+        assert limiter.acquire("a", "anonymous") == 0
+        assert limiter.acquire("a", "anonymous") == 0
+        assert limiter.acquire("a", "anonymous") == pytest.approx(1.0)
+        # Other keys have their own bucket
+        assert limiter.acquire("b", "anonymous") == 0
+
+    def test_refill(self):
+        clock = FakeClock()
+        limiter = RateLimiter(TIERS, clock=clock)
+        limiter.acquire("a", "anonymous")
+        limiter.acquire("a", "anonymous")
+        clock.now += 0.5
+        assert limiter.acquire("a", "anonymous") == pytest.approx(0.5)
+        clock.now += 0.5
+        assert limiter.acquire("a", "anonymous") == 0
+
+    def test_idle_buckets_evicted(self):
+        clock = FakeClock()
+        limiter = RateLimiter(TIERS, clock=clock)
+        limiter.acquire("a", "anonymous")
+        # Idle longer than the slowest refill (2s): the bucket is full anyway
+        clock.now += 3
+        limiter.acquire("b", "anonymous")
+        assert len(limiter) == 1
+        assert limiter.evictions == 1
+
+    def test_max_keys_bound(self):
+        limiter = RateLimiter(TIERS, max_keys=3, clock=FakeClock())
+        for key in range(10):
+            limiter.acquire(str(key), "default")
+        assert len(limiter) == 3
+
+    def test_parse_tiers(self):
+        tiers = parse_tiers({"default": {"rate": 5}, "premium": {"rate": 5, "burst": 50}})
+        assert tiers["default"].burst == 5
+        assert tiers["premium"].burst == 50
+        with pytest.raises(ValueError):
+            parse_tiers({"default": {"burst": 5}})
+        with pytest.raises(ValueError):
+            parse_tiers({"default": {"rate": 0}})
+
+    def test_retry_after(self):
+        assert retry_after(0.2) == "1"
+        assert retry_after(1.5) == "2"
+        assert retry_after(3) == "3"
+
+
+def build_app(limiter: RateLimiter, max_in_flight: int = 0, proxy_hops: int = 0):
+    """Stand-in app behind the middleware; ``x-user``/``x-tier`` fake a verified login."""
+    gate = asyncio.Event()
+
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    async def slow(request):
+        await gate.wait()
+        return PlainTextResponse("done")
+
+    inner = Starlette(routes=[
+        Route("/", ok), Route("/health", ok), Route("/slow", slow), Route("/api/items/bulk", ok),
+    ])
+    limited = RateLimitMiddleware(inner, limiter=limiter, max_in_flight=max_in_flight, proxy_hops=proxy_hops)
+
+    async def fake_auth(scope, receive, send):
+        headers = dict(scope["headers"])
+        user = headers.get(b"x-user")
+        claims = {"tier": headers[b"x-tier"].decode()} if b"x-tier" in headers else {}
+        scope.setdefault("state", {})["auth"] = AuthResult(
+            is_valid=user is not None, reason="test",
+            user_id=user.decode() if user else None, claims=claims,
+        )
+        await limited(scope, receive, send)
+
+    return fake_auth, limited, gate
+
+
+class TestRateLimitMiddleware:
+    """Test 429s, identities and priority shedding over ASGI."""
+
+    @pytest.mark.asyncio
+    async def test_anonymous_limited_by_address(self):
+        app, _, _ = build_app(RateLimiter(TIERS, clock=FakeClock()))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://t") as client:
+            assert [(await client.get("/")).status_code for _ in range(3)] == [200, 200, 429]
+            response = await client.get("/")
+            assert response.headers["Retry-After"] == "1"
+            assert response.json() == {"detail": "Rate limit exceeded"}
+            # /health is exempt
+            assert (await client.get("/health")).status_code == 200
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("proxy_hops", [0, 1])
+    async def test_spoofed_forwarded_for_shares_the_bucket(self, proxy_hops):
+        app, _, _ = build_app(RateLimiter(TIERS, clock=FakeClock()), proxy_hops=proxy_hops)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://t") as client:
+            # A new forged address per request; the proxy appends the real one
+            statuses = [
+                (await client.get("/", headers={"x-forwarded-for": f"10.0.0.{i}, 203.0.113.7"})).status_code
+                for i in range(3)
+            ]
+        assert statuses == [200, 200, 429]
+
+    def test_client_address_from_proxy_hop(self):
+        _, middleware, _ = build_app(RateLimiter(TIERS), proxy_hops=2)
+
+        def address(*forwarded):
+            headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+            return middleware._client_address({"headers": headers, "client": ("10.1.1.1", 1)})
+
+        assert address("1.1.1.1, 203.0.113.7, 10.0.0.2") == "203.0.113.7"
+        # Repeated headers are one list
+        assert address("1.1.1.1, 203.0.113.7", "10.0.0.2") == "203.0.113.7"
+        # Not through both proxies: the peer address
+        assert address("203.0.113.7") == "10.1.1.1"
+        assert address() == "10.1.1.1"
+
+    @pytest.mark.asyncio
+    async def test_verified_users_get_their_own_tier(self):
+        limiter = RateLimiter(TIERS, clock=FakeClock())
+        app, _, _ = build_app(limiter)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://t") as client:
+            statuses = [(await client.get("/", headers={"x-user": "u1"})).status_code for _ in range(11)]
+            assert statuses.count(429) == 1
+            premium = {"x-user": "u2", "x-tier": "premium"}
+            assert all([(await client.get("/", headers=premium)).status_code == 200 for _ in range(50)])
+            # Unknown tier claims fall back to the default tier
+            bogus = {"x-user": "u3", "x-tier": "unlimited"}
+            statuses = [(await client.get("/", headers=bogus)).status_code for _ in range(11)]
+            assert statuses.count(429) == 1
+
+    @pytest.mark.parametrize("claim", [["premium"], {"name": "premium"}, 1, None])
+    def test_non_string_tier_claim_uses_default_tier(self, claim):
+        _, middleware, _ = build_app(RateLimiter(TIERS))
+        auth = AuthResult(is_valid=True, reason="test", user_id="u1", claims={"tier": claim})
+        assert middleware._identify({"state": {"auth": auth}}) == ("user:u1", "default")
+
+    @pytest.mark.asyncio
+    async def test_low_priority_shed_first(self):
+        generous = {name: Tier(name, 1000, 1000) for name in ("anonymous", "default")}
+        app, middleware, gate = build_app(RateLimiter(generous), max_in_flight=4)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://t") as client:
+            pending = [asyncio.create_task(client.get("/slow")) for _ in range(2)]
+            while middleware.in_flight < 2:
+                await asyncio.sleep(0)
+            # At half capacity: bulk (low priority) is shed, normal routes are not
+            shed = await client.get("/api/items/bulk")
+            assert shed.status_code == 503
+            assert shed.headers["Retry-After"] == "1"
+            assert (await client.get("/")).status_code == 200
+
+            pending += [asyncio.create_task(client.get("/slow")) for _ in range(2)]
+            while middleware.in_flight < 4:
+                await asyncio.sleep(0)
+            assert (await client.get("/")).status_code == 503
+            assert (await client.get("/health")).status_code == 200
+
+            gate.set()
+            assert all(response.status_code == 200 for response in await asyncio.gather(*pending))
+            assert middleware.in_flight == 0
+            assert (await client.get("/api/items/bulk")).status_code == 200
+
+    def test_required_tiers(self):
+        with pytest.raises(ValueError):
+            RateLimitMiddleware(None, limiter=RateLimiter({"premium": TIERS["premium"]}))
@@ -0,0 +1,308 @@
+"""Tests for resilient database calls."""
+import asyncio
+from contextlib import asynccontextmanager
+import httpx
+import pytest
+from fastapi import HTTPException
+from supabase import AsyncClientOptions, acreate_client
+from app.core.batching import InsertCoalescer, insert_rows
+from app.core.metrics import (
+    db_circuit_state,
+    db_circuit_transitions_total,
+    db_hedged_requests_total,
+    db_retries_total,
+)
+from app.core.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    OperationTimeout,
+    ResilientTransport,
+)
+from app.core.utils import handle_exceptions
+from benchmarks.fakes import FakeSupabase, create_postgrest_app
+
+ITEMS_URL = "http://db.local/rest/v1/items"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _stand_in(db, **kwargs):
+    """Client calling the PostgREST stand-in through a ResilientTransport."""
+    kwargs.setdefault("retry_backoff", 0.001)
+    transport = ResilientTransport(httpx.ASGITransport(app=create_postgrest_app(db)), **kwargs)
+    return httpx.AsyncClient(transport=transport)
+
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    """Counts the requests the client sends, by method."""
+
+    def __init__(self, transport):
+        self._transport = transport
+        self.requests = {}
+
+    async def handle_async_request(self, request):
+        self.requests[request.method] = self.requests.get(request.method, 0) + 1
+        return await self._transport.handle_async_request(request)
+
+
+@asynccontextmanager
+async def _supabase(db, **kwargs):
+    """Real Supabase client over a ResilientTransport; yields (client, counting transport)."""
+    counting = CountingTransport(ResilientTransport(httpx.ASGITransport(app=create_postgrest_app(db)), **kwargs))
+    async with httpx.AsyncClient(transport=counting) as http_client:
+        client = await acreate_client(
+            "http://db.local", "test-key", options=AsyncClientOptions(httpx_client=http_client),
+        )
+        yield client, counting
+
+
+def _tracker(delay):
+    """Latency tracker already primed with ``delay``."""
+    tracker = LatencyTracker(min_delay=0, min_samples=1, recompute_every=1)
+    tracker.record(delay)
+    return tracker
+
+
+class TestCircuitBreaker:
+    """Test breaker state transitions."""
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=FakeClock())
+        for success in (False, False, True, False, False):
+            breaker.release(breaker.acquire(), success)
+        assert breaker.state == CLOSED
+        breaker.release(breaker.acquire(), False)
+        assert breaker.state == OPEN
+        assert db_circuit_state.value() == 2
+        with pytest.raises(CircuitOpenError) as exc_info:
+            breaker.acquire()
+        assert exc_info.value.retry_after == 10
+
+    def test_half_open_probe_closes_or_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+        breaker.release(breaker.acquire(), False)
+        clock.now = 5
+        assert breaker.state == HALF_OPEN
+
+        probe = breaker.acquire()
+        assert probe is True
+        # Only one probe at a time
+        with pytest.raises(CircuitOpenError):
+            breaker.acquire()
+        breaker.release(probe, False)
+        assert breaker.state == OPEN
+
+        clock.now = 10
+        breaker.release(breaker.acquire(), True)
+        assert breaker.state == CLOSED
+        assert db_circuit_state.value() == 0
+        assert db_circuit_transitions_total.value((HALF_OPEN,)) >= 2
+
+    def test_abandoned_calls_do_not_count(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+        breaker.release(breaker.acquire(), None)
+        assert breaker.state == CLOSED
+        breaker.release(breaker.acquire(), False)
+        clock.now = 5
+        breaker.release(breaker.acquire(), None)
+        # The probe slot is free again
+        assert breaker.acquire() is True
+
+
+class TestResilientTransport:
+    """Test timeouts, retries and the breaker against the PostgREST stand-in."""
+
+    @pytest.mark.asyncio
+    async def test_read_retried_after_failure(self):
+        db = FakeSupabase()
+        db.seed("items", [{"name": "a"}])
+        db.fail_next = 2
+        before = db_retries_total.value(("503",))
+        async with _stand_in(db, retry_attempts=2) as client:
+            response = await client.get(ITEMS_URL)
+        assert response.status_code == 200
+        assert response.json()[0]["name"] == "a"
+        assert db.executions == 3
+        assert db_retries_total.value(("503",)) == before + 2
+
+    @pytest.mark.asyncio
+    async def test_retries_are_capped(self):
+        db = FakeSupabase()
+        db.fail_next = 5
+        async with _stand_in(db, retry_attempts=2) as client:
+            response = await client.get(ITEMS_URL)
+        assert response.status_code == 503
+        assert db.executions == 3
+
+    @pytest.mark.asyncio
+    async def test_writes_are_not_retried(self):
+        db = FakeSupabase()
+        db.fail_next = 1
+        async with _stand_in(db, retry_attempts=2) as client:
+            response = await client.post(ITEMS_URL, json=[{"name": "a"}])
+        assert response.status_code == 503
+        assert db.executions == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_insert_timeout_is_one_write(self):
+        db = FakeSupabase(latency=0.2)
+        async with _supabase(db, write_timeout=0.02, retry_attempts=2) as (client, counting):
+            with pytest.raises(OperationTimeout):
+                await insert_rows(client, "items", [{"name": str(i)} for i in range(5)])
+        assert counting.requests == {"POST": 1}
+        assert db.executions == 1
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_batch_once(self):
+        db = FakeSupabase()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.release(breaker.acquire(), False)
+        coalescer = InsertCoalescer("items", max_batch_size=100, flush_interval=0.001)
+        async with _supabase(db, breaker=breaker) as (client, counting):
+            results = await asyncio.gather(
+                *(coalescer.insert(client, {"name": str(i)}) for i in range(10)),
+                return_exceptions=True,
+            )
+        assert all(isinstance(result, CircuitOpenError) for result in results)
+        # One batch write failing fast, not one per row
+        assert counting.requests == {"POST": 1}
+        assert db.executions == 0
+
+    @pytest.mark.asyncio
+    async def test_operation_timeout(self):
+        db = FakeSupabase(latency=0.5)
+        async with _stand_in(db, read_timeout=0.02, retry_attempts=0) as client:
+            with pytest.raises(OperationTimeout):
+                await client.get(ITEMS_URL)
+
+    @pytest.mark.asyncio
+    async def test_breaker_fails_fast(self):
+        db = FakeSupabase(error_rate=1.0)
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        async with _stand_in(db, breaker=breaker, retry_attempts=1) as client:
+            assert (await client.get(ITEMS_URL)).status_code == 503
+            # The third failure opens the circuit; the retry fails fast
+            with pytest.raises(CircuitOpenError):
+                await client.get(ITEMS_URL)
+            assert breaker.state == OPEN
+            with pytest.raises(CircuitOpenError):
+                await client.get(ITEMS_URL)
+        # Failing fast never reaches the database
+        assert db.executions == 3
+
+    @pytest.mark.asyncio
+    async def test_breaker_recovers(self):
+        clock = FakeClock()
+        db = FakeSupabase()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+        async with _stand_in(db, breaker=breaker, retry_attempts=0) as client:
+            db.fail_next = 1
+            await client.get(ITEMS_URL)
+            assert breaker.state == OPEN
+            clock.now = 5
+            assert (await client.get(ITEMS_URL)).status_code == 200
+        assert breaker.state == CLOSED
+
+
+class TestHedgedReads:
+    """Test hedging slow reads."""
+
+    @pytest.mark.asyncio
+    async def test_slow_read_is_hedged(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(len(calls))
+            if len(calls) == 1:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    calls.append("cancelled")
+                    raise
+            return httpx.Response(200, json={"call": 2})
+
+        fired = db_hedged_requests_total.value(("fired",))
+        won = db_hedged_requests_total.value(("won",))
+        transport = ResilientTransport(httpx.MockTransport(handler), hedging=_tracker(0.01))
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get(ITEMS_URL)
+        assert response.json() == {"call": 2}
+        assert "cancelled" in calls
+        assert db_hedged_requests_total.value(("fired",)) == fired + 1
+        assert db_hedged_requests_total.value(("won",)) == won + 1
+
+    @pytest.mark.asyncio
+    async def test_fast_read_is_not_hedged(self):
+        db = FakeSupabase()
+        fired = db_hedged_requests_total.value(("fired",))
+        async with _stand_in(db, hedging=_tracker(0.5)) as client:
+            assert (await client.get(ITEMS_URL)).status_code == 200
+        assert db.executions == 1
+        assert db_hedged_requests_total.value(("fired",)) == fired
+
+    @pytest.mark.asyncio
+    async def test_hedging_cuts_tail_latency_on_stand_in(self):
+        async def slow_reads(hedging):
+            # One in four reads stalls for 500ms
+            db = FakeSupabase(latency=0.002, slow_rate=0.25, slow_latency=0.5)
+            loop = asyncio.get_running_loop()
+            async with _stand_in(db, hedging=hedging) as client:
+                async def timed():
+                    start = loop.time()
+                    assert (await client.get(ITEMS_URL)).status_code == 200
+                    return loop.time() - start
+                durations = await asyncio.gather(*(timed() for _ in range(80)))
+            return sum(duration > 0.25 for duration in durations)
+
+        unhedged = await slow_reads(None)
+        hedged = await slow_reads(_tracker(0.02))
+        assert unhedged >= 10
+        assert hedged < unhedged / 2
+
+    @pytest.mark.asyncio
+    async def test_writes_are_not_hedged(self):
+        db = FakeSupabase(latency=0.05)
+        async with _stand_in(db, hedging=_tracker(0.001)) as client:
+            await client.post(ITEMS_URL, json=[{"name": "a"}])
+        assert db.executions == 1
+
+    def test_delay_tracks_percentile(self):
+        tracker = LatencyTracker(percentile=0.9, min_delay=0.001, window=100, min_samples=10, recompute_every=10)
+        for i in range(9):
+            tracker.record(i / 1000)
+        assert tracker.delay is None
+        for i in range(9, 100):
+            tracker.record(i / 1000)
+        assert tracker.delay == pytest.approx(0.089)
+
+
+class TestHandleExceptions:
+    """Test database failures surface as 503/504."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error,status_code,retry_after", [
+        (CircuitOpenError("open", retry_after=4.2), 503, "5"),
+        (httpx.ConnectError("refused"), 503, "1"),
+        (OperationTimeout("slow"), 504, None),
+    ])
+    async def test_mapped(self, error, status_code, retry_after):
+        @handle_exceptions(operation_name="fetching items")
+        async def endpoint():
+            raise error
+
+        with pytest.raises(HTTPException) as exc_info:
+            await endpoint()
+        assert exc_info.value.status_code == status_code
+        assert (exc_info.value.headers or {}).get("Retry-After") == retry_after
@@ -0,0 +1,283 @@
+"""Tests for JWT verification, JWKS caching and the verified-token cache."""
+import asyncio
+import time
+from functools import lru_cache
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt, JWTError
+from app.core.security import JWKSCache, JWTValidator, TokenCache
+from app.middleware.auth_middleware import AuthMiddleware
+
+ISSUER = "https://test.auth.local/"
+AUDIENCE = "test-audience"
+
+
+@lru_cache(maxsize=None)
+def _signing_key(kid: str):
+    """Generate (once per kid) an RSA signing key."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    return jwk.construct(pem, "RS256")
+
+
+class LocalJWKS:
+    """Local JWKS endpoint stand-in that signs tokens and counts fetches."""
+
+    def __init__(self):
+        self.keys = {}
+        self.fetches = 0
+
+    def add_key(self, kid: str) -> None:
+        self.keys[kid] = _signing_key(kid)
+
+    async def fetch(self) -> dict:
+        self.fetches += 1
+        keys = []
+        for kid, key in self.keys.items():
+            public = key.public_key().to_dict()
+            keys.append({**public, "kid": kid, "use": "sig", "alg": "RS256"})
+        return {"keys": keys}
+
+    def sign(self, kid: str, **overrides) -> str:
+        now = int(time.time())
+        claims = {
+            "sub": "user-1",
+            "iss": ISSUER,
+            "aud": AUDIENCE,
+            "iat": now,
+            "exp": now + 300,
+            **overrides,
+        }
+        return jwt.encode(claims, self.keys[kid], algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def jwks_server():
+    server = LocalJWKS()
+    server.add_key("key-1")
+    return server
+
+
+@pytest.fixture
+def validator(jwks_server):
+    return JWTValidator(
+        jwks=JWKSCache(jwks_server.fetch, algorithm="RS256", min_refresh_interval=0),
+        audience=AUDIENCE,
+        issuer=ISSUER,
+    )
+
+
+class TestJWTValidator:
+    """Test token verification."""
+
+    @pytest.mark.asyncio
+    async def test_valid_token(self, validator, jwks_server):
+        claims = await validator.validate(jwks_server.sign("key-1"))
+        assert claims["sub"] == "user-1"
+
+    @pytest.mark.asyncio
+    async def test_expired_token_rejected(self, validator, jwks_server):
+        token = jwks_server.sign("key-1", exp=int(time.time()) - 10)
+        with pytest.raises(JWTError):
+            await validator.validate(token)
+
+    @pytest.mark.asyncio
+    async def test_wrong_audience_rejected(self, validator, jwks_server):
+        with pytest.raises(JWTError):
+            await validator.validate(jwks_server.sign("key-1", aud="other"))
+
+    @pytest.mark.asyncio
+    async def test_wrong_issuer_rejected(self, validator, jwks_server):
+        with pytest.raises(JWTError):
+            await validator.validate(jwks_server.sign("key-1", iss="https://evil/"))
+
+    @pytest.mark.asyncio
+    async def test_bad_signature_rejected(self, validator, jwks_server):
+        token = jwks_server.sign("key-1")
+        header, payload, signature = token.split(".")
+        tampered = ".".join([header, payload, signature[::-1]])
+        with pytest.raises(JWTError):
+            await validator.validate(tampered)
+
+    @pytest.mark.asyncio
+    async def test_malformed_token_rejected(self, validator):
+        with pytest.raises(JWTError):
+            await validator.validate("not-a-jwt")
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_cheaper_than_miss(self, validator, jwks_server):
+        """Measure verification cost with and without the token cache."""
+        tokens = [jwks_server.sign("key-1", jti=str(i)) for i in range(50)]
+        await validator.validate(tokens[0])  # prime the JWKS
+
+        start = time.perf_counter()
+        for token in tokens:
+            await validator.validate(token)
+        miss_cost = (time.perf_counter() - start) / len(tokens)
+
+        start = time.perf_counter()
+        for token in tokens:
+            await validator.validate(token)
+        hit_cost = (time.perf_counter() - start) / len(tokens)
+
+        print(f"\nJWT verify miss: {miss_cost * 1e6:.1f}us  hit: {hit_cost * 1e6:.1f}us")
+        assert hit_cost < miss_cost
+        assert jwks_server.fetches == 1
+
+
+class TestJWKSCache:
+    """Test JWKS fetching and refresh."""
+
+    @pytest.mark.asyncio
+    async def test_fetched_once(self, validator, jwks_server):
+        for i in range(5):
+            await validator.validate(jwks_server.sign("key-1", jti=str(i)))
+        assert jwks_server.fetches == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_kid_triggers_refresh(self, validator, jwks_server):
+        await validator.validate(jwks_server.sign("key-1"))
+        jwks_server.add_key("key-2")
+        claims = await validator.validate(jwks_server.sign("key-2"))
+        assert claims["sub"] == "user-1"
+        assert jwks_server.fetches == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_unknown_kid_single_fetch(self, validator, jwks_server):
+        tokens = [jwks_server.sign("key-1", jti=str(i)) for i in range(10)]
+        await asyncio.gather(*(validator.validate(t) for t in tokens))
+        assert jwks_server.fetches == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_kid_refresh_rate_limited(self, jwks_server):
+        cache = JWKSCache(jwks_server.fetch, algorithm="RS256", min_refresh_interval=60)
+        assert await cache.get_key("key-1") is not None
+        assert await cache.get_key("missing") is None
+        assert await cache.get_key("missing") is None
+        assert jwks_server.fetches == 1
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry_refreshes_in_background(self, jwks_server):
+        cache = JWKSCache(jwks_server.fetch, algorithm="RS256", ttl=0, min_refresh_interval=0)
+        assert await cache.get_key("key-1") is not None
+        # Stale key is served immediately while the refresh runs
+        assert await cache.get_key("key-1") is not None
+        await cache._refresh_task
+        assert jwks_server.fetches == 2
+
+    @pytest.mark.asyncio
+    async def test_fetch_failure_keeps_keys(self, jwks_server):
+        cache = JWKSCache(jwks_server.fetch, algorithm="RS256", ttl=0, min_refresh_interval=0)
+        await cache.get_key("key-1")
+
+        async def failing_fetch():
+            raise OSError("unreachable")
+
+        cache._fetch = failing_fetch
+        assert await cache.get_key("key-1") is not None
+        await cache._refresh_task
+        assert await cache.get_key("key-1") is not None
+
+    @pytest.mark.asyncio
+    async def test_unusable_keys_skipped(self, jwks_server):
+        async def fetch():
+            jwks = await jwks_server.fetch()
+            return {"keys": [
+                {"kid": "okp", "kty": "OKP", "crv": "Ed25519", "x": "11qYAYKxCrfVS_7TyWQHOg7hcvPapiMlrwIaaPcHURo",
+                 "alg": "EdDSA", "use": "sig"},
+                {"kid": "bad-rsa", "kty": "RSA", "n": "AA", "e": "AQAB", "alg": "RS256", "use": "sig"},
+                *jwks["keys"],
+            ]}
+
+        cache = JWKSCache(fetch, algorithm="RS256")
+        assert await cache.get_key("key-1") is not None
+        assert await cache.get_key("okp") is None
+        assert await cache.get_key("bad-rsa") is None
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_refresh(self, jwks_server):
+        release = asyncio.Event()
+
+        async def slow_fetch():
+            await release.wait()
+            return await jwks_server.fetch()
+
+        cache = JWKSCache(slow_fetch, algorithm="RS256")
+        first = asyncio.ensure_future(cache.get_key("key-1"))
+        second = asyncio.ensure_future(cache.get_key("key-1"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second is not None
+        assert jwks_server.fetches == 1
+
+
+class TestTokenCache:
+    """Test the bounded verified-token LRU."""
+
+    def test_expires_at_token_exp(self):
+        cache = TokenCache(maxsize=10)
+        cache.put("expired", {"exp": time.time() - 1})
+        cache.put("valid", {"exp": time.time() + 60})
+        assert cache.get("expired") is None
+        assert cache.get("valid") is not None
+
+    def test_lru_bound(self):
+        cache = TokenCache(maxsize=2)
+        exp = time.time() + 60
+        cache.put("a", {"exp": exp})
+        cache.put("b", {"exp": exp})
+        cache.get("a")
+        cache.put("c", {"exp": exp})
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+
+    def test_tokens_without_exp_not_cached(self):
+        cache = TokenCache()
+        cache.put("t", {"sub": "x"})
+        assert cache.get("t") is None
+
+
+class TestAuthMiddlewareJWT:
+    """Test AuthMiddleware with JWT validation enabled."""
+
+    @pytest.fixture
+    def middleware(self, validator):
+        async def app(scope, receive, send):
+            pass
+        return AuthMiddleware(app, validator=validator)
+
+    @pytest.mark.asyncio
+    async def test_valid_bearer_token(self, middleware, jwks_server):
+        token = jwks_server.sign("key-1")
+        result = await middleware._validate_auth({}, {"authorization": f"Bearer {token}"})
+        assert result.is_valid is True
+        assert result.user_id == "user-1"
+        assert result.claims["aud"] == AUDIENCE
+
+    @pytest.mark.asyncio
+    async def test_invalid_bearer_token(self, middleware):
+        result = await middleware._validate_auth({}, {"authorization": "Bearer junk"})
+        assert result.is_valid is False
+        assert "Invalid token" in result.reason
+
+    @pytest.mark.asyncio
+    async def test_unusable_jwks_key_is_not_a_server_error(self, middleware, jwks_server):
+        async def fetch():
+            return {"keys": [{"kid": "key-1", "kty": "RSA", "n": "AA", "e": "AQAB", "use": "sig"}]}
+
+        middleware.validator.jwks._fetch = fetch
+        result = await middleware._validate_auth({}, {"authorization": f"Bearer {jwks_server.sign('key-1')}"})
+        assert result.is_valid is False
+
+    @pytest.mark.asyncio
+    async def test_unsupported_scheme(self, middleware):
+        result = await middleware._validate_auth({}, {"authorization": "Basic abc"})
+        assert result.is_valid is False
@@ -0,0 +1,40 @@
+"""Tests for the pluggable JSON encoders."""
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+import pytest
+from app.core.serialization import FastJSONResponse, get_dumps
+from app.models.item import Item
+
+
+class TestSerialization:
+    """Test encoder selection and output compatibility."""
+
+    PAYLOAD = {"items": [{"id": 1, "name": "Ünïcode", "price": 1.5, "tags": None}], "next": None}
+
+    @pytest.mark.parametrize("name", ["auto", "orjson", "stdlib"])
+    def test_encoders_match_stdlib(self, name):
+        encoded = get_dumps(name)(self.PAYLOAD)
+        assert isinstance(encoded, bytes)
+        assert json.loads(encoded) == self.PAYLOAD
+
+    def test_unknown_serializer(self):
+        with pytest.raises(ValueError):
+            get_dumps("yaml")
+
+    @pytest.mark.parametrize("name", ["auto", "stdlib"])
+    def test_extra_types(self, name):
+        item = Item(id=1, name="A", created_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        decoded = json.loads(get_dumps(name)({"item": item, "amount": Decimal("2.5"), "ids": {3}}))
+        assert decoded["item"]["created_at"].startswith("2024-01-01T00:00:00")
+        assert decoded["amount"] == 2.5
+        assert decoded["ids"] == [3]
+
+    def test_unserializable_type(self):
+        with pytest.raises(TypeError):
+            get_dumps("auto")({"value": object()})
+
+    def test_response_class(self):
+        response = FastJSONResponse({"status": "healthy"})
+        assert response.body == b'{"status":"healthy"}'
+        assert response.media_type == "application/json"
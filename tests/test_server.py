@@ -0,0 +1,84 @@
+"""Tests for the production server launcher."""
+import pytest
+from unittest.mock import patch
+import uvicorn
+from app.core import server
+from app.core.config import settings
+
+
+@pytest.fixture
+def cgroup(tmp_path, monkeypatch):
+    """Point the cgroup CPU files at a temporary directory."""
+    paths = {
+        "CGROUP_V2_CPU_MAX": tmp_path / "cpu.max",
+        "CGROUP_V1_QUOTA": tmp_path / "cpu.cfs_quota_us",
+        "CGROUP_V1_PERIOD": tmp_path / "cpu.cfs_period_us",
+    }
+    for name, path in paths.items():
+        monkeypatch.setattr(server, name, str(path))
+    return paths
+
+
+class TestWorkerSizing:
+    """Test CPU detection and worker count."""
+
+    def test_cgroup_v2_quota(self, cgroup):
+        cgroup["CGROUP_V2_CPU_MAX"].write_text("150000 100000\n")
+        assert server.cgroup_cpu_limit() == 1.5
+
+    def test_cgroup_v2_unlimited(self, cgroup):
+        cgroup["CGROUP_V2_CPU_MAX"].write_text("max 100000\n")
+        assert server.cgroup_cpu_limit() is None
+
+    def test_cgroup_v1_quota(self, cgroup):
+        cgroup["CGROUP_V1_QUOTA"].write_text("200000")
+        cgroup["CGROUP_V1_PERIOD"].write_text("100000")
+        assert server.cgroup_cpu_limit() == 2.0
+
+    def test_no_cgroup(self, cgroup):
+        assert server.cgroup_cpu_limit() is None
+
+    def test_available_cpus_capped_by_quota(self, cgroup, monkeypatch):
+        monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+        cgroup["CGROUP_V2_CPU_MAX"].write_text("250000 100000")
+        assert server.available_cpus() == 3
+        cgroup["CGROUP_V2_CPU_MAX"].write_text("50000 100000")
+        assert server.available_cpus() == 1
+
+    def test_worker_count_setting_overrides(self, monkeypatch):
+        monkeypatch.setattr(settings, "workers", 3)
+        assert server.worker_count() == 3
+        monkeypatch.setattr(settings, "workers", 0)
+        assert server.worker_count() == server.available_cpus()
+
+
+class TestServerConfig:
+    """Test uvicorn options and worker recycling."""
+
+    def test_build_config(self, monkeypatch):
+        monkeypatch.setattr(settings, "workers", 2)
+        monkeypatch.setattr(settings, "max_requests", 500)
+        config = server.build_config()
+        assert config.workers == 2
+        assert config.loop == "uvloop"
+        assert config.http == "httptools"
+        assert config.limit_max_requests == 500
+        assert config.timeout_keep_alive == settings.keep_alive_timeout
+        assert config.timeout_graceful_shutdown == settings.graceful_shutdown_timeout
+        assert config.backlog == settings.backlog
+
+    def test_missing_optional_loop_falls_back(self, monkeypatch):
+        monkeypatch.setattr(server.importlib.util, "find_spec", lambda name: None)
+        assert server._resolve("uvloop", "uvloop", "asyncio") == "asyncio"
+        assert server._resolve("auto", "uvloop", "asyncio") == "auto"
+
+    def test_max_requests_disabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "max_requests", 0)
+        assert server.build_config().limit_max_requests is None
+
+    def test_recycling_jitter(self):
+        config = uvicorn.Config("app.main:app", limit_max_requests=1000)
+        with patch.object(uvicorn.Server, "run") as run:
+            server.RecyclingServer(config, max_requests_jitter=50).run()
+        run.assert_called_once()
+        assert 1000 <= config.limit_max_requests <= 1050
@@ -0,0 +1,285 @@
+"""Tests for request tracing."""
+import asyncio
+import json
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.metrics import InstrumentedTransport
+from app.core.tracing import (
+    Span,
+    Trace,
+    TraceExporter,
+    current_trace,
+    end_trace,
+    span,
+    start_trace,
+)
+from app.main import create_application
+from app.middleware.tracing_middleware import TracingMiddleware
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def _timings(header):
+    """Parse a Server-Timing header into {name: (dur, desc)}."""
+    timings = {}
+    for entry in header.split(", "):
+        name, *params = entry.split(";")
+        values = dict(param.split("=", 1) for param in params)
+        timings[name] = (float(values["dur"]), values.get("desc"))
+    return timings
+
+
+class _Recorder(TraceExporter):
+    """Exporter keeping traces in memory."""
+
+    def __init__(self, sample_rate=1.0):
+        super().__init__("unused", sample_rate=sample_rate)
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+
+def _build_app(exporter=None, server_timing=True, trust_upstream=False):
+    async def items(request):
+        with span("handler"):
+            with span("db", {"db.table": "items"}):
+                await asyncio.sleep(0)
+            with span("db"):
+                pass
+        return JSONResponse({"ok": True})
+
+    async def boom(request):
+        raise RuntimeError("boom")
+
+    app = Starlette(routes=[Route("/items", items), Route("/boom", boom)])
+    return TracingMiddleware(app, exporter=exporter, server_timing=server_timing, trust_upstream=trust_upstream)
+
+
+class TestSpans:
+    """Test span recording."""
+
+    def test_noop_without_trace(self):
+        assert current_trace() is None
+        with span("db") as recorded:
+            recorded.set_attribute("rows", 1)
+
+    def test_nesting_and_totals(self):
+        trace = Trace("GET")
+        token = start_trace(trace)
+        try:
+            with span("handler"):
+                with span("db"):
+                    pass
+                with span("db") as second:
+                    second.set_attribute("rows", 3)
+            with pytest.raises(ValueError):
+                with span("serialize"):
+                    raise ValueError("bad")
+        finally:
+            end_trace(token)
+
+        names = [(recorded.name, recorded.parent) for recorded in trace.spans]
+        assert names == [("handler", -1), ("db", 0), ("db", 0), ("serialize", -1)]
+        assert trace.spans[2].attributes == {"rows": 3}
+        assert trace.spans[3].attributes == {"error": "ValueError"}
+        assert {name: count for name, (_, count) in trace.totals().items()} == {
+            "handler": 1, "db": 2, "serialize": 1,
+        }
+
+    @pytest.mark.asyncio
+    async def test_child_tasks_inherit_parent(self):
+        trace = Trace("GET")
+        token = start_trace(trace)
+        try:
+            with span("handler"):
+                async def query():
+                    with span("db"):
+                        await asyncio.sleep(0)
+                await asyncio.gather(query(), query())
+        finally:
+            end_trace(token)
+        assert [recorded.parent for recorded in trace.spans] == [-1, 0, 0]
+
+    def test_server_timing(self):
+        trace = Trace("GET")
+        # Request started 10ms ago
+        start = trace.start_ns = trace.start_ns - 10_000_000
+        for name, parent, begin_ms, end_ms in [
+            ("auth", -1, 0, 1), ("handler", -1, 1, 4), ("db", 1, 1, 2), ("db", 1, 2, 3.5),
+        ]:
+            recorded = Span(trace, name)
+            recorded.parent = parent
+            recorded.start = start + int(begin_ms * 1_000_000)
+            recorded.end = start + int(end_ms * 1_000_000)
+            trace.spans.append(recorded)
+        timings = _timings(trace.server_timing())
+        assert timings["auth"] == (1.0, None)
+        assert timings["handler"] == (3.0, None)
+        assert timings["db"] == (2.5, '"2 calls"')
+        assert timings["total"][0] >= 10.0
+        assert timings["other"][0] == pytest.approx(timings["total"][0] - 4.0, abs=0.002)
+
+    @pytest.mark.parametrize("header,continued,sampled", [
+        (f"00-{TRACE_ID}-{PARENT_ID}-01", True, True),
+        (f"00-{TRACE_ID}-{PARENT_ID}-00", True, False),
+        (f"00-{'0' * 32}-{PARENT_ID}-01", False, False),
+        ("garbage", False, False),
+        (None, False, False),
+    ])
+    def test_traceparent(self, header, continued, sampled):
+        trace = Trace.from_traceparent("GET", header)
+        assert (trace.trace_id == int(TRACE_ID, 16)) is continued
+        assert trace.sampled is sampled
+
+    def test_otlp_shape(self):
+        trace = Trace.from_traceparent("GET /items", f"00-{TRACE_ID}-{PARENT_ID}-01")
+        token = start_trace(trace)
+        with span("handler"):
+            with span("db", {"db.table": "items", "rows": 2}):
+                pass
+        end_trace(token)
+        trace.attributes["http.response.status_code"] = 200
+        trace.finish()
+
+        payload = trace.to_otlp("svc")
+        resource_spans, = payload["resourceSpans"]
+        assert resource_spans["resource"]["attributes"] == [
+            {"key": "service.name", "value": {"stringValue": "svc"}}
+        ]
+        root, handler, db = resource_spans["scopeSpans"][0]["spans"]
+        assert {root["traceId"], handler["traceId"], db["traceId"]} == {TRACE_ID}
+        assert root["parentSpanId"] == PARENT_ID and root["kind"] == 2
+        assert handler["parentSpanId"] == root["spanId"]
+        assert db["parentSpanId"] == handler["spanId"]
+        assert int(root["startTimeUnixNano"]) <= int(db["startTimeUnixNano"]) <= int(db["endTimeUnixNano"])
+        assert db["attributes"] == [
+            {"key": "db.table", "value": {"stringValue": "items"}},
+            {"key": "rows", "value": {"intValue": "2"}},
+        ]
+        assert root["attributes"] == [
+            {"key": "http.response.status_code", "value": {"intValue": "200"}}
+        ]
+
+
+class TestTraceExporter:
+    """Test the OTLP/JSON file exporter."""
+
+    def test_writes_json_lines(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        exporter = TraceExporter(str(path))
+        exporter.start()
+        for _ in range(3):
+            trace = Trace("GET /")
+            trace.finish()
+            exporter.export(trace)
+        exporter.stop()
+        lines = path.read_text().splitlines()
+        assert len(lines) == 3
+        assert json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] == "GET /"
+
+    def test_rotates_at_max_bytes(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        exporter = TraceExporter(str(path), max_bytes=2000)
+        exporter.start()
+        for _ in range(20):
+            trace = Trace("GET /")
+            trace.finish()
+            exporter.export(trace)
+        exporter.stop()
+        rotated = tmp_path / "traces.jsonl.1"
+        assert 0 < path.stat().st_size <= 2000
+        assert 0 < rotated.stat().st_size <= 2000
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_drops_when_full(self, tmp_path):
+        exporter = TraceExporter(str(tmp_path / "traces.jsonl"), max_queue=1)
+        exporter.export(Trace("GET"))
+        exporter.export(Trace("GET"))
+        assert exporter.dropped == 1
+
+
+class TestTracingMiddleware:
+    """Test tracing through the ASGI stack."""
+
+    def test_server_timing_header(self):
+        with TestClient(_build_app()) as client:
+            response = client.get("/items")
+        timings = _timings(response.headers["server-timing"])
+        assert set(timings) == {"handler", "db", "other", "total"}
+        assert timings["db"][1] == '"2 calls"'
+
+    def test_server_timing_off(self):
+        with TestClient(_build_app(server_timing=False)) as client:
+            assert "server-timing" not in client.get("/items").headers
+
+    def test_sampled_trace_exported(self):
+        exporter = _Recorder(sample_rate=1.0)
+        with TestClient(_build_app(exporter)) as client:
+            client.get("/items")
+        trace, = exporter.traces
+        assert trace.name == "GET /items"
+        assert trace.attributes["http.response.status_code"] == 200
+        assert trace.end_ns is not None
+
+    def test_trusted_upstream_sampling_decision_wins(self):
+        exporter = _Recorder(sample_rate=1.0)
+        with TestClient(_build_app(exporter, trust_upstream=True)) as client:
+            client.get("/items", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+            client.get("/items", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+        trace, = exporter.traces
+        assert f"{trace.trace_id:032x}" == TRACE_ID
+
+    def test_untrusted_sampled_flag_ignored(self):
+        exporter = _Recorder(sample_rate=0.0)
+        with TestClient(_build_app(exporter)) as client:
+            client.get("/items", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+        assert exporter.traces == []
+
+        exporter = _Recorder(sample_rate=1.0)
+        with TestClient(_build_app(exporter)) as client:
+            client.get("/items", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+        # Sampled locally, still continuing the caller's trace
+        trace, = exporter.traces
+        assert f"{trace.trace_id:032x}" == TRACE_ID
+
+    def test_errors_marked(self):
+        exporter = _Recorder(sample_rate=1.0)
+        with TestClient(_build_app(exporter), raise_server_exceptions=False) as client:
+            assert client.get("/boom").status_code == 500
+        trace, = exporter.traces
+        assert trace.error
+
+    @pytest.mark.asyncio
+    async def test_database_calls_traced(self):
+        transport = InstrumentedTransport(httpx.MockTransport(lambda request: httpx.Response(200, json=[])))
+        trace = Trace("GET")
+        token = start_trace(trace)
+        try:
+            async with httpx.AsyncClient(transport=transport) as client:
+                await client.get("https://db.local/rest/v1/widgets?select=*")
+        finally:
+            end_trace(token)
+        recorded, = trace.spans
+        assert recorded.name == "db" and recorded.attributes["db.table"] == "widgets"
+
+    def test_app_breakdown(self, override_get_db, monkeypatch):
+        monkeypatch.setattr(settings, "tracing_server_timing", True)
+        monkeypatch.setattr(settings, "rate_limit_enabled", False)
+        app = create_application()
+        app.dependency_overrides[get_db] = lambda: override_get_db
+        override_get_db.seed("items", [{"name": "Item"}])
+        with TestClient(app) as client:
+            response = client.get("/api/items/")
+        timings = _timings(response.headers["server-timing"])
+        assert {"auth", "handler", "serialize", "other", "total"} <= set(timings)
+
+    def test_no_server_timing_by_default(self, client, override_get_db):
+        assert "server-timing" not in client.get("/api/items/").headers
@@ -0,0 +1,134 @@
+"""Tests for core utility decorators."""
+import asyncio
+import httpx
+import pytest
+from app.api.endpoints.items import items_cache, list_items
+from app.core.database import get_db
+from app.core.utils import single_flight
+from benchmarks.fakes import FakeSupabase
+
+
+class TestSingleFlight:
+    """Test single-flight request coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        calls = 0
+
+        @single_flight()
+        async def load(key):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"key": key}
+
+        results = await asyncio.gather(*(load("a") for _ in range(50)))
+        assert calls == 1
+        assert all(result == {"key": "a"} for result in results)
+        assert load.in_flight == {}
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        calls = []
+
+        @single_flight()
+        async def load(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key
+
+        assert await asyncio.gather(load("a"), load("b"), load("a")) == ["a", "b", "a"]
+        assert sorted(calls) == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_not_coalesced(self):
+        calls = 0
+
+        @single_flight()
+        async def load():
+            nonlocal calls
+            calls += 1
+
+        await load()
+        await load()
+        assert calls == 2
+
+    @pytest.mark.asyncio
+    async def test_error_propagates_to_every_waiter(self):
+        calls = 0
+
+        @single_flight()
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise ValueError("backend down")
+
+        results = await asyncio.gather(*(load() for _ in range(5)), return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(result, ValueError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        release = asyncio.Event()
+
+        @single_flight()
+        async def load():
+            await release.wait()
+            return "done"
+
+        first = asyncio.ensure_future(load())
+        second = asyncio.ensure_future(load())
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "done"
+        assert first.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_custom_key(self):
+        calls = 0
+
+        @single_flight(key=lambda db, page: page)
+        async def load(db, page):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return page
+
+        await asyncio.gather(load(object(), 1), load(object(), 1))
+        assert calls == 1
+
+    def test_rejects_sync_functions(self):
+        with pytest.raises(TypeError):
+            single_flight()(lambda: None)
+
+
+class TestItemsSingleFlight:
+    """Test identical concurrent item reads hit the database once."""
+
+    @pytest.mark.asyncio
+    async def test_list_items_coalesced(self):
+        db = FakeSupabase(latency=0.01)
+        db.seed("items", [{"name": "Item"}])
+        pages = await asyncio.gather(*(list_items(db, limit=10) for _ in range(25)))
+        assert db.executions == 1
+        assert all(page["items"][0]["name"] == "Item" for page in pages)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_one_backend_call(self, app):
+        db = FakeSupabase(latency=0.01)
+        db.seed("items", [{"name": "Item"}])
+        items_cache.clear()
+        app.dependency_overrides[get_db] = lambda: db
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = await asyncio.gather(
+                    *(client.get("/api/items/") for _ in range(30))
+                )
+        finally:
+            app.dependency_overrides.clear()
+        assert all(response.status_code == 200 for response in responses)
+        assert db.executions == 1